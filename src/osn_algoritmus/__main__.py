@@ -4,7 +4,12 @@ import logging
 import sys
 
 from .core import process_csv
+from .heavy_hitters import UnmatchedCodes
+from .instrumentation import Instrumentation
+from .prilohy_evaluation import resolve_prilohy
+from .prilohy_preparation import RuleSetRegistry, load_default_rule_set, load_rule_set
 from .utils import setup_parser
+from .validation_report import ValidationReport
 
 logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
 logger = logging.getLogger(__name__)
@@ -15,6 +20,17 @@ parser = setup_parser(
     vsetky_vykony_hlavne=True,
     vyhodnot_neuplne_pripady=True,
     ponechaj_duplicity=True,
+    iba_hlavna_ms=True,
+    vyber_priloh=True,
+    suhrn_validacie=True,
+    odmietnute_riadky=True,
+    zretazene_spracovanie=True,
+    predvyber_priloh=True,
+    agregacia=True,
+    nezaradene_kody=True,
+    profiluj=True,
+    tienove_prilohy=True,
+    verzie_priloh=True,
 )
 args = parser.parse_args()
 
@@ -33,18 +49,64 @@ if args.ponechaj_duplicity:
         "Aktivovaný prepínač 'Ponechaj duplicity'. Vo výstupnom zozname medicínskych služieb budú ponechané aj"
         " duplicitné záznamy.",
     )
+if args.iba_hlavna_ms:
+    logger.info(
+        "Aktivovaný prepínač 'Iba hlavná medicínska služba'. Vo výstupe bude iba hlavná medicínska služba a jej"
+        " úroveň.",
+    )
+
+instrumentation = Instrumentation() if args.profiluj or args.profil_json else None
+report = None
 
 try:
+    if args.suhrn_validacie or args.validacia_subor:
+        report = ValidationReport(args.validacia_subor)
+        logger.info("Aktivovaný súhrn validácie. Problémy vo vstupných dátach sa vypíšu súhrnne na konci behu.")
+    prilohy = resolve_prilohy(args.iba_prilohy, args.bez_priloh)
+    if prilohy is not None:
+        logger.info(f"Vyhodnotia sa iba prílohy: {', '.join(prilohy)}.")
+    unmatched = None if args.nezaradene_kody is None else UnmatchedCodes(top=args.nezaradene_kody)
+
+    shadow_rule_set = None
+    if args.tienove_prilohy is not None:
+        logger.info(f"Aktivované tieňové vyhodnotenie podľa príloh z {args.tienove_prilohy}.")
+        shadow_rule_set = load_rule_set(args.tienove_prilohy, prilohy=prilohy)
+
+    registry = None
+    if args.verzia_priloh:
+        registry = RuleSetRegistry.from_folders(
+            dict(args.verzia_priloh),
+            default_rule_set=load_default_rule_set(prilohy),
+        )
+        verzie = ", ".join(str(valid_from) for valid_from, _ in registry.items())
+        logger.info(f"Prípady sa vyhodnotia podľa verzie príloh účinnej v deň prijatia. Verzie účinné od: {verzie}")
+
     process_csv(
         args.input_path,
         args.output_path,
         all_vykony_hlavne=args.vsetky_vykony_hlavne,
         evaluate_incomplete_pripady=args.vyhodnot_neuplne_pripady,
         allow_duplicates=args.ponechaj_duplicity,
+        only_hlavna_ms=args.iba_hlavna_ms,
+        prilohy=prilohy,
+        instrumentation=instrumentation,
+        shadow_rule_set=shadow_rule_set,
+        registry=registry,
+        report=report,
+        reject_path=args.odmietnute_riadky,
+        pipeline=args.zretazene_spracovanie,
+        prefilter=args.predvyber_priloh,
+        aggregate_by=args.agreguj,
+        unmatched=unmatched,
     )
+    if args.profil_json is not None:
+        instrumentation.dump_json(args.profil_json)
 except ValueError as e:
     logger.error(e)  # noqa: TRY400, we don't want to display the traceback to the end user
     sys.exit(1)
 except Exception:
     logger.exception("Chyba pri spracovaní súboru")
     sys.exit(1)
+finally:
+    if report is not None:
+        report.close()
@@ -0,0 +1,118 @@
+"""Counts of pripady per group, medicinska sluzba and uroven compared with the minimum from p2_zoznam_ms.
+
+The counts are kept in memory while the pripady are evaluated, so the output per row does not have to be written.
+"""
+
+import csv
+from collections import Counter
+from collections.abc import Callable, Iterable, Iterator
+from typing import TextIO
+
+from osn_algoritmus.prilohy_preparation import RuleSet
+from osn_algoritmus.utils import CSV_DELIMITER
+
+AGGREGATION_COLUMNS = [
+    "skupina",
+    "ms",
+    "uroven_ms",
+    "pocet_pripadov",
+    "pocet_pripadov_ms",
+    "minimum_na_nemocnicu",
+    "splna_minimum",
+]
+"""Columns of the aggregated output."""
+
+ID_PREFIX = "id:"
+"""Prefix of the grouping key grouping pripady by the beginning of their id, e.g. `id:/`."""
+
+
+def grouping_key(key: str, input_columns: list[str]) -> Callable[[dict], str]:
+    """Return a function returning the group of a row of the input file.
+
+    Args:
+        key: Name of a column of the input file or `id:<oddelovac>` for the part of id before the first oddelovac,
+            e.g. `id:/` groups the pripad `P103/HP2` into `P103`.
+        input_columns: Columns of the input file.
+
+    Raises:
+        ValueError: If the column is not in the input file or the oddelovac is empty.
+
+    """
+    if key.startswith(ID_PREFIX):
+        separator = key.removeprefix(ID_PREFIX)
+        if not separator:
+            msg = f"Chýba oddeľovač v kľúči agregácie '{key}', napr. '{ID_PREFIX}/'."
+            raise ValueError(msg)
+        return lambda row: row["id"].split(separator, 1)[0]
+    if key not in input_columns:
+        msg = f"Stĺpec '{key}' nie je vo vstupnom súbore. Možné stĺpce: {input_columns} alebo '{ID_PREFIX}<oddeľovač>'."
+        raise ValueError(msg)
+    return lambda row: row[key]
+
+
+class Aggregation:
+    """Counts of pripady per group, medicinska sluzba and uroven.
+
+    A pripad is counted once for every distinct pair of medicinska sluzba and uroven in its result, also when the
+    duplicates are kept. Pripady with the result 'ERROR' are counted in the medicinska sluzba 'ERROR'.
+
+    Args:
+        key: Grouping key, see `grouping_key`.
+        input_columns: Columns of the input file.
+
+    """
+
+    def __init__(self, key: str, input_columns: list[str]) -> None:
+        """Prepare the grouping key and empty counts."""
+        self._group = grouping_key(key, input_columns)
+        self.counts: Counter[tuple[str, str, str]] = Counter()
+
+    def add(self, row: dict) -> None:
+        """Count the result of an evaluated row with filled columns ms and urovne_ms."""
+        group = self._group(row)
+        if row["ms"] == "ERROR":
+            self.counts[group, "ERROR", ""] += 1
+            return
+        for kod_ms, uroven in dict.fromkeys(zip(row["ms"].split("@"), row["urovne_ms"].split("@"), strict=True)):
+            self.counts[group, kod_ms, uroven] += 1
+
+    def add_rows(self, rows: Iterable[dict]) -> None:
+        """Count the results of several evaluated rows."""
+        for row in rows:
+            self.add(row)
+
+    def rows(self, rule_set: RuleSet) -> Iterator[dict]:
+        """Yield the counts sorted by group, medicinska sluzba and uroven, joined with the minimum from p2_zoznam_ms.
+
+        Args:
+            rule_set: Prilohy with the table p2_zoznam_ms.
+
+        Yields:
+            Row with `AGGREGATION_COLUMNS`. `pocet_pripadov_ms` counts the pripady of the medicinska sluzba in all
+            urovne. `splna_minimum` is 1 if it reaches a numeric `minimum_na_nemocnicu`, 0 if not and empty if the
+            minimum is not numeric or not filled.
+
+        """
+        minima = {row["kod_ms"]: row["minimum_na_nemocnicu"] for row in rule_set.tables["p2_zoznam_ms"]}
+        counts_ms: Counter[tuple[str, str]] = Counter()
+        for (group, kod_ms, _), count in self.counts.items():
+            counts_ms[group, kod_ms] += count
+
+        for (group, kod_ms, uroven), count in sorted(self.counts.items()):
+            minimum = minima.get(kod_ms, "")
+            count_ms = counts_ms[group, kod_ms]
+            yield {
+                "skupina": group,
+                "ms": kod_ms,
+                "uroven_ms": uroven,
+                "pocet_pripadov": count,
+                "pocet_pripadov_ms": count_ms,
+                "minimum_na_nemocnicu": minimum,
+                "splna_minimum": int(count_ms >= int(minimum)) if minimum.isdigit() else "",
+            }
+
+    def write(self, output_file: TextIO, rule_set: RuleSet) -> None:
+        """Write the aggregated table into an opened csv file, see `rows`."""
+        writer = csv.DictWriter(output_file, fieldnames=AGGREGATION_COLUMNS, delimiter=CSV_DELIMITER)
+        writer.writeheader()
+        writer.writerows(self.rows(rule_set))
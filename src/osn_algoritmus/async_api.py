@@ -0,0 +1,221 @@
+"""Asyncio API for the algoritmus.
+
+Concurrent calls of `AsyncEngine.evaluate` are coalesced into micro-batches, which are evaluated in a worker pool, so
+the event loop is never blocked by the evaluation of prilohy.
+
+Example:
+    async with AsyncEngine(Engine(all_vykony_hlavne=True), max_batch_size=512, max_wait=0.01) as engine:
+        ms, urovne_ms = await engine.evaluate(hp_dict)
+
+"""
+
+import asyncio
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor
+from types import TracebackType
+from typing import Self
+
+from osn_algoritmus.core import Engine
+
+_STOP = object()
+
+_worker_engine: Engine | None = None
+
+
+def _init_worker(engine: Engine) -> None:
+    """Store the engine in a worker process of the default process pool."""
+    global _worker_engine  # noqa: PLW0603
+    _worker_engine = engine
+
+
+def _evaluate_batch_in_worker(hp_dicts: list[dict]) -> list[tuple[str, str] | None]:
+    """Evaluate a batch with the engine stored in the worker process."""
+    return _worker_engine.evaluate_batch(hp_dicts)
+
+
+class AsyncEngine:
+    """Evaluate hospitalizacne pripady from asyncio code in micro-batches.
+
+    Args:
+        engine: Engine evaluating the pripady. Defaults to an engine with prilohy distributed with the package and
+            no flags.
+        max_batch_size: Maximum number of pripady evaluated in a single batch.
+        max_wait: Maximum time in seconds a pripad waits for other pripady to fill up its batch.
+        max_queue_size: Maximum number of pripady waiting for evaluation. When the queue is full, `evaluate` waits
+            until there is free space, which propagates backpressure to the producers.
+        max_in_flight: Maximum number of batches evaluated at the same time. Defaults to max_workers.
+        max_workers: Number of workers of the default process pool. Defaults to the number of CPUs.
+        executor: Executor used for evaluation of batches. If not provided, a process pool is created on start and
+            shut down on close. Every worker of this pool receives a copy of the engine only once, when it starts, so
+            counts collected by the engine in the workers (e.g. `Engine.prefilter_stats`) are not visible in this
+            process.
+
+    Raises:
+        ValueError: If an argument is out of range, or if the engine collects a validation report, instrumentation or
+            unmatched kody, which would stay in the workers of the default process pool. Pass a thread pool as
+            executor for such engines.
+
+    """
+
+    def __init__(  # noqa: PLR0913, keyword-only options of batching
+        self,
+        engine: Engine | None = None,
+        *,
+        max_batch_size: int = 256,
+        max_wait: float = 0.005,
+        max_queue_size: int = 10_000,
+        max_in_flight: int | None = None,
+        max_workers: int | None = None,
+        executor: Executor | None = None,
+    ) -> None:
+        """Create the engine, background tasks are started by `start`."""
+        if max_batch_size < 1:
+            msg = f"max_batch_size must be at least 1, got {max_batch_size}."
+            raise ValueError(msg)
+        if max_wait < 0:
+            msg = f"max_wait must not be negative, got {max_wait}."
+            raise ValueError(msg)
+
+        self.engine = Engine() if engine is None else engine
+        if executor is None and any(
+            state is not None for state in [self.engine.report, self.engine.instrumentation, self.engine.unmatched]
+        ):
+            msg = (
+                "The report, instrumentation and unmatched kody of the engine would be collected only in the workers of"
+                " the process pool. Pass a thread pool as executor."
+            )
+            raise ValueError(msg)
+
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.max_queue_size = max_queue_size
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self._max_in_flight = max_in_flight or self.max_workers
+        self._executor = executor
+        self._owns_executor = executor is None
+        self._closing = False
+
+        self._queue: asyncio.Queue | None = None
+        self._batcher: asyncio.Task | None = None
+        self._in_flight: set[asyncio.Task] = set()
+        self._slots: asyncio.Semaphore | None = None
+
+    async def start(self) -> None:
+        """Start the background task collecting pripady into batches."""
+        if self._batcher is not None:
+            return
+
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                initializer=_init_worker,
+                initargs=(self.engine,),
+            )
+
+        self._closing = False
+        self._queue = asyncio.Queue(maxsize=self.max_queue_size)
+        self._slots = asyncio.Semaphore(self._max_in_flight)
+        self._batcher = asyncio.create_task(self._collect_batches())
+
+    async def close(self) -> None:
+        """Evaluate all waiting pripady and stop the engine."""
+        if self._batcher is None or self._queue is None:
+            return
+
+        self._closing = True
+        await self._queue.put(_STOP)
+        await self._batcher
+        if self._in_flight:
+            await asyncio.gather(*self._in_flight)
+        self._batcher = None
+
+        if self._owns_executor and self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    async def __aenter__(self) -> Self:
+        """Start the engine."""
+        await self.start()
+        return self
+
+    async def __aexit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        """Close the engine."""
+        await self.close()
+
+    async def evaluate(self, hp_dict: dict) -> tuple[str, str] | None:
+        """Assign medicinske sluzby to a single hospitalizacny pripad.
+
+        Args:
+            hp_dict: dictionary representing hospitalizacny pripad.
+
+        Returns:
+            Same result as `osn_algoritmus.core.Engine.evaluate`.
+
+        Raises:
+            RuntimeError: If the engine was not started or is closed.
+
+        """
+        if self._queue is None or self._batcher is None or self._closing:
+            msg = "AsyncEngine is not running. Use 'async with AsyncEngine()' or call 'await engine.start()'."
+            raise RuntimeError(msg)
+
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((hp_dict, future))
+        return await future
+
+    async def _collect_batches(self) -> None:
+        """Collect waiting pripady into batches and submit them for evaluation."""
+        loop = asyncio.get_running_loop()
+        stopping = False
+
+        while not stopping:
+            item = await self._queue.get()
+            if item is _STOP:
+                break
+
+            batch = [item]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                try:
+                    item = self._queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        item = await asyncio.wait_for(self._queue.get(), timeout)
+                    except TimeoutError:
+                        break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            await self._slots.acquire()
+            task = asyncio.create_task(self._evaluate_batch(batch))
+            self._in_flight.add(task)
+            task.add_done_callback(self._in_flight.discard)
+
+    async def _evaluate_batch(self, batch: list[tuple[dict, asyncio.Future]]) -> None:
+        """Evaluate a batch in the executor and resolve futures of its pripady."""
+        try:
+            results = await asyncio.get_running_loop().run_in_executor(
+                self._executor,
+                _evaluate_batch_in_worker if self._owns_executor else self.engine.evaluate_batch,
+                [hp_dict for hp_dict, _ in batch],
+            )
+        except Exception as e:  # noqa: BLE001, the exception is passed to all waiting callers
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+        else:
+            for (_, future), result in zip(batch, results, strict=True):
+                if not future.done():
+                    future.set_result(result)
+        finally:
+            self._slots.release()
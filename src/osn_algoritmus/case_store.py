@@ -0,0 +1,388 @@
+"""Binary store of validated hospitalizacne pripady for repeated runs over the same input file.
+
+Compiling a csv file validates every pripad once and writes the results into a single binary file. Kody, identifiers
+and raw values of the input columns are interned in a table of strings, lists of diagnozy, vykony and markery are
+stored as flat arrays of indices into this table with offsets per pripad. The file is memory mapped when read, so
+opening it is immediate regardless of its size and pripady are decoded only when they are evaluated.
+
+Validation does not depend on the prilohy or on the flags other than `evaluate_incomplete_pripady`. The store keeps the
+pripad validated as incomplete and a per-row status whether it passes the full validation, so the same store serves
+runs with any flags and any version of prilohy. Problems in the input data are reported when compiling, not again in
+every run.
+
+Run with:
+    python -m osn_algoritmus.case_store [-h] [--suhrn_validacie] [--odmietnute_riadky PATH] input_path [output_path]
+
+The compiled file is then used in place of the csv file, e.g. `python -m osn_algoritmus -v pripady.osn`.
+"""
+
+import contextlib
+import json
+import logging
+import math
+import mmap
+import sys
+from array import array
+from collections.abc import Generator, Iterable
+from pathlib import Path
+from types import TracebackType
+from typing import Any, NamedTuple, Self
+
+from tqdm import tqdm
+from tqdm.contrib.logging import logging_redirect_tqdm
+
+from osn_algoritmus.input_preparation import create_hp_from_dict, get_input_columns, yield_csv_rows
+from osn_algoritmus.models import HospitalizacnyPripad, Marker
+from osn_algoritmus.utils import get_number_of_lines, setup_parser
+from osn_algoritmus.validation_report import ValidationReport
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"OSNHP\x00\x00\x01"
+"""First bytes of every compiled file, the last byte is the version of the format."""
+
+CASE_STORE_SUFFIX = ".osn"
+
+_CHYBAJUCE_CISLO = -(2**31)
+_CHYBAJUCI_RETAZEC = 2**32 - 1
+_ALIGNMENT = 8
+
+_SECTIONS: dict[str, str] = {
+    "retazce_offsety": "Q",
+    "retazce": "B",
+    "riadky": "I",
+    "id": "I",
+    "vek": "i",
+    "hmotnost": "d",
+    "upv": "i",
+    "druh_prijatia": "i",
+    "drg": "I",
+    "platny": "B",
+    "diagnozy_offsety": "I",
+    "diagnozy": "I",
+    "vykony_offsety": "I",
+    "vykony": "I",
+    "markery_offsety": "I",
+    "markery": "I",
+}
+"""Arrays stored in the file and their `array` typecodes. Missing numbers and strings are stored as sentinels."""
+
+
+class StoredRow(dict):
+    """Row of the input file restored from a compiled store, carrying its already validated pripad.
+
+    `osn_algoritmus.core.Engine.parse` returns the stored pripad instead of validating the row again.
+
+    Attributes:
+        hp: Pripad validated as incomplete, see `create_hp_from_dict`.
+        platny: True, if the pripad passes the validation of complete pripady.
+
+    """
+
+    __slots__ = ("hp", "platny")
+
+    def __init__(self, values: Iterable[tuple[str, str]], hp: HospitalizacnyPripad, *, platny: bool) -> None:
+        """Create the row from its values and the validated pripad."""
+        super().__init__(values)
+        self.hp = hp
+        self.platny = platny
+
+    def pripad(self, *, eval_incomplete: bool) -> HospitalizacnyPripad | None:
+        """Return the pripad as `create_hp_from_dict` would with the same flag, without validating it again."""
+        if eval_incomplete or self.platny:
+            return self.hp
+        return None
+
+
+def is_case_store(path: Path) -> bool:
+    """Return True, if the file is a compiled store of pripady."""
+    with path.open("rb") as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+def _validate(hp_dict: dict, report: ValidationReport | None) -> tuple[HospitalizacnyPripad, bool]:
+    """Validate the row once as a complete pripad and, only if that fails, once more as an incomplete pripad.
+
+    A pripad passing the validation of complete pripady is the same in both modes, because the validation of
+    incomplete pripady differs only in the values it substitutes for incorrect fields.
+    """
+    hp = create_hp_from_dict(hp_dict, eval_incomplete=False, report=report)
+    if hp is not None:
+        return hp, True
+    # Problems were already reported by the first validation.
+    return create_hp_from_dict(hp_dict, eval_incomplete=True, report=ValidationReport()), False
+
+
+def compile_cases(
+    input_path: Path,
+    output_path: Path,
+    *,
+    report: ValidationReport | None = None,
+    reject_path: Path | None = None,
+) -> int:
+    """Validate pripady from a csv file and write them into a binary store.
+
+    Args:
+        input_path: Path to the csv file containing hospitalizacne pripady.
+        output_path: Path to the compiled file.
+        report: If provided, problems found in the pripady are counted in it instead of being logged one by one.
+        reject_path: If provided, malformed lines of the input file are written into this file and skipped.
+
+    Returns:
+        Number of stored pripady.
+
+    Raises:
+        ValueError: If the input file has unexpected columns.
+
+    """
+    columns = get_input_columns(input_path)
+    strings: dict[str, int] = {}
+    arrays = {nazov: array(typecode) for nazov, typecode in _SECTIONS.items()}
+    for nazov in ["diagnozy_offsety", "vykony_offsety", "markery_offsety"]:
+        arrays[nazov].append(0)
+
+    def intern(value: str | None) -> int:
+        if value is None:
+            return _CHYBAJUCI_RETAZEC
+        return strings.setdefault(value, len(strings))
+
+    def number(value: int | None) -> int:
+        return _CHYBAJUCE_CISLO if value is None else value
+
+    number_of_rows = get_number_of_lines(input_path) - 1
+    with logging_redirect_tqdm():
+        for row in tqdm(yield_csv_rows(input_path, reject_path), total=number_of_rows, desc="Kompilácia prípadov"):
+            hp, platny = _validate(row, report)
+            arrays["riadky"].extend(intern(row[column]) for column in columns)
+            arrays["id"].append(intern(hp.id))
+            arrays["vek"].append(number(hp.vek))
+            arrays["hmotnost"].append(math.nan if hp.hmotnost is None else hp.hmotnost)
+            arrays["upv"].append(number(hp.upv))
+            arrays["druh_prijatia"].append(number(hp.druh_prijatia))
+            arrays["drg"].append(intern(hp.drg))
+            arrays["platny"].append(platny)
+            for nazov, kody in [("diagnozy", hp.diagnozy), ("vykony", hp.vykony)]:
+                arrays[nazov].extend(intern(kod) for kod in kody)
+                arrays[f"{nazov}_offsety"].append(len(arrays[nazov]))
+            for marker in hp.markery:
+                arrays["markery"].extend([intern(marker.kod), intern(marker.hodnota)])
+            arrays["markery_offsety"].append(len(arrays["markery"]))
+
+    encoded = [value.encode("utf-8") for value in strings]
+    offset = 0
+    for value in encoded:
+        arrays["retazce_offsety"].append(offset)
+        offset += len(value)
+    arrays["retazce_offsety"].append(offset)
+    arrays["retazce"].frombytes(b"".join(encoded))
+
+    _write(output_path, columns, len(arrays["id"]), arrays)
+    return len(arrays["id"])
+
+
+def _write(path: Path, columns: list[str], pocet_pripadov: int, arrays: dict[str, array]) -> None:
+    """Write the header and the arrays aligned to 8 bytes."""
+    sections = {}
+    offset = 0
+    for nazov, values in arrays.items():
+        sections[nazov] = [offset, len(values)]
+        offset += -(-len(values) * values.itemsize // _ALIGNMENT) * _ALIGNMENT
+    header = {
+        "byteorder": sys.byteorder,
+        "columns": columns,
+        "pocet_pripadov": pocet_pripadov,
+        "sections": sections,
+    }
+    header_bytes = json.dumps(header, ensure_ascii=False).encode("utf-8")
+    header_bytes += b" " * (-len(header_bytes) % _ALIGNMENT)
+
+    with path.open("wb") as f:
+        f.write(MAGIC)
+        f.write(len(header_bytes).to_bytes(8, "little"))
+        f.write(header_bytes)
+        for values in arrays.values():
+            data = values.tobytes()
+            f.write(data)
+            f.write(b"\x00" * (-len(data) % _ALIGNMENT))
+
+
+class CaseStore:
+    """Memory mapped store of pripady compiled by `compile_cases`.
+
+    Args:
+        path: Path to the compiled file.
+
+    Raises:
+        ValueError: If the file is not a compiled store or was compiled on a platform with a different byte order.
+
+    """
+
+    def __init__(self, path: Path) -> None:
+        """Map the file into memory and read its header."""
+        self.path = path
+        with path.open("rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._arrays: dict[str, memoryview] = {}
+        self._buffer = buffer = memoryview(self._mmap)
+        if buffer[: len(MAGIC)] != MAGIC:
+            self.close()
+            msg = f"Súbor {path} nie je skompilovaný súbor prípadov."
+            raise ValueError(msg)
+        header_length = int.from_bytes(buffer[len(MAGIC) : len(MAGIC) + 8], "little")
+        data_start = len(MAGIC) + 8 + header_length
+        header: dict[str, Any] = json.loads(bytes(buffer[len(MAGIC) + 8 : data_start]))
+        if header["byteorder"] != sys.byteorder:
+            self.close()
+            msg = f"Súbor {path} bol skompilovaný na platforme s iným poradím bajtov, skompilujte ho znova."
+            raise ValueError(msg)
+
+        self.columns: list[str] = header["columns"]
+        self._length: int = header["pocet_pripadov"]
+        for nazov, (offset, length) in header["sections"].items():
+            typecode = _SECTIONS[nazov]
+            start = data_start + offset
+            nbytes = length * array(typecode).itemsize
+            self._arrays[nazov] = buffer[start : start + nbytes].cast(typecode)
+        self._strings: list[str | None] = [None] * (len(self._arrays["retazce_offsety"]) - 1)
+
+    def __len__(self) -> int:
+        """Return the number of stored pripady."""
+        return self._length
+
+    def __enter__(self) -> Self:
+        """Return the store."""
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_value: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        """Unmap the file."""
+        self.close()
+
+    def close(self) -> None:
+        """Release the views of the arrays and unmap the file."""
+        for view in [*self._arrays.values(), self._buffer]:
+            view.release()
+        self._arrays = {}
+        self._mmap.close()
+
+    def _string(self, index: int) -> str | None:
+        """Decode the interned string once and return the same object on every later access."""
+        if index == _CHYBAJUCI_RETAZEC:
+            return None
+        value = self._strings[index]
+        if value is None:
+            offsets = self._arrays["retazce_offsety"]
+            value = self._strings[index] = bytes(self._arrays["retazce"][offsets[index] : offsets[index + 1]]).decode()
+        return value
+
+    def _kody(self, nazov: str, index: int) -> list[str]:
+        offsets = self._arrays[f"{nazov}_offsety"]
+        return [self._string(i) for i in self._arrays[nazov][offsets[index] : offsets[index + 1]]]
+
+    def _number(self, nazov: str, index: int) -> int | None:
+        value = self._arrays[nazov][index]
+        return None if value == _CHYBAJUCE_CISLO else value
+
+    def row(self, index: int) -> StoredRow:
+        """Return the row of the input file with the given index together with its validated pripad."""
+        start = index * len(self.columns)
+        values = [self._string(i) for i in self._arrays["riadky"][start : start + len(self.columns)]]
+        hmotnost = self._arrays["hmotnost"][index]
+        markery = self._kody("markery", index)
+        hp = HospitalizacnyPripad(
+            id=self._string(self._arrays["id"][index]),
+            vek=self._number("vek", index),
+            hmotnost=None if math.isnan(hmotnost) else hmotnost,
+            upv=self._number("upv", index),
+            diagnozy=self._kody("diagnozy", index),
+            vykony=self._kody("vykony", index),
+            markery=[
+                Marker(kod=kod, hodnota=hodnota) for kod, hodnota in zip(markery[::2], markery[1::2], strict=True)
+            ],
+            drg=self._string(self._arrays["drg"][index]),
+            druh_prijatia=self._number("druh_prijatia", index),
+        )
+        return StoredRow(zip(self.columns, values, strict=True), hp, platny=bool(self._arrays["platny"][index]))
+
+    def rows(self) -> Generator[StoredRow, None, None]:
+        """Yield all stored rows in the order of the input file."""
+        for index in range(self._length):
+            yield self.row(index)
+
+
+class Input(NamedTuple):
+    """Rows of an opened input file.
+
+    Attributes:
+        columns: Columns of the input file.
+        number_of_rows: Number of rows without the header, used for the progress bar.
+        rows: Rows read lazily as dictionaries keyed by the columns.
+
+    """
+
+    columns: list[str]
+    number_of_rows: int
+    rows: Iterable[dict]
+
+
+@contextlib.contextmanager
+def open_input(input_path: Path, reject_path: Path | None = None) -> Generator[Input, None, None]:
+    """Open a csv file or a compiled store of hospitalizacne pripady, the store is closed on exit.
+
+    Args:
+        input_path: Path to the csv file or to the store compiled by `compile_cases`.
+        reject_path: If provided, malformed lines of the csv file are written into this file and skipped, see
+            `yield_csv_rows`.
+
+    Yields:
+        Columns, number of rows and rows of the input file.
+
+    Raises:
+        ValueError: If reject_path is provided for a store. Malformed lines are rejected when compiling the store.
+
+    """
+    if not is_case_store(input_path):
+        number_of_rows = get_number_of_lines(input_path) - 1
+        yield Input(get_input_columns(input_path), number_of_rows, yield_csv_rows(input_path, reject_path))
+        return
+
+    if reject_path is not None:
+        msg = "Nesprávne formátované riadky skompilovaného vstupu sa odmietajú pri kompilácii, nie pri vyhodnotení."
+        raise ValueError(msg)
+    with CaseStore(input_path) as store:
+        logger.info(f"Vstupný súbor je skompilovaný, prípady sa nebudú znova validovať. Počet prípadov: {len(store)}")
+        yield Input(store.columns, len(store), store.rows())
+
+
+def main(argv: list[str] | None = None) -> None:
+    """Compile a csv file with pripady from the command line."""
+    parser = setup_parser(input_path=True, output_path=True, suhrn_validacie=True, odmietnute_riadky=True)
+    parser.prog = "python -m osn_algoritmus.case_store"
+    parser.description = (
+        "Validácia prípadov zo vstupného súboru a ich uloženie do binárneho súboru, ktorý je možné opakovane"
+        " vyhodnotiť bez čítania a validácie csv súboru."
+    )
+    args = parser.parse_args(argv)
+
+    output_path = args.output_path or args.input_path.with_suffix(CASE_STORE_SUFFIX)
+    report = ValidationReport(args.validacia_subor) if args.suhrn_validacie or args.validacia_subor else None
+    try:
+        pocet = compile_cases(args.input_path, output_path, report=report, reject_path=args.odmietnute_riadky)
+    except ValueError as e:
+        logger.error(e)  # noqa: TRY400, we don't want to display the traceback to the end user
+        sys.exit(1)
+    finally:
+        if report is not None:
+            report.close()
+    if report is not None:
+        logger.info(f"Súhrn problémov vo vstupných dátach:\n{report.summary()}")
+    logger.info(f"Počet skompilovaných prípadov: {pocet}. Výsledok je v {output_path}")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
+    main()
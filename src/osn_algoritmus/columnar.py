@@ -0,0 +1,382 @@
+"""Columnar evaluation of batches of hospitalizacne pripady with NumPy.
+
+Codes of a batch of validated pripady are interned into integer ids and stored in flat arrays with offsets. The
+lookup-style prilohy (17, 7a/8a, 9a, 12/13 and 14/15) are evaluated for the whole batch at once as joins of these
+arrays with sorted arrays of the prepared tables by `searchsorted`. The remaining prilohy are evaluated by their
+Python functions. Urovne of the whole batch are looked up at once by `UrovneMs.lookup_many`. Validation is done by the
+Engine, so the results are the same as from `Engine.evaluate`.
+
+NumPy is an optional dependency (`pip install '.[numpy]'`). Without it, `create_batch_evaluator` returns the Engine
+itself, which evaluates the batches row by row.
+"""
+
+from __future__ import annotations
+
+import itertools
+import logging
+from typing import TYPE_CHECKING, NamedTuple
+
+from osn_algoritmus.core import Engine
+from osn_algoritmus.prilohy_evaluation import PRILOHY, PRILOHY_S_HLAVNYM_VYKONOM, report_chybajuce_urovne
+
+try:
+    import numpy as np
+except ImportError:  # optional dependency, see `create_batch_evaluator`
+    np = None
+
+if TYPE_CHECKING:
+    from collections.abc import Generator, Iterable
+
+    from osn_algoritmus.models import HospitalizacnyPripad
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 10_000
+
+STLPCOVE_PRILOHY = ["17", "7a_8a", "9a", "12_13", "14_15"]
+"""Prilohy evaluated by joins of arrays, the other prilohy are evaluated by their Python functions."""
+
+NEZNAMY_KOD = -1
+"""Id of codes, which are not in any of the tables, never matching a row."""
+
+
+class ColumnarBatch(NamedTuple):
+    """Batch of validated hospitalizacne pripady in columnar form.
+
+    Codes of pripad i are `kody[offsets[i]:offsets[i + 1]]` in the order of the input.
+
+    Attributes:
+        je_dieta: 1 for dieta, 0 for dospely, -1 if vek is not known or the pripad is invalid.
+        vykony: Ids of vykony.
+        vykony_offsets: Offsets of vykony of each pripad, of length number of pripady + 1.
+        diagnozy: Ids of diagnozy.
+        diagnozy_offsets: Offsets of diagnozy of each pripad.
+        markery: Ids of markery.
+        markery_offsets: Offsets of markery of each pripad.
+
+    """
+
+    je_dieta: np.ndarray
+    vykony: np.ndarray
+    vykony_offsets: np.ndarray
+    diagnozy: np.ndarray
+    diagnozy_offsets: np.ndarray
+    markery: np.ndarray
+    markery_offsets: np.ndarray
+
+    @classmethod
+    def from_hps(cls, hps: list[HospitalizacnyPripad | None], ids: dict) -> ColumnarBatch:
+        """Create the batch from validated pripady, None for invalid pripady.
+
+        Args:
+            hps: Validated hospitalizacne pripady.
+            ids: Ids of codes and markery from the tables, other codes get the id `NEZNAMY_KOD`.
+
+        Returns:
+            Batch in columnar form.
+
+        """
+
+        def to_arrays(values: list[list]) -> tuple[np.ndarray, np.ndarray]:
+            offsets = np.zeros(len(values) + 1, dtype=np.int64)
+            np.cumsum([len(codes) for codes in values], out=offsets[1:])
+            flat = [ids.get(code, NEZNAMY_KOD) for codes in values for code in codes]
+            return np.array(flat, dtype=np.int64), offsets
+
+        empty: list = []
+        vykony, vykony_offsets = to_arrays([empty if hp is None else hp.vykony for hp in hps])
+        diagnozy, diagnozy_offsets = to_arrays([empty if hp is None else hp.diagnozy for hp in hps])
+        markery, markery_offsets = to_arrays([empty if hp is None else hp.markery for hp in hps])
+        je_dieta = [-1 if hp is None or hp.je_dieta is None else int(hp.je_dieta) for hp in hps]
+        return cls(
+            np.array(je_dieta, dtype=np.int8),
+            vykony,
+            vykony_offsets,
+            diagnozy,
+            diagnozy_offsets,
+            markery,
+            markery_offsets,
+        )
+
+
+class _Lookup(NamedTuple):
+    """Rows of a prepared table sorted by the id of the key column, rows without the key are left out."""
+
+    keys: np.ndarray
+    rows: np.ndarray
+
+    @classmethod
+    def create(cls, keys: list[int]) -> _Lookup:
+        """Sort ids of keys of rows, `NEZNAMY_KOD` marks rows without the key."""
+        array = np.array(keys, dtype=np.int64)
+        rows = np.argsort(array, kind="stable")
+        rows = rows[array[rows] != NEZNAMY_KOD]
+        return cls(array[rows], rows)
+
+
+def _elements(offsets: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Return the index of pripad and the position within the pripad of every element of a flat array of codes."""
+    lengths = np.diff(offsets)
+    cases = np.repeat(np.arange(len(lengths)), lengths)
+    positions = np.arange(offsets[-1]) - np.repeat(offsets[:-1], lengths)
+    return cases, positions
+
+
+def _join(cases: np.ndarray, keys: np.ndarray, lookup: _Lookup) -> tuple[np.ndarray, np.ndarray]:
+    """Return the pripad and the row of the table for every pair of a key and a row with the same key.
+
+    Pairs keep the order of keys and rows of the same key are ordered by their index in the table.
+    """
+    left = np.searchsorted(lookup.keys, keys, side="left")
+    counts = np.searchsorted(lookup.keys, keys, side="right") - left
+    starts = np.cumsum(counts) - counts
+    indices = np.arange(counts.sum()) - np.repeat(starts - left, counts)
+    return np.repeat(cases, counts), lookup.rows[indices]
+
+
+def _unique_pairs(cases: np.ndarray, rows: np.ndarray, number_of_rows: int) -> np.ndarray:
+    """Encode pairs of pripad and row into sorted unique integers."""
+    return np.unique(cases * number_of_rows + rows)
+
+
+class ColumnarEvaluator:
+    """Evaluate batches of hospitalizacne pripady with lookup-style prilohy evaluated by joins of NumPy arrays.
+
+    Args:
+        engine: Engine providing the rule set, the flags, validation of pripady and assignment of urovne.
+
+    """
+
+    def __init__(self, engine: Engine | None = None) -> None:
+        """Intern codes of the tables and sort the tables by their key columns."""
+        if np is None:
+            msg = "Stĺpcové vyhodnotenie vyžaduje balík numpy, nainštalujte ho: pip install '.[numpy]'."
+            raise ImportError(msg)
+        self.engine = Engine() if engine is None else engine
+        self.prilohy = [nazov for nazov in PRILOHY if self.engine.prilohy is None or nazov in self.engine.prilohy]
+        self.ids: dict = {}
+        tables = self.engine.rule_set.tables
+
+        self.kody_ms: dict[str, list[str]] = {}
+        self.lookups: dict[tuple[str, str], _Lookup] = {}
+        columns = {
+            "17": {"p17_M": ["marker"]},
+            "7a_8a": {"p7a_MV_deti": ["kod_vykonu", "marker"], "p8a_MV_dospeli": ["kod_vykonu", "marker"]},
+            "9a": {"p9a_MD_dospeli": ["kod_hlavnej_diagnozy", "marker"]},
+            "12_13": {"p12_V_deti": ["kod_vykonu"], "p13_V_dospeli": ["kod_vykonu"]},
+            "14_15": {"p14_D_deti": ["kod_diagnozy"], "p15_D_dospeli": ["kod_diagnozy"]},
+        }
+        for nazov in STLPCOVE_PRILOHY:
+            if nazov not in self.prilohy:
+                continue
+            for table_name, key_columns in columns[nazov].items():
+                rows = tables[table_name]
+                self.kody_ms[table_name] = [row["kod_ms"] for row in rows]
+                for column in key_columns:
+                    keys = [NEZNAMY_KOD if row[column] is None else self._intern(row[column]) for row in rows]
+                    self.lookups[table_name, column] = _Lookup.create(keys)
+        self._stlpcove_prilohy = {
+            "17": self._priloha_17,
+            "7a_8a": self._prilohy_7a_8a,
+            "9a": self._priloha_9a,
+            "12_13": self._prilohy_12_13,
+            "14_15": self._prilohy_14_15,
+        }
+
+    def _intern(self, code: object) -> int:
+        """Return the id of the code or the marker, assigning a new one if needed."""
+        return self.ids.setdefault(code, len(self.ids))
+
+    def _match_elements(
+        self,
+        batch: ColumnarBatch,
+        kody: str,
+        lookup: _Lookup,
+        je_dieta: int | None,
+        *,
+        first_only: bool,
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Join vykony, diagnozy or markery of pripady with the given je_dieta to the rows of a table."""
+        cases, positions = _elements(getattr(batch, f"{kody}_offsets"))
+        mask = np.ones(len(cases), dtype=bool) if je_dieta is None else batch.je_dieta[cases] == je_dieta
+        if first_only:
+            mask &= positions == 0
+        return _join(cases[mask], getattr(batch, kody)[mask], lookup)
+
+    def _prilohy_12_13(
+        self,
+        batch: ColumnarBatch,
+        hps: list[HospitalizacnyPripad | None],  # noqa: ARG002, same signature for all prilohy
+    ) -> list[tuple[np.ndarray, list[str]]]:
+        first_only = not self.engine.all_vykony_hlavne
+        return [
+            (cases, [self.kody_ms[table_name][row] for row in rows.tolist()])
+            for table_name, je_dieta in [("p12_V_deti", 1), ("p13_V_dospeli", 0)]
+            for cases, rows in [
+                self._match_elements(
+                    batch,
+                    "vykony",
+                    self.lookups[table_name, "kod_vykonu"],
+                    je_dieta,
+                    first_only=first_only,
+                ),
+            ]
+        ]
+
+    def _prilohy_14_15(
+        self,
+        batch: ColumnarBatch,
+        hps: list[HospitalizacnyPripad | None],  # noqa: ARG002, same signature for all prilohy
+    ) -> list[tuple[np.ndarray, list[str]]]:
+        return [
+            (cases, [self.kody_ms[table_name][row] for row in rows.tolist()])
+            for table_name, je_dieta in [("p14_D_deti", 1), ("p15_D_dospeli", 0)]
+            for cases, rows in [
+                self._match_elements(
+                    batch,
+                    "diagnozy",
+                    self.lookups[table_name, "kod_diagnozy"],
+                    je_dieta,
+                    first_only=True,
+                ),
+            ]
+        ]
+
+    def _priloha_17(
+        self,
+        batch: ColumnarBatch,
+        hps: list[HospitalizacnyPripad | None],  # noqa: ARG002, same signature for all prilohy
+    ) -> list[tuple[np.ndarray, list[str]]]:
+        number_of_rows = max(len(self.kody_ms["p17_M"]), 1)
+        cases, rows = self._match_elements(batch, "markery", self.lookups["p17_M", "marker"], None, first_only=False)
+        pairs = _unique_pairs(cases, rows, number_of_rows)
+        return [(pairs // number_of_rows, [self.kody_ms["p17_M"][row] for row in (pairs % number_of_rows).tolist()])]
+
+    def _prilohy_7a_8a(
+        self,
+        batch: ColumnarBatch,
+        hps: list[HospitalizacnyPripad | None],  # noqa: ARG002, same signature for all prilohy
+    ) -> list[tuple[np.ndarray, list[str]]]:
+        results = []
+        for table_name, je_dieta in [("p7a_MV_deti", 1), ("p8a_MV_dospeli", 0)]:
+            number_of_rows = max(len(self.kody_ms[table_name]), 1)
+            vykony = _unique_pairs(
+                *self._match_elements(
+                    batch,
+                    "vykony",
+                    self.lookups[table_name, "kod_vykonu"],
+                    je_dieta,
+                    first_only=False,
+                ),
+                number_of_rows,
+            )
+            markery = _unique_pairs(
+                *self._match_elements(batch, "markery", self.lookups[table_name, "marker"], je_dieta, first_only=False),
+                number_of_rows,
+            )
+            pairs = np.intersect1d(vykony, markery, assume_unique=True)
+            kody_ms = self.kody_ms[table_name]
+            results.append((pairs // number_of_rows, [kody_ms[row] for row in (pairs % number_of_rows).tolist()]))
+        return results
+
+    def _priloha_9a(
+        self,
+        batch: ColumnarBatch,
+        hps: list[HospitalizacnyPripad | None],
+    ) -> list[tuple[np.ndarray, list[str]]]:
+        table_name = "p9a_MD_dospeli"
+        number_of_rows = max(len(self.kody_ms[table_name]), 1)
+        # hlavna diagnoza matches a row if the row contains any of its prefixes, ids of all prefixes are joined
+        prefixes = [
+            (case, self.ids.get(hp.diagnozy[0][:length], NEZNAMY_KOD))
+            for case, hp in enumerate(hps)
+            if hp is not None and hp.je_dieta is False and hp.diagnozy and hp.markery
+            for length in range(len(hp.diagnozy[0]) + 1)
+        ]
+        cases = np.array([case for case, _ in prefixes], dtype=np.int64)
+        keys = np.array([key for _, key in prefixes], dtype=np.int64)
+        diagnozy = _unique_pairs(*_join(cases, keys, self.lookups[table_name, "kod_hlavnej_diagnozy"]), number_of_rows)
+        markery = _unique_pairs(
+            *self._match_elements(batch, "markery", self.lookups[table_name, "marker"], 0, first_only=False),
+            number_of_rows,
+        )
+        pairs = np.intersect1d(diagnozy, markery, assume_unique=True)
+        kody_ms = self.kody_ms[table_name]
+        return [(pairs // number_of_rows, [kody_ms[row] for row in (pairs % number_of_rows).tolist()])]
+
+    def _assign_ms(self, hps: list[HospitalizacnyPripad | None]) -> list[list[str]]:
+        """Return lists of medicinske sluzby assigned by the evaluated prilohy, in the order of `prirad_ms`."""
+        batch = ColumnarBatch.from_hps(hps, self.ids)
+        sluzby: list[list[str]] = [[] for _ in hps]
+        for nazov in self.prilohy:
+            if nazov in self._stlpcove_prilohy:
+                for cases, kody_ms in self._stlpcove_prilohy[nazov](batch, hps):
+                    for case, kod_ms in zip(cases.tolist(), kody_ms, strict=True):
+                        sluzby[case].append(kod_ms)
+                continue
+            kwargs = {"all_vykony_hlavne": self.engine.all_vykony_hlavne} if nazov in PRILOHY_S_HLAVNYM_VYKONOM else {}
+            for case, hp in enumerate(hps):
+                if hp is not None:
+                    sluzby[case].extend(PRILOHY[nazov](hp, rule_set=self.engine.rule_set, **kwargs))
+        return sluzby
+
+    def evaluate_batch(self, hp_dicts: list[dict]) -> list[tuple[str, str] | None]:
+        """Evaluate a batch of hospitalizacne pripady.
+
+        Args:
+            hp_dicts: dictionaries representing hospitalizacne pripady.
+
+        Returns:
+            Result of `Engine.evaluate` for each dictionary, in the same order.
+
+        """
+        hps = [self.engine.parse(hp_dict) for hp_dict in hp_dicts]
+        medicinske_sluzby = []
+        for hp, sluzby in zip(hps, self._assign_ms(hps), strict=True):
+            if hp is not None and not sluzby and self.engine.unmatched is not None:
+                self.engine.unmatched.add(hp)
+            sluzby_hp = [] if hp is None else sluzby or ["S99-99"]
+            medicinske_sluzby.append(sluzby_hp[:1] if self.engine.only_hlavna_ms else sluzby_hp)
+
+        results = []
+        vek_categories = [None if hp is None else hp.vek_category_index for hp in hps]
+        urovne = self.engine.rule_set.urovne.lookup_many(medicinske_sluzby, vek_categories)
+        for hp, sluzby, urovne_ms, vek_category in zip(hps, medicinske_sluzby, urovne, vek_categories, strict=True):
+            if hp is None:
+                results.append(None)
+                continue
+            if vek_category is not None:
+                report_chybajuce_urovne(hp, sluzby, urovne_ms, report=self.engine.report)
+            results.append(self.engine.format_result(hp, sluzby, urovne_ms))
+        return results
+
+    def evaluate_many(
+        self,
+        hp_dicts: Iterable[dict],
+        batch_size: int = DEFAULT_BATCH_SIZE,
+    ) -> Generator[tuple[str, str] | None, None, None]:
+        """Lazily evaluate hospitalizacne pripady from any iterable in batches.
+
+        Args:
+            hp_dicts: dictionaries representing hospitalizacne pripady.
+            batch_size: Number of pripady evaluated at once.
+
+        Yields:
+            Result of `Engine.evaluate` for each dictionary, in the same order.
+
+        """
+        iterator = iter(hp_dicts)
+        while batch := list(itertools.islice(iterator, batch_size)):
+            yield from self.evaluate_batch(batch)
+
+
+def create_batch_evaluator(engine: Engine | None = None) -> ColumnarEvaluator | Engine:
+    """Return a ColumnarEvaluator for the engine, or the engine itself if NumPy is not installed.
+
+    Both have methods `evaluate_batch` and `evaluate_many` returning the same results.
+    """
+    engine = Engine() if engine is None else engine
+    if np is None:
+        logger.info("Balík numpy nie je nainštalovaný, prípady sa vyhodnotia po jednom.")
+        return engine
+    return ColumnarEvaluator(engine)
@@ -1,106 +1,620 @@
 """Core functionality of the osn_algoritmus package."""
 
+import contextlib
 import csv
+import functools
 import logging
+from collections.abc import Collection, Generator, Iterable
 from pathlib import Path
+from typing import Any, TextIO
 
 from tqdm import tqdm
 from tqdm.contrib.logging import logging_redirect_tqdm
 
-from osn_algoritmus.input_preparation import check_csv_columns, create_hp_from_dict, yield_csv_rows
-from osn_algoritmus.prilohy_evaluation import prirad_ms, prirad_urovne_ms
-from osn_algoritmus.utils import CSV_DELIMITER, INPUT_COLUMNS, deduplicate_ms, get_number_of_lines
+from osn_algoritmus.aggregation import Aggregation
+from osn_algoritmus.case_store import StoredRow, is_case_store, open_input
+from osn_algoritmus.heavy_hitters import UnmatchedCodes
+from osn_algoritmus.input_preparation import (
+    create_hp_from_dict,
+    validate_datum_prijatia,
+)
+from osn_algoritmus.instrumentation import Instrumentation
+from osn_algoritmus.models import HospitalizacnyPripad
+from osn_algoritmus.pipeline import run_pipeline
+from osn_algoritmus.prilohy_evaluation import (
+    PRILOHY,
+    EvaluationHooks,
+    PrefilterStats,
+    get_relevantne_kody,
+    prirad_ms,
+    prirad_urovne_ms,
+)
+from osn_algoritmus.prilohy_preparation import (
+    RuleSet,
+    RuleSetRegistry,
+    load_default_rule_set,
+    load_rule_set,
+    tables_for_prilohy,
+)
+from osn_algoritmus.utils import (
+    CSV_DELIMITER,
+    DATUM_PRIJATIA_COLUMN,
+    INPUT_COLUMNS,
+    deduplicate_ms,
+)
+from osn_algoritmus.validation_report import Issue, ValidationReport, report_issue
 
 logger = logging.getLogger(__name__)
 
 
-def process_hp_dict(
+class Engine:
+    """Evaluate hospitalizacne pripady against one loaded rule set with a fixed configuration of flags.
+
+    Several engines with different rule sets or flags can coexist in one process.
+
+    Args:
+        rule_set: Prepared prilohy. Defaults to prilohy distributed with the package.
+        all_vykony_hlavne: When evaluating prilohy, assume that any of vykony could be hlavny.
+        evaluate_incomplete_pripady: If a required value is not filled in, continue with the evaluation anyway.
+            Without this flag, the result for such a pripad is None.
+        allow_duplicates: Keep duplicate records in the output list of medicinske sluzby.
+        instrumentation: If provided, time spent in validation, individual prilohy and assignment of urovne is
+            measured by it.
+        only_hlavna_ms: Return only the hlavna medicinska sluzba and its uroven. Evaluation stops at the first
+            priloha assigning a medicinska sluzba, the result is the same as the first element in the full mode.
+        prilohy: If provided, only these prilohy (names from `PRILOHY`) are evaluated. Without rule_set, only the
+            tables needed by them are kept from the prilohy distributed with the package.
+        report: If provided, problems found in validation and in assignment of urovne are counted in it instead of
+            being logged as warnings or errors.
+        prefilter: Before the evaluation of every pripad, skip the prilohy the pripad cannot match because it has
+            none of the codes referenced by them, see `get_relevantne_kody`. The result does not change. Skipped
+            prilohy and pripady on the fast path (at most priloha 14/15 evaluated) are counted in `prefilter_stats`.
+        unmatched: If provided, hlavna diagnoza, hlavny vykon and DRG of pripady assigned to "S99-99" are counted in
+            it.
+
+    Raises:
+        ValueError: If rule_set does not contain a table needed to evaluate the selected prilohy.
+
+    """
+
+    def __init__(  # noqa: PLR0913, keyword-only flags mirroring the options of the command line
+        self,
+        rule_set: RuleSet | None = None,
+        *,
+        all_vykony_hlavne: bool = False,
+        evaluate_incomplete_pripady: bool = False,
+        allow_duplicates: bool = False,
+        instrumentation: Instrumentation | None = None,
+        only_hlavna_ms: bool = False,
+        prilohy: Collection[str] | None = None,
+        report: ValidationReport | None = None,
+        prefilter: bool = False,
+        unmatched: UnmatchedCodes | None = None,
+    ) -> None:
+        """Create the engine."""
+        if rule_set is None:
+            rule_set = load_default_rule_set(prilohy)
+        missing_tables = set(tables_for_prilohy(PRILOHY if prilohy is None else prilohy)) - rule_set.tables.keys()
+        if missing_tables:
+            msg = f"V prílohách chýbajú tabuľky potrebné na vyhodnotenie: {sorted(missing_tables)}."
+            raise ValueError(msg)
+
+        self.rule_set = rule_set
+        self.all_vykony_hlavne = all_vykony_hlavne
+        self.evaluate_incomplete_pripady = evaluate_incomplete_pripady
+        self.allow_duplicates = allow_duplicates
+        self.instrumentation = instrumentation
+        self.only_hlavna_ms = only_hlavna_ms
+        self.prilohy = None if prilohy is None else tuple(prilohy)
+        self.report = report
+        self.prefilter = prefilter
+        self.relevantne_kody = get_relevantne_kody(rule_set, prilohy) if prefilter else None
+        self.prefilter_stats = PrefilterStats()
+        self.unmatched = unmatched
+        self.hooks = EvaluationHooks(instrumentation, unmatched)
+
+    @classmethod
+    def from_folder(cls, tables_folder: Path, **kwargs: Any) -> "Engine":  # noqa: ANN401
+        """Create an engine with prilohy loaded from the given folder.
+
+        Args:
+            tables_folder: Folder containing csv files of prilohy.
+            kwargs: Flags passed to the constructor. If `prilohy` are selected, only the tables needed by them are
+                loaded.
+
+        Returns:
+            New engine.
+
+        """
+        return cls(load_rule_set(tables_folder, prilohy=kwargs.get("prilohy")), **kwargs)
+
+    @property
+    def flags(self) -> dict[str, Any]:
+        """Configuration of flags, accepted as keyword arguments by the constructor."""
+        return {
+            "all_vykony_hlavne": self.all_vykony_hlavne,
+            "evaluate_incomplete_pripady": self.evaluate_incomplete_pripady,
+            "allow_duplicates": self.allow_duplicates,
+            "only_hlavna_ms": self.only_hlavna_ms,
+            "prilohy": self.prilohy,
+            "prefilter": self.prefilter,
+        }
+
+    def with_rule_set(self, rule_set: RuleSet) -> "Engine":
+        """Return an engine with the same flags, instrumentation and report evaluating against another rule set.
+
+        Counts of the prefilter and of unmatched kody are shared with this engine.
+        """
+        engine = Engine(
+            rule_set,
+            instrumentation=self.instrumentation,
+            report=self.report,
+            unmatched=self.unmatched,
+            **self.flags,
+        )
+        engine.prefilter_stats = self.prefilter_stats
+        return engine
+
+    def relevantne_prilohy(self, hp: HospitalizacnyPripad) -> Collection[str] | None:
+        """Return the evaluated prilohy, without the prilohy the hp cannot match if the prefilter is on."""
+        if self.relevantne_kody is None:
+            return self.prilohy
+        prilohy = [nazov for nazov, kody in self.relevantne_kody.items() if kody.moze_splnat(hp)]
+        self.prefilter_stats.add(self.relevantne_kody, prilohy)
+        return prilohy
+
+    def parse(self, hp_dict: dict) -> HospitalizacnyPripad | None:
+        """Validate raw dictionary with hp data and create HospitalizacnyPripad.
+
+        Rows read from a compiled store of pripady are not validated again, see `osn_algoritmus.case_store`.
+
+        Args:
+            hp_dict: dictionary representing hospitalizacny pripad.
+
+        Returns:
+            Created HospitalizacnyPripad or None if the hp_dict is invalid.
+
+        """
+        if isinstance(hp_dict, StoredRow):
+            return hp_dict.pripad(eval_incomplete=self.evaluate_incomplete_pripady)
+
+        if self.instrumentation is None:
+            return create_hp_from_dict(hp_dict, eval_incomplete=self.evaluate_incomplete_pripady, report=self.report)
+
+        with self.instrumentation.stage("validacia"):
+            return create_hp_from_dict(hp_dict, eval_incomplete=self.evaluate_incomplete_pripady, report=self.report)
+
+    def evaluate_hp(self, hp: HospitalizacnyPripad) -> tuple[str, str]:
+        """Assign medicinske sluzby and their urovne to a validated hp.
+
+        Args:
+            hp: Hospitalizacny pripad
+
+        Returns:
+            Kody medicinskych sluzieb concatenated by '@' and urovne medicinskych sluzieb concatenated by '@'.
+
+        """
+        if self.instrumentation is None:
+            medicinske_sluzby = prirad_ms(
+                hp,
+                all_vykony_hlavne=self.all_vykony_hlavne,
+                rule_set=self.rule_set,
+                only_hlavna=self.only_hlavna_ms,
+                prilohy=self.relevantne_prilohy(hp),
+                hooks=self.hooks,
+            )
+            return self.format_result(hp, medicinske_sluzby)
+
+        with self.instrumentation.stage("prilohy"):
+            medicinske_sluzby = prirad_ms(
+                hp,
+                all_vykony_hlavne=self.all_vykony_hlavne,
+                rule_set=self.rule_set,
+                only_hlavna=self.only_hlavna_ms,
+                prilohy=self.relevantne_prilohy(hp),
+                hooks=self.hooks,
+            )
+        with self.instrumentation.stage("urovne"):
+            return self.format_result(hp, medicinske_sluzby)
+
+    def format_result(
+        self,
+        hp: HospitalizacnyPripad,
+        medicinske_sluzby: list[str],
+        urovne_ms: list[int | None] | None = None,
+    ) -> tuple[str, str]:
+        """Assign urovne to medicinske sluzby, remove duplicates if required and join both lists into strings.
+
+        Urovne are not assigned again if they are provided, e.g. looked up for a whole batch.
+        """
+        if urovne_ms is None:
+            urovne_ms = prirad_urovne_ms(hp, medicinske_sluzby, rule_set=self.rule_set, report=self.report)
+
+        if not self.allow_duplicates:
+            medicinske_sluzby, urovne_ms = deduplicate_ms(medicinske_sluzby, urovne_ms)
+
+        ms_str = "@".join(medicinske_sluzby)
+        urovne_ms_str = "@".join(str(uroven or "<NA>") for uroven in urovne_ms)
+
+        return ms_str, urovne_ms_str
+
+    def evaluate(self, hp_dict: dict) -> tuple[str, str] | None:
+        """Validate raw dictionary with hp data and assign medicinske sluzby.
+
+        Args:
+            hp_dict: dictionary representing hospitalizacny pripad.
+
+        Returns:
+            Kody medicinskych sluzieb concatenated by '@' and urovne medicinskych sluzieb concatenated by '@' or None
+            if the hp_dict is invalid.
+
+        """
+        hp = self.parse(hp_dict)
+
+        if hp is None:
+            return None
+
+        return self.evaluate_hp(hp)
+
+    def evaluate_many(self, hp_dicts: Iterable[dict]) -> Generator[tuple[str, str] | None, None, None]:
+        """Lazily evaluate hospitalizacne pripady from any iterable.
+
+        Args:
+            hp_dicts: dictionaries representing hospitalizacne pripady.
+
+        Yields:
+            Result of `evaluate` for each dictionary, in the same order.
+
+        """
+        for hp_dict in hp_dicts:
+            yield self.evaluate(hp_dict)
+
+    def evaluate_batch(self, hp_dicts: list[dict]) -> list[tuple[str, str] | None]:
+        """Evaluate a batch of hospitalizacne pripady.
+
+        Args:
+            hp_dicts: dictionaries representing hospitalizacne pripady.
+
+        Returns:
+            Results of `evaluate` in the same order as the input dictionaries.
+
+        """
+        return [self.evaluate(hp_dict) for hp_dict in hp_dicts]
+
+
+class DatedEngines:
+    """Select the engine with prilohy in force on datum prijatia of hospitalizacny pripad.
+
+    Args:
+        registry: Rule sets indexed by the date from which they are in force.
+        default_engine: Engine used for pripady without datum prijatia. Its flags and instrumentation are shared by the
+            engines of all rule sets in the registry.
+
+    """
+
+    def __init__(self, registry: RuleSetRegistry, default_engine: Engine) -> None:
+        """Create one engine for every rule set in the registry."""
+        self.registry = registry
+        self.default_engine = default_engine
+        self._engines = {
+            valid_from: default_engine.with_rule_set(rule_set) for valid_from, rule_set in registry.items()
+        }
+
+    def select(self, hp_dict: dict) -> Engine | None:
+        """Return the engine for the hp.
+
+        Args:
+            hp_dict: dictionary representing hospitalizacny pripad, optionally with key `datum_prijatia`.
+
+        Returns:
+            Engine with prilohy in force on datum prijatia, the default engine if datum prijatia is not filled in, or
+            None if datum prijatia is incorrect or precedes all rule sets (the default engine if incomplete pripady
+            are evaluated).
+
+        """
+        datum_prijatia_str = hp_dict.get(DATUM_PRIJATIA_COLUMN, "")
+        err_if_incorrect = not self.default_engine.evaluate_incomplete_pripady
+        report = self.default_engine.report
+        datum_prijatia = validate_datum_prijatia(
+            datum_prijatia_str,
+            hp_dict["id"],
+            err_if_incorrect=err_if_incorrect,
+            report=report,
+        )
+        if datum_prijatia is None:
+            return None if err_if_incorrect and datum_prijatia_str else self.default_engine
+
+        found = self.registry.find(datum_prijatia)
+        if found is None:
+            msg = f"HP {hp_dict['id']} má dátum prijatia {datum_prijatia} pred účinnosťou všetkých verzií príloh."
+            issue = Issue(hp_dict["id"], DATUM_PRIJATIA_COLUMN, "pred_ucinnostou")
+            report_issue(logger, msg, issue, error=err_if_incorrect, report=report)
+            return None if err_if_incorrect else self.default_engine
+        valid_from, _ = found
+        return self._engines[valid_from]
+
+
+ENGINE_CACHE_SIZE = 32
+"""Number of engines with different flags kept by `process_hp_dict`."""
+
+
+@functools.lru_cache(maxsize=ENGINE_CACHE_SIZE)
+def _cached_engine(
+    *,
+    all_vykony_hlavne: bool,
+    evaluate_incomplete_pripady: bool,
+    allow_duplicates: bool,
+    only_hlavna_ms: bool,
+    prilohy: tuple[str, ...] | None,
+) -> Engine:
+    """Return an engine with prilohy distributed with the package, created once for every combination of flags."""
+    return Engine(
+        all_vykony_hlavne=all_vykony_hlavne,
+        evaluate_incomplete_pripady=evaluate_incomplete_pripady,
+        allow_duplicates=allow_duplicates,
+        only_hlavna_ms=only_hlavna_ms,
+        prilohy=prilohy,
+    )
+
+
+def process_hp_dict(  # noqa: PLR0913, keyword-only flags mirroring the options of the command line
     hp_dict: dict,
     *,
     all_vykony_hlavne: bool = False,
     evaluate_incomplete_pripady: bool = False,
     allow_duplicates: bool = False,
+    rule_set: RuleSet | None = None,
+    only_hlavna_ms: bool = False,
+    prilohy: Collection[str] | None = None,
 ) -> tuple[str, str] | None:
     """Process raw dictionary with hp data by validating it and assigning medicinske sluzby.
 
+    Engines with prilohy distributed with the package are cached for every combination of flags, so repeated calls do
+    not create them again. Create an `Engine` to evaluate many pripady against another rule_set.
+
     Args:
         hp_dict: dictionary representing hospitalizacny pripad.
         all_vykony_hlavne: When evaluating prilohy, assume that any of vykony could be hlavny.
         evaluate_incomplete_pripady: If a required value is not filled in, continue with the evaluation anyway.
             Without this flag, the function will return 'ERROR'.
         allow_duplicates: Keep duplicate records in the output list of medicinske sluzby.
+        rule_set: Prepared prilohy. Defaults to prilohy distributed with the package.
+        only_hlavna_ms: Return only the hlavna medicinska sluzba and its uroven.
+        prilohy: If provided, only these prilohy (names from `PRILOHY`) are evaluated.
 
     Returns:
         Kody medicinskych sluzieb concatenated by '@' and urovne medicinskych sluzieb concatenated by '@' or None if
         the hp_dict is invalid.
 
     """
-    hp = create_hp_from_dict(hp_dict, eval_incomplete=evaluate_incomplete_pripady)
+    flags = {
+        "all_vykony_hlavne": all_vykony_hlavne,
+        "evaluate_incomplete_pripady": evaluate_incomplete_pripady,
+        "allow_duplicates": allow_duplicates,
+        "only_hlavna_ms": only_hlavna_ms,
+        "prilohy": None if prilohy is None else tuple(prilohy),
+    }
+    engine = _cached_engine(**flags) if rule_set is None else Engine(rule_set, **flags)
+    return engine.evaluate(hp_dict)
 
-    if hp is None:
-        return None
 
-    medicinske_sluzby = prirad_ms(hp, all_vykony_hlavne=all_vykony_hlavne)
-    urovne_ms = prirad_urovne_ms(hp, medicinske_sluzby)
+SHADOW_COLUMNS = ["ms_shadow", "urovne_ms_shadow", "zmena_shadow"]
+"""Columns added to the output of `process_csv` by the shadow evaluation."""
 
-    if not allow_duplicates:
-        medicinske_sluzby, urovne_ms = deduplicate_ms(medicinske_sluzby, urovne_ms)
 
-    ms_str = "@".join(medicinske_sluzby)
-    urovne_ms_str = "@".join(str(uroven or "<NA>") for uroven in urovne_ms)
+class _RowEvaluator:
+    """Evaluate a row of the input file and add the columns with the results to it.
 
-    return ms_str, urovne_ms_str
+    Args:
+        engine: Engine evaluating the pripady.
+        registry: If provided, pripady are evaluated against the prilohy in force on datum prijatia, see
+            `DatedEngines`.
+        shadow_engine: If provided, every pripad is evaluated also by this engine into `SHADOW_COLUMNS`.
 
+    """
+
+    def __init__(
+        self,
+        engine: Engine,
+        *,
+        registry: RuleSetRegistry | None = None,
+        shadow_engine: Engine | None = None,
+    ) -> None:
+        self.engine = engine
+        self.dated_engines = None if registry is None else DatedEngines(registry, engine)
+        self.shadow_engine = shadow_engine
+        self.columns = ["ms", "urovne_ms", *([] if shadow_engine is None else SHADOW_COLUMNS)]
+
+    def __call__(self, row: dict) -> dict:
+        row_engine = self.engine if self.dated_engines is None else self.dated_engines.select(row)
+
+        if self.shadow_engine is None:
+            ms_result = None if row_engine is None else row_engine.evaluate(row)
+        else:
+            hp = None if row_engine is None else row_engine.parse(row)
+            ms_result = None if hp is None else row_engine.evaluate_hp(hp)
+            shadow_result = ("ERROR", "ERROR") if hp is None else self.shadow_engine.evaluate_hp(hp)
+            row["ms_shadow"], row["urovne_ms_shadow"] = shadow_result
+            row["zmena_shadow"] = int(ms_result is not None and ms_result != shadow_result)
+
+        row["ms"], row["urovne_ms"] = ("ERROR", "ERROR") if ms_result is None else ms_result
+        return row
+
+
+class _OutputSink:
+    """Output file of `process_csv` receiving the evaluated rows.
+
+    Args:
+        output_file: Opened output file.
+        fieldnames: Columns of the output file with a row for every pripad.
+        aggregation: If provided, the rows are only counted and the aggregated table is written by `close` instead.
+        instrumentation: If provided, writing is measured as the stage "zapis".
+
+    """
+
+    def __init__(
+        self,
+        output_file: TextIO,
+        fieldnames: list[str],
+        *,
+        aggregation: Aggregation | None = None,
+        instrumentation: Instrumentation | None = None,
+    ) -> None:
+        self.output_file = output_file
+        self.aggregation = aggregation
+        self.instrumentation = instrumentation
+        if aggregation is None:
+            writer = csv.DictWriter(output_file, fieldnames=fieldnames, delimiter=CSV_DELIMITER)
+            writer.writeheader()
+            self._sink = writer.writerows
+        else:
+            self._sink = aggregation.add_rows
 
-def process_csv(
+    def write_rows(self, rows: list[dict]) -> None:
+        """Write or count the evaluated rows."""
+        if self.instrumentation is None:
+            self._sink(rows)
+        else:
+            with self.instrumentation.stage("zapis"):
+                self._sink(rows)
+
+    def close(self, rule_set: RuleSet) -> None:
+        """Write the aggregated table joined with the minima from the rule set, if the rows are aggregated."""
+        if self.aggregation is not None:
+            self.aggregation.write(self.output_file, rule_set)
+
+
+def _default_output_path(input_path: Path, *, aggregated: bool) -> Path:
+    """Return the path of the output file next to the input file, always with the suffix .csv for a store."""
+    output_path = Path(input_path).with_stem(f"{input_path.stem}{'_agregacia' if aggregated else '_output'}")
+    return output_path.with_suffix(".csv") if is_case_store(input_path) else output_path
+
+
+def _log_summaries(engine: Engine, shadow_engine: Engine | None) -> None:
+    """Log the summaries collected by the engines during the run."""
+    if engine.instrumentation is not None:
+        logger.info(f"Profil behu:\n{engine.instrumentation.summary()}")
+    if engine.report is not None:
+        logger.info(f"Súhrn problémov vo vstupných dátach:\n{engine.report.summary()}")
+    if shadow_engine is not None and shadow_engine.report is not None:
+        logger.info(f"Súhrn problémov tieňového vyhodnotenia:\n{shadow_engine.report.summary()}")
+    if engine.prefilter:
+        logger.info(f"Predvýber príloh:\n{engine.prefilter_stats.summary()}")
+    if engine.unmatched is not None:
+        logger.info(f"Najčastejšie kódy prípadov bez medicínskej služby (S99-99):\n{engine.unmatched.summary()}")
+
+
+def process_csv(  # noqa: PLR0913
     input_path: Path,
     output_path: Path | None = None,
     *,
     all_vykony_hlavne: bool = False,
     evaluate_incomplete_pripady: bool = False,
     allow_duplicates: bool = False,
+    rule_set: RuleSet | None = None,
+    instrumentation: Instrumentation | None = None,
+    shadow_rule_set: RuleSet | None = None,
+    registry: RuleSetRegistry | None = None,
+    only_hlavna_ms: bool = False,
+    prilohy: Collection[str] | None = None,
+    report: ValidationReport | None = None,
+    reject_path: Path | None = None,
+    pipeline: bool = False,
+    prefilter: bool = False,
+    aggregate_by: str | None = None,
+    unmatched: UnmatchedCodes | None = None,
 ) -> None:
     """Assign medicinske sluzby to hospitalizacne pripady from a csv file.
 
     Create a copy of the input file with a new column containing the list of assigned medicinske sluzby.
 
     Args:
-        input_path: Path to the file containing hospitalizacne pripady.
+        input_path: Path to the csv file containing hospitalizacne pripady or to a store of pripady compiled by
+            `osn_algoritmus.case_store.compile_cases`, whose pripady are not read and validated again.
         output_path: Path to the output file. If not provided, a new file will be created.
         all_vykony_hlavne: When evaluating prilohy, assume that any of vykony could be hlavny.
         evaluate_incomplete_pripady: If a required value is not filled in, continue with the evaluation anyway.
             Without this flag, the assigned medicinske sluzby will be 'ERROR'.
         allow_duplicates: Keep duplicates in the output list of medicinske sluzby.
+        rule_set: Prepared prilohy. Defaults to prilohy distributed with the package.
+        instrumentation: If provided, time spent in individual prilohy and stages of processing is measured by it and
+            a summary is logged at the end.
+        shadow_rule_set: If provided, every pripad is validated once and evaluated also against these prilohy. The
+            results are written into extra columns `ms_shadow` and `urovne_ms_shadow`, column `zmena_shadow` is 1 if
+            they differ from `ms` and `urovne_ms`. With a report, problems found only by the shadow evaluation
+            (urovne) are counted in a separate report logged at the end.
+        registry: If provided, every pripad with a filled optional column `datum_prijatia` is evaluated against the
+            prilohy in force on that date. Pripady without the date are evaluated against `rule_set`.
+        only_hlavna_ms: Return only the hlavna medicinska sluzba and its uroven.
+        prilohy: If provided, only these prilohy (names from `PRILOHY`) are evaluated.
+        report: If provided, problems found in the pripady are counted in it instead of being logged one by one and
+            a summary is logged at the end.
+        reject_path: If provided, malformed lines of the input file are written into this file and skipped instead of
+            stopping the run. Their count is logged at the end.
+        pipeline: Read the input file and write the output file in separate threads, overlapping the file operations
+            with the evaluation, see `run_pipeline`.
+        prefilter: Skip prilohy, which a pripad cannot match, see `Engine`. Counts of skipped prilohy are logged at
+            the end.
+        aggregate_by: If provided, the output file contains only counts of pripady per group given by this key,
+            medicinska sluzba and uroven, compared with `minimum_na_nemocnicu`, instead of a row for every pripad. See
+            `osn_algoritmus.aggregation.Aggregation`.
+        unmatched: If provided, the most frequent hlavna diagnoza, hlavny vykon and DRG of pripady assigned to
+            "S99-99" are counted by it and logged at the end.
+
+    Raises:
+        ValueError: If aggregate_by is combined with shadow_rule_set or its column is not in the input file, or if
+            reject_path is provided for a compiled store of pripady.
 
     """
     logger.info("Spustenie algoritmu.")
-
-    found_incorrect_columns = check_csv_columns(input_path, INPUT_COLUMNS)
-    if found_incorrect_columns:
-        msg = f"Nespravné hlavičky vstupného súboru. Očakávané: {INPUT_COLUMNS}. Nájdené: {found_incorrect_columns}."
+    if aggregate_by is not None and shadow_rule_set is not None:
+        msg = "Agregáciu výsledkov nie je možné kombinovať s tieňovým vyhodnotením."
         raise ValueError(msg)
 
-    number_of_rows = get_number_of_lines(input_path) - 1
-    logger.info(f"Počet riadkov vstupného súboru: {number_of_rows}")
+    engine = Engine(
+        rule_set,
+        all_vykony_hlavne=all_vykony_hlavne,
+        evaluate_incomplete_pripady=evaluate_incomplete_pripady,
+        allow_duplicates=allow_duplicates,
+        instrumentation=instrumentation,
+        only_hlavna_ms=only_hlavna_ms,
+        prilohy=prilohy,
+        report=report,
+        prefilter=prefilter,
+        unmatched=unmatched,
+    )
+    shadow_engine = None
+    if shadow_rule_set is not None:
+        shadow_report = None if report is None else ValidationReport()
+        shadow_engine = Engine(shadow_rule_set, report=shadow_report, **engine.flags)
+    evaluate_row = _RowEvaluator(engine, registry=registry, shadow_engine=shadow_engine)
 
-    if output_path is None:
-        output_path = Path(input_path).with_stem(f"{input_path.stem}_output")
+    with contextlib.ExitStack() as stack:
+        cases = stack.enter_context(open_input(input_path, reject_path))
+        logger.info(f"Počet riadkov vstupného súboru: {cases.number_of_rows}")
+        if registry is not None and cases.columns == INPUT_COLUMNS:
+            logger.warning(f"Vstupný súbor neobsahuje stĺpec {DATUM_PRIJATIA_COLUMN}, použije sa jedna verzia príloh.")
 
-    with output_path.open("w", encoding="utf-8", newline="") as output_file:
-        writer = csv.DictWriter(output_file, fieldnames=[*INPUT_COLUMNS, "ms", "urovne_ms"], delimiter=CSV_DELIMITER)
-        writer.writeheader()
+        aggregation = None if aggregate_by is None else Aggregation(aggregate_by, cases.columns)
+        output_path = output_path or _default_output_path(input_path, aggregated=aggregation is not None)
+        sink = _OutputSink(
+            stack.enter_context(output_path.open("w", encoding="utf-8", newline="")),
+            [*cases.columns, *evaluate_row.columns],
+            aggregation=aggregation,
+            instrumentation=instrumentation,
+        )
 
+        rows = cases.rows
+        if instrumentation is not None:
+            rows = instrumentation.measure_iterable("citanie", rows)
         with logging_redirect_tqdm():
-            for row in tqdm(yield_csv_rows(input_path), total=number_of_rows, desc="Spracovanie prípadov"):
-                ms_result = process_hp_dict(
-                    row,
-                    all_vykony_hlavne=all_vykony_hlavne,
-                    evaluate_incomplete_pripady=evaluate_incomplete_pripady,
-                    allow_duplicates=allow_duplicates,
-                )
-
-                row["ms"], row["urovne_ms"] = ("ERROR", "ERROR") if ms_result is None else ms_result
-
-                writer.writerow(row)
+            rows = tqdm(rows, total=cases.number_of_rows, desc="Spracovanie prípadov")
+            if pipeline:
+                run_pipeline(rows, evaluate_row, sink.write_rows)
+            else:
+                for row in rows:
+                    sink.write_rows([evaluate_row(row)])
+        sink.close(engine.rule_set)
 
+    _log_summaries(engine, shadow_engine)
     logger.info(f"Algoritmus dokončený. Výsledky sú v {output_path}")
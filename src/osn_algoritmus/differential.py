@@ -0,0 +1,190 @@
+"""Differential evaluation of hospitalizacne pripady against several versions of prilohy in a single pass.
+
+All versions are loaded side by side in one process. Every input row is validated once and evaluated against each
+version; only rows with differing results are written to the output.
+
+Run with:
+    python -m osn_algoritmus.differential [-h] --verzia NAZOV=PRIECINOK [...] [-v] [-n] [-d] input_path [output_path]
+"""
+
+import argparse
+import csv
+import logging
+import sys
+from collections.abc import Generator, Iterable
+from pathlib import Path
+
+from tqdm import tqdm
+from tqdm.contrib.logging import logging_redirect_tqdm
+
+from osn_algoritmus.core import Engine
+from osn_algoritmus.input_preparation import check_csv_columns, yield_csv_rows
+from osn_algoritmus.prilohy_evaluation import resolve_prilohy
+from osn_algoritmus.utils import CSV_DELIMITER, INPUT_COLUMNS, get_number_of_lines, setup_parser
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_VERSION = "aktualna"
+
+
+def output_columns(nazvy_verzii: Iterable[str]) -> list[str]:
+    """Return columns of the differential output for the given names of versions."""
+    columns = list(INPUT_COLUMNS)
+    for nazov in nazvy_verzii:
+        columns.extend([f"ms_{nazov}", f"urovne_ms_{nazov}"])
+    return columns
+
+
+def evaluate_versions(hp_dict: dict, engines: dict[str, Engine]) -> dict[str, tuple[str, str]]:
+    """Validate hp once and evaluate it with every engine.
+
+    Args:
+        hp_dict: dictionary representing hospitalizacny pripad.
+        engines: Engines keyed by the name of the version. All engines must share the same configuration of flags.
+
+    Returns:
+        Kody medicinskych sluzieb and urovne concatenated by '@' keyed by the name of the version, ('ERROR', 'ERROR')
+        for every version if the hp_dict is invalid.
+
+    """
+    hp = next(iter(engines.values())).parse(hp_dict)
+    if hp is None:
+        return dict.fromkeys(engines, ("ERROR", "ERROR"))
+    return {nazov: engine.evaluate_hp(hp) for nazov, engine in engines.items()}
+
+
+def yield_differences(
+    hp_dicts: Iterable[dict],
+    engines: dict[str, Engine],
+) -> Generator[dict[str, str], None, None]:
+    """Lazily evaluate hospitalizacne pripady with all engines and yield only the differing ones.
+
+    Args:
+        hp_dicts: dictionaries representing hospitalizacne pripady.
+        engines: Engines keyed by the name of the version.
+
+    Yields:
+        Input dictionary extended with columns `ms_<verzia>` and `urovne_ms_<verzia>` for every version.
+
+    """
+    for hp_dict in hp_dicts:
+        results = evaluate_versions(hp_dict, engines)
+        if len(set(results.values())) > 1:
+            row = dict(hp_dict)
+            for nazov, (ms, urovne_ms) in results.items():
+                row[f"ms_{nazov}"] = ms
+                row[f"urovne_ms_{nazov}"] = urovne_ms
+            yield row
+
+
+def compare_versions_csv(input_path: Path, output_path: Path, engines: dict[str, Engine]) -> int:
+    """Evaluate hospitalizacne pripady from a csv file with several versions of prilohy and write the differences.
+
+    Args:
+        input_path: Path to the file containing hospitalizacne pripady.
+        output_path: Path to the output file with differing pripady.
+        engines: Engines keyed by the name of the version. All engines must share the same configuration of flags.
+
+    Returns:
+        Number of differing pripady.
+
+    """
+    min_versions = 2
+    if len(engines) < min_versions:
+        msg = f"Na porovnanie sú potrebné aspoň dve verzie príloh, zadané: {list(engines)}."
+        raise ValueError(msg)
+    flags = [engine.flags for engine in engines.values()]
+    if any(engine_flags != flags[0] for engine_flags in flags):
+        msg = "Všetky porovnávané verzie musia mať rovnaké nastavenie prepínačov."
+        raise ValueError(msg)
+
+    found_incorrect_columns = check_csv_columns(input_path, INPUT_COLUMNS)
+    if found_incorrect_columns:
+        msg = f"Nespravné hlavičky vstupného súboru. Očakávané: {INPUT_COLUMNS}. Nájdené: {found_incorrect_columns}."
+        raise ValueError(msg)
+
+    number_of_rows = get_number_of_lines(input_path) - 1
+    number_of_differences = 0
+
+    with output_path.open("w", encoding="utf-8", newline="") as output_file:
+        writer = csv.DictWriter(output_file, fieldnames=output_columns(engines), delimiter=CSV_DELIMITER)
+        writer.writeheader()
+
+        with logging_redirect_tqdm():
+            rows = tqdm(yield_csv_rows(input_path), total=number_of_rows, desc="Porovnanie verzií")
+            for row in yield_differences(rows, engines):
+                writer.writerow(row)
+                number_of_differences += 1
+
+    logger.info(f"Počet prípadov s rozdielnym výsledkom: {number_of_differences} z {number_of_rows}.")
+    return number_of_differences
+
+
+def parse_version(value: str) -> tuple[str, Path]:
+    """Parse argument in the form 'nazov=priecinok'."""
+    nazov, _, priecinok = value.partition("=")
+    if not nazov or not priecinok:
+        msg = f"Nesprávny formát {value!r}, očakávaný formát je 'nazov=priecinok', napr. '2025_01=Prilohy_2025_01'."
+        raise argparse.ArgumentTypeError(msg)
+    return nazov, Path(priecinok)
+
+
+def main(argv: list[str] | None = None) -> None:
+    """Run the differential evaluation from the command line."""
+    parser = setup_parser(
+        input_path=True,
+        output_path=True,
+        vsetky_vykony_hlavne=True,
+        vyhodnot_neuplne_pripady=True,
+        ponechaj_duplicity=True,
+        iba_hlavna_ms=True,
+        vyber_priloh=True,
+    )
+    parser.prog = "python -m osn_algoritmus.differential"
+    parser.description = (
+        "Vyhodnotenie prípadov voči viacerým verziám príloh v jednom behu. Do výstupu sa zapíšu iba prípady s"
+        " rozdielnym výsledkom."
+    )
+    parser.add_argument(
+        "--verzia",
+        type=parse_version,
+        action="append",
+        required=True,
+        metavar="NAZOV=PRIECINOK",
+        help=(
+            "Názov verzie a priečinok s csv súbormi príloh. Ak je zadaná iba jedna verzia, porovná sa s prílohami"
+            f" dodanými s balíkom pod názvom '{DEFAULT_VERSION}'."
+        ),
+    )
+    args = parser.parse_args(argv)
+
+    try:
+        prilohy = resolve_prilohy(args.iba_prilohy, args.bez_priloh)
+    except ValueError as e:
+        parser.error(str(e))
+    flags = {
+        "all_vykony_hlavne": args.vsetky_vykony_hlavne,
+        "evaluate_incomplete_pripady": args.vyhodnot_neuplne_pripady,
+        "allow_duplicates": args.ponechaj_duplicity,
+        "only_hlavna_ms": args.iba_hlavna_ms,
+        "prilohy": prilohy,
+    }
+    engines = {} if len(args.verzia) > 1 else {DEFAULT_VERSION: Engine(**flags)}
+    for nazov, priecinok in args.verzia:
+        if nazov in engines:
+            parser.error(f"Verzia {nazov!r} je zadaná viackrát.")
+        logger.info(f"Načítanie príloh verzie {nazov} z {priecinok}")
+        engines[nazov] = Engine.from_folder(priecinok, **flags)
+
+    output_path = args.output_path or args.input_path.with_stem(f"{args.input_path.stem}_rozdiely")
+    try:
+        compare_versions_csv(args.input_path, output_path, engines)
+    except ValueError as e:
+        logger.error(e)  # noqa: TRY400, we don't want to display the traceback to the end user
+        sys.exit(1)
+    logger.info(f"Rozdiely sú v {output_path}")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
+    main()
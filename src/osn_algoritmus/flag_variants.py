@@ -0,0 +1,215 @@
+"""Evaluation of hospitalizacne pripady in several combinations of flags -v and -d in a single pass.
+
+Every input row is validated once. Every priloha is evaluated once for the reported hlavny vykon and prilohy depending
+on hlavny vykon once more for the other vykony as hlavne. Results of all combinations of flags are derived from these
+evaluations and written into one output file with a pair of columns for every combination.
+
+Run with:
+    python -m osn_algoritmus.flag_variants [-h] [--varianty VARIANTA [...]] [-n] input_path [output_path]
+"""
+
+import csv
+import logging
+import sys
+from collections.abc import Collection
+from pathlib import Path
+
+from tqdm import tqdm
+from tqdm.contrib.logging import logging_redirect_tqdm
+
+from osn_algoritmus.case_store import open_input
+from osn_algoritmus.core import Engine
+from osn_algoritmus.models import HospitalizacnyPripad
+from osn_algoritmus.prilohy_evaluation import prirad_ms, prirad_ms_oba_rezimy, prirad_urovne_ms, resolve_prilohy
+from osn_algoritmus.utils import CSV_DELIMITER, setup_parser
+from osn_algoritmus.validation_report import ValidationReport
+
+logger = logging.getLogger(__name__)
+
+VARIANTY: dict[str, dict[str, bool]] = {
+    "zakladna": {"all_vykony_hlavne": False, "allow_duplicates": False},
+    "v": {"all_vykony_hlavne": True, "allow_duplicates": False},
+    "d": {"all_vykony_hlavne": False, "allow_duplicates": True},
+    "vd": {"all_vykony_hlavne": True, "allow_duplicates": True},
+}
+"""Combinations of flags --vsetky_vykony_hlavne (-v) and --ponechaj_duplicity (-d) keyed by their names."""
+
+
+def output_columns(input_columns: list[str], varianty: Collection[str]) -> list[str]:
+    """Return columns of the output for the given names of variants."""
+    columns = list(input_columns)
+    for nazov in varianty:
+        columns.extend([f"ms_{nazov}", f"urovne_ms_{nazov}"])
+    return columns
+
+
+class FlagVariants:
+    """Evaluate hospitalizacne pripady in several combinations of flags -v and -d at once.
+
+    Args:
+        engine: Engine providing prilohy and the other flags. Its flags all_vykony_hlavne and allow_duplicates are
+            ignored.
+        varianty: Names of variants from `VARIANTY`. All variants if not provided.
+
+    Raises:
+        ValueError: If a name of a variant is unknown.
+
+    """
+
+    def __init__(self, engine: Engine, varianty: Collection[str] | None = None) -> None:
+        """Create engines formatting results with and without duplicates."""
+        unknown = set(varianty or []) - VARIANTY.keys()
+        if unknown:
+            msg = f"Neznáme varianty: {sorted(unknown)}. Možné varianty: {', '.join(VARIANTY)}."
+            raise ValueError(msg)
+        self.engine = engine
+        self.varianty = [nazov for nazov in VARIANTY if varianty is None or nazov in varianty]
+        self._all_vykony_hlavne = any(VARIANTY[nazov]["all_vykony_hlavne"] for nazov in self.varianty)
+        self._engines = {
+            allow_duplicates: Engine(
+                engine.rule_set,
+                report=engine.report,
+                **{**engine.flags, "allow_duplicates": allow_duplicates, "prefilter": False},
+            )
+            for allow_duplicates in [False, True]
+        }
+
+    def _prirad_urovne(
+        self,
+        hp: HospitalizacnyPripad,
+        zakladne: list[str],
+        vsetky_vykony_hlavne: list[str],
+    ) -> tuple[list[int | None], list[int | None]]:
+        """Assign urovne to both lists, looking up and reporting the medicinske sluzby of both lists only once."""
+        urovne = prirad_urovne_ms(hp, vsetky_vykony_hlavne, rule_set=self.engine.rule_set, report=self.engine.report)
+        podla_ms = dict(zip(vsetky_vykony_hlavne, urovne, strict=True))
+        if all(kod_ms in podla_ms for kod_ms in zakladne):
+            return [podla_ms[kod_ms] for kod_ms in zakladne], urovne
+        # Only S99-99, when the pripad gets medicinske sluzby only thanks to -v.
+        return prirad_urovne_ms(hp, zakladne, rule_set=self.engine.rule_set, report=self.engine.report), urovne
+
+    def evaluate(self, hp_dict: dict) -> dict[str, tuple[str, str]]:
+        """Validate hp once and evaluate it in every variant.
+
+        Args:
+            hp_dict: dictionary representing hospitalizacny pripad.
+
+        Returns:
+            Kody medicinskych sluzieb and urovne concatenated by '@' keyed by the name of the variant, the same as
+            `Engine.evaluate` with the flags of the variant. ('ERROR', 'ERROR') for every variant if the hp_dict is
+            invalid.
+
+        """
+        hp = self.engine.parse(hp_dict)
+        if hp is None:
+            return dict.fromkeys(self.varianty, ("ERROR", "ERROR"))
+
+        rule_set = self.engine.rule_set
+        prilohy = self.engine.relevantne_prilohy(hp)
+        if self._all_vykony_hlavne:
+            zakladne, vsetky_vykony_hlavne = prirad_ms_oba_rezimy(hp, rule_set=rule_set, prilohy=prilohy)
+        else:
+            zakladne = vsetky_vykony_hlavne = prirad_ms(hp, all_vykony_hlavne=False, rule_set=rule_set, prilohy=prilohy)
+        # Counted once per pripad, when none of the variants assigns any medicinska sluzba.
+        if vsetky_vykony_hlavne == ["S99-99"] and self.engine.unmatched is not None:
+            self.engine.unmatched.add(hp)
+        if self.engine.only_hlavna_ms:
+            zakladne, vsetky_vykony_hlavne = zakladne[:1], vsetky_vykony_hlavne[:1]
+
+        urovne = dict(zip([False, True], self._prirad_urovne(hp, zakladne, vsetky_vykony_hlavne), strict=True))
+        sluzby = {False: zakladne, True: vsetky_vykony_hlavne}
+        results = {}
+        for nazov in self.varianty:
+            flags = VARIANTY[nazov]
+            all_vykony_hlavne = flags["all_vykony_hlavne"]
+            results[nazov] = self._engines[flags["allow_duplicates"]].format_result(
+                hp,
+                list(sluzby[all_vykony_hlavne]),
+                list(urovne[all_vykony_hlavne]),
+            )
+        return results
+
+
+def process_variants_csv(input_path: Path, output_path: Path, variants: FlagVariants) -> int:
+    """Evaluate hospitalizacne pripady from a csv file in all variants and write one output file.
+
+    Args:
+        input_path: Path to the csv file containing hospitalizacne pripady or to a compiled store of pripady, see
+            `osn_algoritmus.case_store`.
+        output_path: Path to the output file with columns `ms_<varianta>` and `urovne_ms_<varianta>`.
+        variants: Evaluated variants.
+
+    Returns:
+        Number of evaluated pripady.
+
+    """
+    with open_input(input_path) as cases, output_path.open("w", encoding="utf-8", newline="") as output_file:
+        writer = csv.DictWriter(
+            output_file,
+            fieldnames=output_columns(cases.columns, variants.varianty),
+            delimiter=CSV_DELIMITER,
+        )
+        writer.writeheader()
+
+        with logging_redirect_tqdm():
+            for row in tqdm(cases.rows, total=cases.number_of_rows, desc="Vyhodnotenie variantov"):
+                results = variants.evaluate(row)
+                output_row = dict(row)
+                for nazov, (ms, urovne_ms) in results.items():
+                    output_row[f"ms_{nazov}"] = ms
+                    output_row[f"urovne_ms_{nazov}"] = urovne_ms
+                writer.writerow(output_row)
+
+    return cases.number_of_rows
+
+
+def main(argv: list[str] | None = None) -> None:
+    """Run the evaluation of variants from the command line."""
+    parser = setup_parser(
+        input_path=True,
+        output_path=True,
+        vyhodnot_neuplne_pripady=True,
+        iba_hlavna_ms=True,
+        vyber_priloh=True,
+        suhrn_validacie=True,
+        predvyber_priloh=True,
+    )
+    parser.prog = "python -m osn_algoritmus.flag_variants"
+    parser.description = (
+        "Vyhodnotenie prípadov vo viacerých kombináciách prepínačov -v a -d v jednom behu. Výstup obsahuje dvojicu"
+        " stĺpcov pre každú kombináciu."
+    )
+    parser.add_argument(
+        "--varianty",
+        nargs="+",
+        choices=list(VARIANTY),
+        metavar="VARIANTA",
+        help=("Vyhodnotené kombinácie prepínačov: 'zakladna' (bez prepínačov), 'v', 'd' a 'vd'. Predvolene všetky."),
+    )
+    args = parser.parse_args(argv)
+
+    report = ValidationReport(args.validacia_subor) if args.suhrn_validacie or args.validacia_subor else None
+    output_path = args.output_path or args.input_path.with_name(f"{args.input_path.stem}_varianty.csv")
+    try:
+        engine = Engine(
+            evaluate_incomplete_pripady=args.vyhodnot_neuplne_pripady,
+            only_hlavna_ms=args.iba_hlavna_ms,
+            prilohy=resolve_prilohy(args.iba_prilohy, args.bez_priloh),
+            report=report,
+            prefilter=args.predvyber_priloh,
+        )
+        process_variants_csv(args.input_path, output_path, FlagVariants(engine, args.varianty))
+    except ValueError as e:
+        logger.error(e)  # noqa: TRY400, we don't want to display the traceback to the end user
+        sys.exit(1)
+    finally:
+        if report is not None:
+            report.close()
+    if report is not None:
+        logger.info(f"Súhrn problémov vo vstupných dátach:\n{report.summary()}")
+    logger.info(f"Výsledky všetkých variantov sú v {output_path}")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
+    main()
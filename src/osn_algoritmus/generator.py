@@ -0,0 +1,449 @@
+"""Generator of synthetic hospitalizacne pripady for benchmarking.
+
+Codes are sampled from prilohy tables, so that the generated pripady hit the individual prilohy with configurable
+probabilities. The output is deterministic for a given seed.
+
+Run with:
+    python -m osn_algoritmus.generator [-h] [--seed SEED] [--podiel_novorodencov ...] pocet output_path
+"""
+
+import argparse
+import dataclasses
+import logging
+import random
+from collections import defaultdict
+from collections.abc import Generator
+from pathlib import Path
+
+from osn_algoritmus.prilohy_evaluation import PRILOHY
+from osn_algoritmus.prilohy_preparation import RuleSet, load_default_rule_set
+from osn_algoritmus.utils import CSV_DELIMITER, INPUT_COLUMNS
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PRILOHY_SHARES = {
+    "17": 0.02,
+    "16": 0.002,
+    "5": 0.03,
+    "6": 0.01,
+    "7_8": 0.005,
+    "7a_8a": 0.02,
+    "9": 0.03,
+    "9a": 0.005,
+    "10": 0.005,
+    "12_13": 0.35,
+    "14_15": 0.45,
+}
+
+KRITERIA_5_VYKONY = ["8p107", "8q902", "8r2637", "93083", "8p1007"]
+
+
+@dataclasses.dataclass
+class GeneratorConfig:
+    """Distributions of the generated pripady.
+
+    Attributes:
+        neonate_share: Share of pripady with vek 0.
+        child_share: Share of pripady with vek between 1 and 18.
+        prilohy_shares: Probability that a pripad contains codes hitting the given priloha, keyed by names from
+            `PRILOHY`. Prilohy requiring the same hlavny vykon or hlavna diagnoza can compete for it, so the real
+            share of hits can be slightly lower.
+        mean_diagnozy: Mean number of additional diagnozy per pripad.
+        mean_vykony: Mean number of additional vykony per pripad.
+        malformed_share: Share of pripady with an incorrectly filled value, which fails validation.
+        malformed_csv_share: Share of lines, which are not valid csv rows (wrong number of columns or a stray quote).
+
+    """
+
+    neonate_share: float = 0.05
+    child_share: float = 0.15
+    prilohy_shares: dict[str, float] = dataclasses.field(default_factory=lambda: dict(DEFAULT_PRILOHY_SHARES))
+    mean_diagnozy: float = 3.0
+    mean_vykony: float = 3.0
+    malformed_share: float = 0.001
+    malformed_csv_share: float = 0.0
+
+    def __post_init__(self) -> None:
+        """Check the names of prilohy."""
+        unknown = set(self.prilohy_shares) - set(PRILOHY)
+        if unknown:
+            msg = f"Unknown prilohy: {sorted(unknown)}. Expected some of {list(PRILOHY)}."
+            raise ValueError(msg)
+
+
+class _Codes:
+    """Codes sampled by the generator, prepared from a rule set."""
+
+    def __init__(self, rule_set: RuleSet) -> None:
+        tables = rule_set.tables
+
+        self.p5_rows = list(tables["p5_NOV"])
+        self.tazke_problemy = [row["kod_diagnozy"] for row in tables["p5_tazke_problemy_u_novorodencov"]]
+        self.signifikantne_op = [row["kod_vykonu"] for row in tables["p5_signifikantne_OP"]]
+        self.kraniocerebralna_trauma = [
+            row["kod_diagnozy"]
+            for row in tables["p15_D_dospeli"]
+            if row["kod_diagnozy"][:3] in {f"s0{i}" for i in range(2, 10)}
+        ]
+        self.p16 = [
+            [row["kod_diagnozy"] for row in tables[table_name]]
+            for table_name in ["p16_koma", "p16_opuch_mozgu", "p16_vybrane_ochorenia"]
+        ]
+        self.p17_markery = [row["marker"] for row in tables["p17_M"]]
+        self.p9a_rows = tables["p9a_MD_dospeli"]
+        self.p10_hlavne = [row["kod_hlavnej_diagnozy"] for row in tables["p10_DD_diagnozy"]]
+
+        diagnozy_by_skupina = defaultdict(list)
+        for row in tables["p9_VD_diagnozy"]:
+            diagnozy_by_skupina[row["skupina_diagnoz"]].append(row["kod_hlavnej_diagnozy"])
+        self.p9_diagnozy = dict(diagnozy_by_skupina)
+
+        self.by_age = {}
+        for je_dieta, suffix in [(True, "deti"), (False, "dospeli")]:
+            vv_table = "p7_VV_deti_vv" if je_dieta else "p8_VV_dospeli_vv"
+            vv_by_ms = defaultdict(list)
+            for row in tables[vv_table]:
+                vv_by_ms[row["kod_ms"]].append(row["kod_vykonu"])
+            self.by_age[je_dieta] = {
+                "p6": tables[f"p6_DRGD_{suffix}"],
+                "p7_8_hv": tables["p7_VV_deti_hv" if je_dieta else "p8_VV_dospeli_hv"],
+                "p7_8_vv": dict(vv_by_ms),
+                "p7a_8a": tables["p7a_MV_deti" if je_dieta else "p8a_MV_dospeli"],
+                "p9": [row for row in tables[f"p9_VD_{suffix}"] if row["skupina_diagnoz"] in self.p9_diagnozy],
+                "p10": [row["kod_vedlajsej_diagnozy"] for row in tables[f"p10_DD_{suffix}"]],
+                "p12_13": [row["kod_vykonu"] for row in tables["p12_V_deti" if je_dieta else "p13_V_dospeli"]],
+                "p14_15": [row["kod_diagnozy"] for row in tables["p14_D_deti" if je_dieta else "p15_D_dospeli"]],
+            }
+
+        known_codes = {
+            value
+            for rows in tables.values()
+            for row in rows
+            for key, value in row.items()
+            if isinstance(value, str) and key.startswith(("kod_", "drg"))
+        }
+        self.filler_diagnozy = [kod for kod in (f"u{i}" for i in range(900, 1000)) if kod not in known_codes]
+        self.filler_vykony = [kod for kod in (f"9z{i:03d}" for i in range(1000)) if kod not in known_codes]
+        drg_prefixes = tuple(row["drg"] for row in [*tables["p5_NOV"], *tables["p6_DRGD_dospeli"]])
+        self.filler_drg = [
+            drg
+            for drg in (
+                f"{letter}{i:02d}{variant}" for letter in "BEFGIL" for i in range(1, 80, 3) for variant in "ABC"
+            )
+            if not drg.lower().startswith(drg_prefixes)
+        ]
+
+
+def _random_count(rnd: random.Random, mean: float) -> int:
+    """Return a random non-negative integer with the given mean."""
+    return rnd.randint(0, max(0, round(2 * mean)))
+
+
+@dataclasses.dataclass
+class _Pripad:
+    """Codes of a hospitalizacny pripad collected while it is being generated."""
+
+    je_dieta: bool
+    age_codes: dict
+    druh_prijatia: int
+    hlavna_diagnoza: str | None = None
+    hlavny_vykon: str | None = None
+    drg: str | None = None
+    diagnozy: list[str] = dataclasses.field(default_factory=list)
+    vykony: list[str] = dataclasses.field(default_factory=list)
+    markery: list[str] = dataclasses.field(default_factory=list)
+
+
+def _chance(rnd: random.Random, probability: float) -> bool:
+    """Return True with the given probability."""
+    return rnd.random() < probability
+
+
+def _hit_17(rnd: random.Random, codes: _Codes, pripad: _Pripad) -> None:
+    """Add codes hitting priloha 17."""
+    marker = rnd.choice(codes.p17_markery)
+    pripad.markery.append(f"{marker.kod}&{marker.hodnota}")
+
+
+def _hit_16(rnd: random.Random, codes: _Codes, pripad: _Pripad) -> None:
+    """Add codes hitting priloha 16."""
+    pripad.diagnozy.extend(rnd.choice(group) for group in codes.p16)
+
+
+def _hit_5(rnd: random.Random, codes: _Codes, pripad: _Pripad) -> None:
+    """Add codes hitting priloha 5."""
+    row = rnd.choice(codes.p5_rows)
+    drg = row["drg"].upper()
+    if len(drg) == 1:
+        drg += f"{rnd.randint(60, 67)}{rnd.choice('ABCDZ')}"
+    pripad.drg = drg
+    pripad.druh_prijatia = rnd.randint(3, 6)
+    pripad.vykony.append(rnd.choice(KRITERIA_5_VYKONY))
+    if _chance(rnd, 0.3):
+        pripad.vykony.append(rnd.choice(codes.signifikantne_op))
+    pripad.diagnozy.extend(rnd.choice(codes.tazke_problemy) for _ in range(rnd.randint(0, 3)))
+    if _chance(rnd, 0.05):
+        pripad.markery.append("mOSN&novor")
+
+
+def _hit_6(rnd: random.Random, codes: _Codes, pripad: _Pripad) -> None:
+    """Add codes hitting priloha 6 unless drg is taken."""
+    if pripad.drg is not None:
+        return
+    row = rnd.choice(pripad.age_codes["p6"])
+    pripad.drg = f"{row['drg'].upper()}{rnd.randint(1, 99):02d}A"
+    if _chance(rnd, 0.5):
+        pripad.diagnozy.append(rnd.choice(codes.kraniocerebralna_trauma))
+    if _chance(rnd, 0.2):
+        pripad.markery.append("mOSN&nopol")
+
+
+def _hit_7_8(rnd: random.Random, _codes: _Codes, pripad: _Pripad) -> None:
+    """Add codes hitting priloha 7_8."""
+    row = rnd.choice(pripad.age_codes["p7_8_hv"])
+    pripad.hlavny_vykon = row["kod_hlavneho_vykonu"]
+    pripad.vykony.append(rnd.choice(pripad.age_codes["p7_8_vv"][row["kod_ms"]]))
+
+
+def _hit_7a_8a(rnd: random.Random, _codes: _Codes, pripad: _Pripad) -> None:
+    """Add codes hitting priloha 7a_8a."""
+    row = rnd.choice(pripad.age_codes["p7a_8a"])
+    pripad.vykony.append(row["kod_vykonu"])
+    pripad.markery.append(f"{row['marker'].kod}&{row['marker'].hodnota}")
+
+
+def _hit_9(rnd: random.Random, codes: _Codes, pripad: _Pripad) -> None:
+    """Add codes hitting priloha 9 if it has rows for the vek."""
+    if not pripad.age_codes["p9"]:
+        return
+    row = rnd.choice(pripad.age_codes["p9"])
+    if pripad.hlavny_vykon is None:
+        pripad.hlavny_vykon = row["kod_hlavneho_vykonu"]
+    else:
+        pripad.vykony.append(row["kod_hlavneho_vykonu"])
+    pripad.hlavna_diagnoza = rnd.choice(codes.p9_diagnozy[row["skupina_diagnoz"]])
+
+
+def _hit_9a(rnd: random.Random, codes: _Codes, pripad: _Pripad) -> None:
+    """Add codes hitting priloha 9a of an adult."""
+    if pripad.je_dieta:
+        return
+    row = rnd.choice(codes.p9a_rows)
+    pripad.markery.append(f"{row['marker'].kod}&{row['marker'].hodnota}")
+    if pripad.hlavna_diagnoza is None:
+        pripad.hlavna_diagnoza = row["kod_hlavnej_diagnozy"].ljust(4, rnd.choice("0189"))
+
+
+def _hit_10(rnd: random.Random, codes: _Codes, pripad: _Pripad) -> None:
+    """Add codes hitting priloha 10."""
+    if pripad.hlavna_diagnoza is None:
+        pripad.hlavna_diagnoza = rnd.choice(codes.p10_hlavne)
+    pripad.diagnozy.append(rnd.choice(pripad.age_codes["p10"]))
+
+
+def _hit_12_13(rnd: random.Random, _codes: _Codes, pripad: _Pripad) -> None:
+    """Add codes hitting priloha 12_13 unless hlavny vykon is taken."""
+    if pripad.hlavny_vykon is None:
+        pripad.hlavny_vykon = rnd.choice(pripad.age_codes["p12_13"])
+
+
+def _hit_14_15(rnd: random.Random, _codes: _Codes, pripad: _Pripad) -> None:
+    """Add codes hitting priloha 14_15 unless hlavna diagnoza is taken."""
+    if pripad.hlavna_diagnoza is None:
+        pripad.hlavna_diagnoza = rnd.choice(pripad.age_codes["p14_15"])
+
+
+# Functions adding codes which hit the priloha, in the order in which they compete for hlavny vykon, hlavna diagnoza
+# and drg. A function can leave the pripad unchanged, if the codes it needs are already taken.
+_HITS = {
+    "17": _hit_17,
+    "16": _hit_16,
+    "5": _hit_5,
+    "6": _hit_6,
+    "7_8": _hit_7_8,
+    "7a_8a": _hit_7a_8a,
+    "9": _hit_9,
+    "9a": _hit_9a,
+    "10": _hit_10,
+    "12_13": _hit_12_13,
+    "14_15": _hit_14_15,
+}
+
+
+def _random_vek(rnd: random.Random, config: GeneratorConfig) -> int:
+    """Return vek of a neonate, a child or an adult with the shares from the config."""
+    vek_roll = rnd.random()
+    if vek_roll < config.neonate_share:
+        return 0
+    if vek_roll < config.neonate_share + config.child_share:
+        return rnd.randint(1, 18)
+    return rnd.randint(19, 95)
+
+
+def _generate_pripad(rnd: random.Random, codes: _Codes, config: GeneratorConfig, id_hp: str) -> dict[str, str]:
+    """Generate a single valid hospitalizacny pripad."""
+    vek = _random_vek(rnd, config)
+    je_dieta = vek <= 18
+    pripad = _Pripad(je_dieta=je_dieta, age_codes=codes.by_age[je_dieta], druh_prijatia=rnd.randint(1, 9))
+    upv = 0 if _chance(rnd, 0.9) else rnd.randint(1, 300)
+
+    for nazov, hit in _HITS.items():
+        if _chance(rnd, config.prilohy_shares.get(nazov, 0.0)):
+            hit(rnd, codes, pripad)
+
+    pripad.diagnozy.extend(rnd.choice(codes.filler_diagnozy) for _ in range(_random_count(rnd, config.mean_diagnozy)))
+    pripad.vykony.extend(rnd.choice(codes.filler_vykony) for _ in range(_random_count(rnd, config.mean_vykony)))
+    rnd.shuffle(pripad.diagnozy)
+    rnd.shuffle(pripad.vykony)
+
+    hlavna_diagnoza = pripad.hlavna_diagnoza
+    if hlavna_diagnoza is None:
+        hlavna_diagnoza = rnd.choice(codes.filler_diagnozy)
+    hlavny_vykon = pripad.hlavny_vykon
+    if hlavny_vykon is None:
+        hlavny_vykon = rnd.choice(codes.filler_vykony) if _chance(rnd, 0.7) else ""
+    drg = pripad.drg
+    if drg is None and _chance(rnd, 0.8):
+        drg = rnd.choice(codes.filler_drg)
+
+    return {
+        "id": id_hp,
+        "vek": str(vek),
+        "hmotnost": str(rnd.randint(400, 4500)) if vek == 0 else "",
+        "umela_plucna_ventilacia": str(upv),
+        "diagnozy": "@".join([hlavna_diagnoza.upper(), *(d.upper() for d in pripad.diagnozy)]),
+        "vykony": "@".join([hlavny_vykon, *pripad.vykony]),
+        "markery": "@".join(pripad.markery),
+        "drg": drg or "",
+        "druh_prijatia": str(pripad.druh_prijatia),
+    }
+
+
+def _malform(rnd: random.Random, pripad: dict[str, str]) -> dict[str, str]:
+    """Fill in one of the values incorrectly."""
+    column, value = rnd.choice(
+        [
+            ("vek", "x"),
+            ("vek", ""),
+            ("umela_plucna_ventilacia", "-1"),
+            ("druh_prijatia", "12"),
+            ("vykony", "@@"),
+            ("diagnozy", "a00@"),
+            ("markery", "mOSN"),
+        ],
+    )
+    return {**pripad, column: value}
+
+
+def generate_pripady(
+    pocet: int,
+    config: GeneratorConfig | None = None,
+    *,
+    seed: int = 0,
+    rule_set: RuleSet | None = None,
+) -> Generator[dict[str, str], None, None]:
+    """Generate synthetic hospitalizacne pripady.
+
+    Args:
+        pocet: Number of generated pripady.
+        config: Distributions of the generated pripady.
+        seed: Seed of the random generator. The same seed always produces the same pripady.
+        rule_set: Prilohy from which the codes are sampled. Defaults to prilohy distributed with the package.
+
+    Yields:
+        Dictionaries with keys from INPUT_COLUMNS and string values, same as rows read from an input csv.
+
+    """
+    config = GeneratorConfig() if config is None else config
+    rnd = random.Random(seed)  # noqa: S311, not used for cryptography
+    codes = _Codes(load_default_rule_set() if rule_set is None else rule_set)
+
+    for i in range(pocet):
+        pripad = _generate_pripad(rnd, codes, config, id_hp=f"P{rnd.randint(1, 120):03d}/HP{i}")
+        if rnd.random() < config.malformed_share:
+            pripad = _malform(rnd, pripad)
+        yield pripad
+
+
+def write_pripady_csv(
+    output_path: Path,
+    pocet: int,
+    config: GeneratorConfig | None = None,
+    *,
+    seed: int = 0,
+    rule_set: RuleSet | None = None,
+) -> None:
+    """Write synthetic hospitalizacne pripady into an input csv file of the algoritmus.
+
+    Args:
+        output_path: Path to the created csv file.
+        pocet: Number of generated pripady.
+        config: Distributions of the generated pripady.
+        seed: Seed of the random generator.
+        rule_set: Prilohy from which the codes are sampled. Defaults to prilohy distributed with the package.
+
+    """
+    config = GeneratorConfig() if config is None else config
+    rnd = random.Random(seed + 1)  # noqa: S311, not used for cryptography
+
+    with output_path.open("w", encoding="utf-8", newline="") as output_file:
+        output_file.write(CSV_DELIMITER.join(INPUT_COLUMNS) + "\n")
+        for pripad in generate_pripady(pocet, config, seed=seed, rule_set=rule_set):
+            line = CSV_DELIMITER.join(pripad[column] for column in INPUT_COLUMNS)
+            if rnd.random() < config.malformed_csv_share:
+                line = rnd.choice([f"{line}{CSV_DELIMITER}navyse", line.rsplit(CSV_DELIMITER, 1)[0], f'"{line}'])
+            output_file.write(line + "\n")
+
+
+def parse_prilohy_share(value: str) -> tuple[str, float]:
+    """Parse argument in the form 'priloha=podiel'."""
+    nazov, _, podiel = value.partition("=")
+    try:
+        return nazov, float(podiel)
+    except ValueError:
+        msg = f"Nesprávny formát {value!r}, očakávaný formát je 'priloha=podiel', napr. '12_13=0.3'."
+        raise argparse.ArgumentTypeError(msg) from None
+
+
+def main(argv: list[str] | None = None) -> None:
+    """Run the generator from the command line."""
+    defaults = GeneratorConfig()
+    parser = argparse.ArgumentParser(
+        prog="python -m osn_algoritmus.generator",
+        description="Generovanie syntetických hospitalizačných prípadov na meranie výkonu algoritmu.",
+    )
+    parser.add_argument("pocet", type=int, help="Počet generovaných prípadov.")
+    parser.add_argument("output_path", type=Path, help="Cesta k výstupnému csv súboru.")
+    parser.add_argument("--seed", type=int, default=0, help="Seed generátora náhodných čísel.")
+    parser.add_argument("--podiel_novorodencov", type=float, default=defaults.neonate_share)
+    parser.add_argument("--podiel_deti", type=float, default=defaults.child_share)
+    parser.add_argument("--priemer_diagnoz", type=float, default=defaults.mean_diagnozy)
+    parser.add_argument("--priemer_vykonov", type=float, default=defaults.mean_vykony)
+    parser.add_argument("--podiel_chybnych", type=float, default=defaults.malformed_share)
+    parser.add_argument("--podiel_chybnych_riadkov", type=float, default=defaults.malformed_csv_share)
+    parser.add_argument(
+        "--podiel_prilohy",
+        type=parse_prilohy_share,
+        action="append",
+        default=[],
+        metavar="PRILOHA=PODIEL",
+        help=f"Podiel prípadov zasahujúcich danú prílohu, napr. '12_13=0.3'. Prílohy: {', '.join(PRILOHY)}.",
+    )
+    args = parser.parse_args(argv)
+
+    config = GeneratorConfig(
+        neonate_share=args.podiel_novorodencov,
+        child_share=args.podiel_deti,
+        prilohy_shares={**DEFAULT_PRILOHY_SHARES, **dict(args.podiel_prilohy)},
+        mean_diagnozy=args.priemer_diagnoz,
+        mean_vykony=args.priemer_vykonov,
+        malformed_share=args.podiel_chybnych,
+        malformed_csv_share=args.podiel_chybnych_riadkov,
+    )
+    write_pripady_csv(args.output_path, args.pocet, config, seed=args.seed)
+    logger.info(f"Vygenerovaných {args.pocet} prípadov do {args.output_path}")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
+    main()
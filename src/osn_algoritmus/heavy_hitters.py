@@ -0,0 +1,114 @@
+"""Approximate counts of the most frequent kody of pripady without any medicinska sluzba, kept in bounded memory."""
+
+import heapq
+from collections.abc import Iterator
+
+from osn_algoritmus.models import HospitalizacnyPripad
+
+HEAP_REBUILD_FACTOR = 4
+"""The heap of `SpaceSaving` is rebuilt from the current counts when it grows above this multiple of the capacity."""
+
+
+class SpaceSaving:
+    """Approximate counts of the most frequent items by the Space-Saving algorithm.
+
+    At most `capacity` items are counted. An item, which is not counted when the counter is full, replaces the item
+    with the smallest count and inherits its count as the error of its own count. Every item occurring more than
+    total / capacity times is counted, and its count is overestimated by at most its error.
+
+    Args:
+        capacity: Maximum number of counted items.
+
+    Raises:
+        ValueError: If the capacity is not positive.
+
+    """
+
+    def __init__(self, capacity: int) -> None:
+        """Create an empty counter."""
+        if capacity < 1:
+            msg = f"Kapacita počítadla musí byť kladná, zadaná: {capacity}."
+            raise ValueError(msg)
+        self.capacity = capacity
+        self.total = 0
+        self.counts: dict[str, int] = {}
+        self.errors: dict[str, int] = {}
+        # Pairs (count, item), including outdated ones, valid if the count is still the count of the item.
+        self._heap: list[tuple[int, str]] = []
+
+    def _pop_minimum(self) -> tuple[int, str]:
+        """Remove and return the counted item with the smallest count, skipping outdated pairs of the heap."""
+        while True:
+            count, item = heapq.heappop(self._heap)
+            if self.counts.get(item) == count:
+                return count, item
+
+    def add(self, item: str) -> None:
+        """Count one occurrence of the item."""
+        self.total += 1
+        if item in self.counts:
+            self.counts[item] += 1
+        elif len(self.counts) < self.capacity:
+            self.counts[item] = 1
+            self.errors[item] = 0
+        else:
+            minimum, replaced = self._pop_minimum()
+            del self.counts[replaced], self.errors[replaced]
+            self.counts[item] = minimum + 1
+            self.errors[item] = minimum
+
+        heapq.heappush(self._heap, (self.counts[item], item))
+        if len(self._heap) > HEAP_REBUILD_FACTOR * self.capacity:
+            self._heap = [(count, counted_item) for counted_item, count in self.counts.items()]
+            heapq.heapify(self._heap)
+
+    def top(self, k: int) -> list[tuple[str, int, int]]:
+        """Return at most k items with the largest counts as triples (item, count, error), the largest first."""
+        items = sorted(self.counts.items(), key=lambda item_count: (-item_count[1], item_count[0]))
+        return [(item, count, self.errors[item]) for item, count in items[:k]]
+
+
+class UnmatchedCodes:
+    """Most frequent hlavna diagnoza, hlavny vykon and DRG of pripady assigned to "S99-99".
+
+    Filled by `osn_algoritmus.prilohy_evaluation.prirad_ms` and by the evaluators falling back to "S99-99" on their own,
+    e.g. `ColumnarEvaluator`. Every kind of kody is counted by its own `SpaceSaving` counter, so the memory does not
+    grow with the number of pripady.
+
+    Args:
+        top: Number of reported kody of every kind.
+        capacity: Number of counted kody of every kind. Ten times top by default, the larger, the more precise are
+            the counts.
+
+    """
+
+    KINDS = ("hlavna_diagnoza", "hlavny_vykon", "drg")
+    """Kinds of counted kody."""
+
+    def __init__(self, top: int = 20, capacity: int | None = None) -> None:
+        """Create empty counters."""
+        self.top = top
+        self.pripady = 0
+        self.counters = {kind: SpaceSaving(capacity or 10 * top) for kind in self.KINDS}
+
+    def add(self, hp: HospitalizacnyPripad) -> None:
+        """Count the kody of a pripad, which was not assigned any medicinska sluzba."""
+        self.pripady += 1
+        for kind, kod in zip(self.KINDS, self._kody(hp), strict=True):
+            if kod:
+                self.counters[kind].add(kod)
+
+    @staticmethod
+    def _kody(hp: HospitalizacnyPripad) -> Iterator[str | None]:
+        """Yield hlavna diagnoza, hlavny vykon and DRG of the hp, None if missing."""
+        yield hp.diagnozy[0] if hp.diagnozy else None
+        yield hp.vykony[0] if hp.vykony else None
+        yield hp.drg
+
+    def summary(self) -> str:
+        """Return the top kody of every kind with their approximate counts formatted as a table."""
+        lines = [f"{'pripady_S99-99':<20}{self.pripady:>12}"]
+        for kind, counter in self.counters.items():
+            lines.append(f"{kind:<20}{'pocet':>12}{'max_chyba':>12}")
+            lines.extend(f"  {kod:<18}{count:>12}{error:>12}" for kod, count, error in counter.top(self.top))
+        return "\n".join(lines)
@@ -4,27 +4,31 @@ import csv
 import logging
 import uuid
 from collections.abc import Generator
+from datetime import date
 from pathlib import Path
 
 from osn_algoritmus.models import HospitalizacnyPripad, Marker
 from osn_algoritmus.utils import (
     CSV_DELIMITER,
+    DATUM_PRIJATIA_COLUMN,
+    INPUT_COLUMNS,
     create_diagnozy_from_str,
     create_markery_from_str,
     create_vykony_from_str,
-    log_error_or_warning,
     standardize_code,
 )
+from osn_algoritmus.validation_report import Issue, ValidationReport, report_issue
 
 logger = logging.getLogger(__name__)
 
 
-def validate_id(id_hp: str, *, err_if_incorrect: bool) -> str | None:
+def validate_id(id_hp: str, *, err_if_incorrect: bool, report: ValidationReport | None = None) -> str | None:
     """Validate the ID of hospitalizacny pripad.
 
     Args:
         id_hp: Hospital case ID.
         err_if_incorrect: Flag indicating whether a missing ID is a problem.
+        report: If provided, problems are counted in it and logged only at DEBUG level.
 
     Returns:
         ID of hospitalizacny pripad or None if the ID is empty and error_if_incorrect is True.
@@ -35,23 +39,36 @@ def validate_id(id_hp: str, *, err_if_incorrect: bool) -> str | None:
         msg = "Riadok nemá vyplnené ID."
 
         if err_if_incorrect:
-            log_error_or_warning(logger, msg, error=err_if_incorrect)
+            report_issue(logger, msg, Issue("", "id", "prazdne"), error=err_if_incorrect, report=report)
             return None
 
         generated_id = uuid.uuid4().hex
         msg_with_new_id = f"{msg} Nové ID: {generated_id!r}."
-        log_error_or_warning(logger, msg_with_new_id, error=err_if_incorrect)
+        report_issue(
+            logger,
+            msg_with_new_id,
+            Issue(generated_id, "id", "prazdne"),
+            error=err_if_incorrect,
+            report=report,
+        )
         return generated_id
     return id_hp
 
 
-def validate_vek(vek_str: str, id_hp: str, *, err_if_incorrect: bool) -> int | None:
+def validate_vek(
+    vek_str: str,
+    id_hp: str,
+    *,
+    err_if_incorrect: bool,
+    report: ValidationReport | None = None,
+) -> int | None:
     """Validate vek of the hospitalizacny pripad.
 
     Args:
         vek_str: vek of hospitalizacny pripad
         id_hp: ID of hospitalizacny pripad
         err_if_incorrect: Flag indicating whether an incorrect vek is a problem.
+        report: If provided, problems are counted in it and logged only at DEBUG level.
 
     Returns:
         Vek of hospitalizacny pripad or None if vek is incorrect.
@@ -59,7 +76,7 @@ def validate_vek(vek_str: str, id_hp: str, *, err_if_incorrect: bool) -> int | N
     """
     if not vek_str.isdigit():
         msg = f"HP {id_hp} nemá správne vyplnený vek: {vek_str!r}."
-        log_error_or_warning(logger, msg, error=err_if_incorrect)
+        report_issue(logger, msg, Issue(id_hp, "vek", "format"), error=err_if_incorrect, report=report)
         return None
     return int(vek_str)
 
@@ -70,6 +87,7 @@ def validate_hmotnost(
     id_hp: str,
     *,
     err_if_incorrect: bool,
+    report: ValidationReport | None = None,
 ) -> float | None:
     """Validate hmotnost of the hospitalizacny pripad.
 
@@ -80,6 +98,7 @@ def validate_hmotnost(
         vek: vek of hospitalizacny pripad
         id_hp: ID of hospitalizacny pripad
         err_if_incorrect: Flag indicating whether an incorrect hmotnost is a problem.
+        report: If provided, problems are counted in it and logged only at DEBUG level.
 
     Returns:
         Hmotnost of hospitalizacny pripad or None if hmotnost is incorrect.
@@ -90,25 +109,33 @@ def validate_hmotnost(
     except ValueError:
         if vek is not None and vek == 0:
             msg = f"HP {id_hp} nemá správne vyplnenú hmotnosť: {hmotnost_str!r}."
-            log_error_or_warning(logger, msg, error=err_if_incorrect)
+            report_issue(logger, msg, Issue(id_hp, "hmotnost", "format"), error=err_if_incorrect, report=report)
         return None
 
     if vek == 0 and parsed_hmotnost == 0.0:
         msg = f"HP {id_hp} nemá správne vyplnenú hmotnosť: Ak je vek 0, hmotnosť nemôže byť 0."
-        log_error_or_warning(logger, msg, error=err_if_incorrect)
+        issue = Issue(id_hp, "hmotnost", "nulova_pri_veku_0")
+        report_issue(logger, msg, issue, error=err_if_incorrect, report=report)
 
     if parsed_hmotnost == 0.0:
         return None
     return parsed_hmotnost
 
 
-def validate_upv(upv_str: str, id_hp: str, *, err_if_incorrect: bool) -> int | None:
+def validate_upv(
+    upv_str: str,
+    id_hp: str,
+    *,
+    err_if_incorrect: bool,
+    report: ValidationReport | None = None,
+) -> int | None:
     """Validate počet hodín umelej pľúcnej ventilácie.
 
     Args:
         upv_str: Počet hodín umelej pľúcnej ventilácie of hospitalizacny pripad
         id_hp: ID of hospitalizacny pripad
         err_if_incorrect: Flag indicating whether an incorrect počet hodín umelej pľúcnej ventilácie is a problem.
+        report: If provided, problems are counted in it and logged only at DEBUG level.
 
     Returns:
         Počet hodín umelej pľúcnej ventilácie or None if počet hodín umelej pľúcnej ventilácie is incorrect.
@@ -116,18 +143,26 @@ def validate_upv(upv_str: str, id_hp: str, *, err_if_incorrect: bool) -> int | N
     """
     if not upv_str.isdigit():
         msg = f"HP {id_hp} nemá správne vyplnený počet hodín umelej pľúcnej ventilácie: {upv_str!r}."
-        log_error_or_warning(logger, msg, error=err_if_incorrect)
+        issue = Issue(id_hp, "umela_plucna_ventilacia", "format")
+        report_issue(logger, msg, issue, error=err_if_incorrect, report=report)
         return None
     return int(upv_str)
 
 
-def validate_druh_prijatia(druh_prijatia_str: str, id_hp: str, *, err_if_incorrect: bool) -> int | None:
+def validate_druh_prijatia(
+    druh_prijatia_str: str,
+    id_hp: str,
+    *,
+    err_if_incorrect: bool,
+    report: ValidationReport | None = None,
+) -> int | None:
     """Validate druh prijatia of hospitalizacny pripad.
 
     Args:
         druh_prijatia_str: Druh prijatia of hospitalizacny pripad
         id_hp: ID of hospitalizacny pripad
         err_if_incorrect: Flag indicating whether an incorrect druh prijatia is a problem.
+        report: If provided, problems are counted in it and logged only at DEBUG level.
 
     Returns:
         Druh prijatia of hospitalizacny pripad or None if druh prijatia is incorrect.
@@ -135,26 +170,62 @@ def validate_druh_prijatia(druh_prijatia_str: str, id_hp: str, *, err_if_incorre
     """
     if not druh_prijatia_str.isdigit():
         msg = f"HP {id_hp} nemá správne vyplnený druh prijatia: {druh_prijatia_str!r}."
-        log_error_or_warning(logger, msg, error=err_if_incorrect)
+        report_issue(logger, msg, Issue(id_hp, "druh_prijatia", "format"), error=err_if_incorrect, report=report)
         return None
 
     druh_prijatia = int(druh_prijatia_str)
 
     if not (1 <= druh_prijatia <= 9):
         msg = f"HP {id_hp} má druh prijatia mimo rozsahu 1-9: {druh_prijatia_str!r}."
-        log_error_or_warning(logger, msg, error=err_if_incorrect)
+        report_issue(logger, msg, Issue(id_hp, "druh_prijatia", "rozsah"), error=err_if_incorrect, report=report)
         return None
 
     return druh_prijatia
 
 
-def validate_vykony(vykony_str: str, id_hp: str, *, err_if_incorrect: bool) -> list[str] | None:
+def validate_datum_prijatia(
+    datum_prijatia_str: str,
+    id_hp: str,
+    *,
+    err_if_incorrect: bool,
+    report: ValidationReport | None = None,
+) -> date | None:
+    """Validate optional datum prijatia of hospitalizacny pripad.
+
+    Args:
+        datum_prijatia_str: Datum prijatia of hospitalizacny pripad in the format YYYY-MM-DD
+        id_hp: ID of hospitalizacny pripad
+        err_if_incorrect: Flag indicating whether an incorrect datum prijatia is a problem.
+        report: If provided, problems are counted in it and logged only at DEBUG level.
+
+    Returns:
+        Datum prijatia of hospitalizacny pripad or None if datum prijatia is empty or incorrect.
+
+    """
+    if datum_prijatia_str == "":
+        return None
+    try:
+        return date.fromisoformat(datum_prijatia_str)
+    except ValueError:
+        msg = f"HP {id_hp} nemá správne vyplnený dátum prijatia: {datum_prijatia_str!r}."
+        report_issue(logger, msg, Issue(id_hp, "datum_prijatia", "format"), error=err_if_incorrect, report=report)
+        return None
+
+
+def validate_vykony(
+    vykony_str: str,
+    id_hp: str,
+    *,
+    err_if_incorrect: bool,
+    report: ValidationReport | None = None,
+) -> list[str] | None:
     """Validate vykony of the hospitalizacny pripad.
 
     Args:
         vykony_str: Vykony of hospitalizacny pripad
         id_hp: ID of hospitalizacny pripad
         err_if_incorrect: Flag indicating whether an incorrect vykony is a problem.
+        report: If provided, problems are counted in it and logged only at DEBUG level.
 
     Returns:
         Vykony of hospitalizacny pripad or None if vykony is incorrect.
@@ -164,20 +235,27 @@ def validate_vykony(vykony_str: str, id_hp: str, *, err_if_incorrect: bool) -> l
         vykony = create_vykony_from_str(vykony_str)
     except ValueError:
         msg = f"HP {id_hp} nemá správne vyplnené vykony: {vykony_str!r}."
-        log_error_or_warning(logger, msg, error=err_if_incorrect)
+        report_issue(logger, msg, Issue(id_hp, "vykony", "format"), error=err_if_incorrect, report=report)
         if err_if_incorrect:
             return None
         return []
     return vykony
 
 
-def validate_markery(markery_str: str, id_hp: str, *, err_if_incorrect: bool) -> list[Marker] | None:
+def validate_markery(
+    markery_str: str,
+    id_hp: str,
+    *,
+    err_if_incorrect: bool,
+    report: ValidationReport | None = None,
+) -> list[Marker] | None:
     """Validate markery of the hospitalizacny pripad.
 
     Args:
         markery_str: Markery of hospitalizacny pripad
         id_hp: ID of hospitalizacny pripad
         err_if_incorrect: Flag indicating whether an incorrect markery is a problem.
+        report: If provided, problems are counted in it and logged only at DEBUG level.
 
     Returns:
         Markery of hospitalizacny pripad or None if markery is incorrect.
@@ -187,20 +265,27 @@ def validate_markery(markery_str: str, id_hp: str, *, err_if_incorrect: bool) ->
         markery = create_markery_from_str(markery_str)
     except ValueError:
         msg = f"HP {id_hp} nemá správne vyplnené markery: {markery_str!r}."
-        log_error_or_warning(logger, msg, error=err_if_incorrect)
+        report_issue(logger, msg, Issue(id_hp, "markery", "format"), error=err_if_incorrect, report=report)
         if err_if_incorrect:
             return None
         markery = []
     return markery
 
 
-def validate_diagnozy(diagnozy_str: str, id_hp: str, *, err_if_incorrect: bool) -> list[str] | None:
+def validate_diagnozy(
+    diagnozy_str: str,
+    id_hp: str,
+    *,
+    err_if_incorrect: bool,
+    report: ValidationReport | None = None,
+) -> list[str] | None:
     """Validate diagnozy of the hospitalizacny pripad.
 
     Args:
         diagnozy_str: Diagnozy of hospitalizacny pripad
         id_hp: ID of hospitalizacny pripad
         err_if_incorrect: Flag indicating whether an incorrect diagnozy is a problem.
+        report: If provided, problems are counted in it and logged only at DEBUG level.
 
     Returns:
         Diagnozy of hospitalizacny pripad or None if diagnozy is incorrect.
@@ -210,35 +295,47 @@ def validate_diagnozy(diagnozy_str: str, id_hp: str, *, err_if_incorrect: bool)
         diagnozy = create_diagnozy_from_str(diagnozy_str)
     except ValueError:
         msg = f"HP {id_hp} nemá správne vyplnené diagnozy: {diagnozy_str!r}."
-        log_error_or_warning(logger, msg, error=err_if_incorrect)
+        report_issue(logger, msg, Issue(id_hp, "diagnozy", "format"), error=err_if_incorrect, report=report)
         if err_if_incorrect:
             return None
         return []
     return diagnozy
 
 
-def create_hp_from_dict(hp_dict: dict, *, eval_incomplete: bool) -> HospitalizacnyPripad | None:
+def create_hp_from_dict(
+    hp_dict: dict,
+    *,
+    eval_incomplete: bool,
+    report: ValidationReport | None = None,
+) -> HospitalizacnyPripad | None:
     """Validate input dictionary and create HospitalizacnyPripad.
 
     Args:
         hp_dict: dictionary representing hospitalizacny pripad.
         eval_incomplete: Flag indicating whether to evaluate incomplete pripady.
+        report: If provided, problems are counted in it and logged only at DEBUG level.
 
     Returns:
         Created HospitalizacnyPripad or None if validation fails.
 
     """
-    id_hp = validate_id(hp_dict["id"], err_if_incorrect=not eval_incomplete)
+    err_if_incorrect = not eval_incomplete
+    id_hp = validate_id(hp_dict["id"], err_if_incorrect=err_if_incorrect, report=report)
     if id_hp is None:
         return None
 
-    vek = validate_vek(hp_dict["vek"], id_hp, err_if_incorrect=not eval_incomplete)
-    hmotnost = validate_hmotnost(hp_dict["hmotnost"], vek, id_hp, err_if_incorrect=not eval_incomplete)
-    upv = validate_upv(hp_dict["umela_plucna_ventilacia"], id_hp, err_if_incorrect=not eval_incomplete)
-    druh_prijatia = validate_druh_prijatia(hp_dict["druh_prijatia"], id_hp, err_if_incorrect=not eval_incomplete)
-    vykony_val = validate_vykony(hp_dict["vykony"], id_hp, err_if_incorrect=not eval_incomplete)
-    markery_val = validate_markery(hp_dict["markery"], id_hp, err_if_incorrect=not eval_incomplete)
-    diagnozy_val = validate_diagnozy(hp_dict["diagnozy"], id_hp, err_if_incorrect=not eval_incomplete)
+    vek = validate_vek(hp_dict["vek"], id_hp, err_if_incorrect=err_if_incorrect, report=report)
+    hmotnost = validate_hmotnost(hp_dict["hmotnost"], vek, id_hp, err_if_incorrect=err_if_incorrect, report=report)
+    upv = validate_upv(hp_dict["umela_plucna_ventilacia"], id_hp, err_if_incorrect=err_if_incorrect, report=report)
+    druh_prijatia = validate_druh_prijatia(
+        hp_dict["druh_prijatia"],
+        id_hp,
+        err_if_incorrect=err_if_incorrect,
+        report=report,
+    )
+    vykony_val = validate_vykony(hp_dict["vykony"], id_hp, err_if_incorrect=err_if_incorrect, report=report)
+    markery_val = validate_markery(hp_dict["markery"], id_hp, err_if_incorrect=err_if_incorrect, report=report)
+    diagnozy_val = validate_diagnozy(hp_dict["diagnozy"], id_hp, err_if_incorrect=err_if_incorrect, report=report)
     drg = standardize_code(hp_dict["drg"]) if hp_dict["drg"] else None
 
     if not eval_incomplete:
@@ -271,6 +368,28 @@ def create_hp_from_dict(hp_dict: dict, *, eval_incomplete: bool) -> Hospitalizac
     )
 
 
+def get_input_columns(csv_path: Path) -> list[str]:
+    """Return the columns of the input csv file, with or without the optional column datum_prijatia.
+
+    Args:
+        csv_path: Path to the csv file containing hospitalizacne pripady.
+
+    Returns:
+        `INPUT_COLUMNS`, optionally followed by `DATUM_PRIJATIA_COLUMN`.
+
+    Raises:
+        ValueError: If the csv file has other columns.
+
+    """
+    found_incorrect_columns = check_csv_columns(csv_path, INPUT_COLUMNS)
+    if found_incorrect_columns == [*INPUT_COLUMNS, DATUM_PRIJATIA_COLUMN]:
+        return found_incorrect_columns
+    if found_incorrect_columns:
+        msg = f"Nespravné hlavičky vstupného súboru. Očakávané: {INPUT_COLUMNS}. Nájdené: {found_incorrect_columns}."
+        raise ValueError(msg)
+    return INPUT_COLUMNS
+
+
 def check_csv_columns(csv_path: Path, expected_columns: list[str]) -> list[str]:
     """Check if the csv file has the expected columns.
 
@@ -290,16 +409,63 @@ def check_csv_columns(csv_path: Path, expected_columns: list[str]) -> list[str]:
         return fieldnames
 
 
-def yield_csv_rows(csv_path: Path) -> Generator[dict, None, None]:
+def yield_csv_rows(csv_path: Path, reject_path: Path | None = None) -> Generator[dict, None, None]:
     """Yield rows from the input csv file without header with predefined fieldnames.
 
     Args:
         csv_path: Path to the csv file containing hospitalizacne pripady.
+        reject_path: If provided, malformed lines are written into this file instead of stopping the run, see
+            `yield_tolerant_csv_rows`.
 
     Yields:
         row from the input csv
 
     """
+    if reject_path is not None:
+        yield from yield_tolerant_csv_rows(csv_path, reject_path)
+        return
+
     with csv_path.open("r", encoding="utf-8") as input_file:
         reader = csv.DictReader(input_file, delimiter=CSV_DELIMITER, strict=True)
         yield from reader
+
+
+def yield_tolerant_csv_rows(csv_path: Path, reject_path: Path) -> Generator[dict, None, None]:
+    """Yield rows from the input csv file, writing malformed lines into a reject file instead of raising.
+
+    Every line is parsed separately, so a stray quote cannot swallow the following lines. A line is rejected if it
+    cannot be decoded as UTF-8, cannot be parsed or has a different number of columns than the header. Rejected lines
+    are written unchanged, prefixed by their line number and the delimiter. Their count is logged at the end. Empty
+    lines are skipped as in the strict mode, quoted values spanning several lines are not supported.
+
+    Args:
+        csv_path: Path to the csv file containing hospitalizacne pripady.
+        reject_path: Path to the file with rejected lines.
+
+    Yields:
+        row from the input csv
+
+    """
+    number_of_rejected = 0
+    with (
+        csv_path.open("r", encoding="utf-8", errors="surrogateescape", newline="") as input_file,
+        reject_path.open("w", encoding="utf-8", errors="surrogateescape", newline="") as reject_file,
+    ):
+        fieldnames = next(csv.reader(input_file, delimiter=CSV_DELIMITER), [])
+        for line_number, line in enumerate(input_file, start=2):
+            if not line.strip():
+                continue
+            try:
+                line.encode("utf-8")
+                values = next(csv.reader([line], delimiter=CSV_DELIMITER, strict=True))
+            except (UnicodeEncodeError, csv.Error):
+                values = None
+            if values is None or len(values) != len(fieldnames):
+                raw_line = line.rstrip("\r\n")
+                reject_file.write(f"{line_number}{CSV_DELIMITER}{raw_line}\n")
+                number_of_rejected += 1
+                continue
+            yield dict(zip(fieldnames, values, strict=True))
+
+    log = logger.warning if number_of_rejected else logger.info
+    log(f"Počet odmietnutých nesprávne formátovaných riadkov: {number_of_rejected}. Sú v {reject_path}")
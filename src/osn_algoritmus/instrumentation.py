@@ -0,0 +1,219 @@
+"""Opt-in measurement of the time spent in individual prilohy and stages of processing.
+
+When no Instrumentation is passed to the engine, none of the code in this module is called.
+"""
+
+import dataclasses
+import json
+import time
+from collections import Counter
+from collections.abc import Callable, Generator, Iterable, Iterator
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any
+
+from osn_algoritmus.models import HospitalizacnyPripad
+from osn_algoritmus.prilohy_preparation import SKUPINY_KODOV, RuleSet
+from osn_algoritmus.utils import standardize_code
+
+
+@dataclasses.dataclass
+class Stats:
+    """Measured values for a single priloha or stage.
+
+    Attributes:
+        calls: Number of calls.
+        time: Cumulative time in seconds.
+        rows_scanned: Number of rows of prilohy tables accessed during the calls. A table is counted as a whole every
+            time it is accessed, so this is an upper bound for tables scanned with early exit. A group of kody checked
+            by its mask, see `SkupinyKodov.ma_kod`, is counted as the rows of the group, which the mask replaces.
+        sluzby: Number of medicinske sluzby produced.
+
+    """
+
+    calls: int = 0
+    time: float = 0.0
+    rows_scanned: int = 0
+    sluzby: int = 0
+
+
+class _CountingTables(dict):
+    """View of prilohy tables counting the number of rows of every accessed table."""
+
+    def __init__(self, tables: dict[str, list[dict[str, Any]]], instrumentation: "Instrumentation") -> None:
+        super().__init__(tables)
+        self._instrumentation = instrumentation
+
+    def __getitem__(self, key: str) -> list[dict[str, Any]]:
+        rows = super().__getitem__(key)
+        self._instrumentation.count_rows(len(rows))
+        return rows
+
+
+class _CountingSkupiny:
+    """View of groups of kody counting the number of rows of every checked group."""
+
+    def __init__(self, rule_set: RuleSet, instrumentation: "Instrumentation") -> None:
+        self._skupiny = rule_set.skupiny
+        self._instrumentation = instrumentation
+        self._rows = Counter(
+            (table_name, row[group_column] if group_column else "")
+            for table_name, (_, group_column) in SKUPINY_KODOV.items()
+            for row in rule_set.tables.get(table_name, [])
+        )
+
+    def maska(self, kody: Iterable[str]) -> int:
+        return self._skupiny.maska(kody)
+
+    def ma_kod(self, maska: int, table_name: str, skupina: str = "") -> bool:
+        self._instrumentation.count_rows(self._rows[table_name, skupina])
+        return self._skupiny.ma_kod(maska, table_name, skupina)
+
+
+class Instrumentation:
+    """Collect call counts, cumulative time, rows scanned and number of produced medicinske sluzby.
+
+    Prilohy are measured by `measure_priloha`, which is called from `prirad_ms`. Stages of processing are measured by
+    the `stage` context manager.
+    """
+
+    def __init__(self) -> None:
+        """Create empty statistics."""
+        self.prilohy: dict[str, Stats] = {}
+        self.stages: dict[str, Stats] = {}
+        # Measured rule sets are kept alive with their copies, so their ids cannot be reused by other rule sets.
+        self._counting_rule_sets: dict[int, tuple[RuleSet, RuleSet]] = {}
+        self._current: Stats | None = None
+        self._kody_cache_start = standardize_code.cache_info()
+
+    def _counting_rule_set(self, rule_set: RuleSet) -> RuleSet:
+        """Return a copy of the rule set, whose tables and groups of kody count accessed rows."""
+        cached = self._counting_rule_sets.get(id(rule_set))
+        if cached is None or cached[0] is not rule_set:
+            counting_rule_set = rule_set._replace(
+                tables=_CountingTables(rule_set.tables, self),
+                skupiny=_CountingSkupiny(rule_set, self),
+            )
+            cached = self._counting_rule_sets[id(rule_set)] = (rule_set, counting_rule_set)
+        return cached[1]
+
+    def count_rows(self, n: int) -> None:
+        """Add the number of accessed rows to the currently measured priloha."""
+        if self._current is not None:
+            self._current.rows_scanned += n
+
+    def measure_priloha(
+        self,
+        nazov: str,
+        priloha: Callable[..., list[str]],
+        hp: HospitalizacnyPripad,
+        *,
+        rule_set: RuleSet,
+        **kwargs: bool,
+    ) -> list[str]:
+        """Call the priloha function and record its statistics.
+
+        Args:
+            nazov: Name of the priloha.
+            priloha: Function evaluating the priloha.
+            hp: Hospitalizacny pripad
+            rule_set: Prepared prilohy
+            kwargs: Other keyword arguments of the priloha function.
+
+        Returns:
+            Result of the priloha function.
+
+        """
+        stats = self.prilohy.setdefault(nazov, Stats())
+        self._current = stats
+        start = time.perf_counter()
+        try:
+            sluzby = priloha(hp, rule_set=self._counting_rule_set(rule_set), **kwargs)
+        finally:
+            stats.time += time.perf_counter() - start
+            self._current = None
+        stats.calls += 1
+        stats.sluzby += len(sluzby)
+        return sluzby
+
+    @contextmanager
+    def stage(self, nazov: str) -> Generator[Stats, None, None]:
+        """Measure the time spent in the body of the with statement as a single call of the stage.
+
+        Args:
+            nazov: Name of the stage.
+
+        Yields:
+            Statistics of the stage.
+
+        """
+        stats = self.stages.setdefault(nazov, Stats())
+        start = time.perf_counter()
+        try:
+            yield stats
+        finally:
+            stats.time += time.perf_counter() - start
+            stats.calls += 1
+
+    def measure_iterable(self, nazov: str, iterable: Iterable) -> Iterator:
+        """Measure the time spent in producing items of the iterable.
+
+        Args:
+            nazov: Name of the stage.
+            iterable: Measured iterable.
+
+        Yields:
+            Items of the iterable.
+
+        """
+        iterator = iter(iterable)
+        while True:
+            with self.stage(nazov):
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+            yield item
+
+    def kody_cache(self) -> dict[str, float]:
+        """Return hits and misses of the cache of `standardize_code` since the instrumentation was created."""
+        info = standardize_code.cache_info()
+        hits = info.hits - self._kody_cache_start.hits
+        misses = info.misses - self._kody_cache_start.misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / (hits + misses) if hits + misses else 0.0,
+            "size": info.currsize,
+        }
+
+    def to_dict(self) -> dict[str, dict[str, Any]]:
+        """Return the collected statistics as a JSON serializable dictionary."""
+        return {
+            "prilohy": {nazov: dataclasses.asdict(stats) for nazov, stats in self.prilohy.items()},
+            "stages": {nazov: dataclasses.asdict(stats) for nazov, stats in self.stages.items()},
+            "kody_cache": self.kody_cache(),
+        }
+
+    def dump_json(self, path: Path) -> None:
+        """Write the collected statistics into a JSON file."""
+        with path.open("w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, indent=2, ensure_ascii=False)
+
+    def summary(self) -> str:
+        """Return the collected statistics formatted as a table."""
+        lines = [
+            f"{'':<8}{'nazov':<14}{'volania':>12}{'cas [s]':>12}{'us/volanie':>12}{'riadky':>16}{'sluzby':>12}",
+        ]
+        for group, stats_by_name in [("priloha", self.prilohy), ("etapa", self.stages)]:
+            for nazov, stats in stats_by_name.items():
+                per_call = stats.time / stats.calls * 1e6 if stats.calls else 0.0
+                lines.append(
+                    f"{group:<8}{nazov:<14}{stats.calls:>12}{stats.time:>12.3f}{per_call:>12.1f}"
+                    f"{stats.rows_scanned:>16}{stats.sluzby:>12}",
+                )
+        cache = self.kody_cache()
+        lines.append(
+            f"cache kodov: {cache['hits']} zasahov, {cache['misses']} vypadkov, uspesnost {cache['hit_rate']:.1%}",
+        )
+        return "\n".join(lines)
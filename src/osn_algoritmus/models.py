@@ -3,8 +3,15 @@
 More info: https://www.cksdrg.sk/sk/documents/file/DR%20davka%20274e_1.2?id=525
 """
 
+import bisect
 from typing import NamedTuple
 
+VEK_CATEGORIES = ["deti_0", "deti_1", "deti_7", "deti_16", "dospeli"]
+"""Vek categories in the order of columns of `osn_algoritmus.prilohy_preparation.UrovneMs`."""
+
+VEK_HRANICE = [1, 7, 16, 19]
+"""The lowest vek of every vek category but the first one."""
+
 
 class Marker(NamedTuple):
     """Represents a DRG marker."""
@@ -34,16 +41,14 @@ class HospitalizacnyPripad(NamedTuple):
         return self.vek <= 18
 
     @property
-    def vek_category(self) -> str | None:
-        """Returns the vek category of the hp."""
+    def vek_category_index(self) -> int | None:
+        """Returns the index of the vek category of the hp in `VEK_CATEGORIES`, or None if vek is not defined."""
         if self.vek is None:
             return None
-        if self.vek >= 19:
-            return "dospeli"
-        if self.vek >= 16:
-            return "deti_16"
-        if self.vek >= 7:
-            return "deti_7"
-        if self.vek >= 1:
-            return "deti_1"
-        return "deti_0"
+        return bisect.bisect_right(VEK_HRANICE, self.vek)
+
+    @property
+    def vek_category(self) -> str | None:
+        """Returns the vek category of the hp."""
+        index = self.vek_category_index
+        return None if index is None else VEK_CATEGORIES[index]
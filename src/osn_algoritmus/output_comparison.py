@@ -0,0 +1,326 @@
+"""Streaming comparison of two output files of the algoritmus with bounded memory.
+
+If both outputs contain the same ids in the same order (typically outputs for the same input file), they are walked
+in lockstep. Otherwise both outputs are split by a hash of id into partitions on disk and the partitions are joined
+one by one, so that only a single partition is held in memory.
+
+Run with:
+    python -m osn_algoritmus.output_comparison [-h] [--nazvy A B] [--sluzby SLUZBY] output_a output_b rozdiely
+"""
+
+import argparse
+import csv
+import dataclasses
+import itertools
+import logging
+import tempfile
+import zlib
+from collections import Counter
+from collections.abc import Generator, Iterable
+from pathlib import Path
+from typing import NamedTuple
+
+from osn_algoritmus.utils import CSV_DELIMITER
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PARTITIONS = 64
+
+
+class OutputRow(NamedTuple):
+    """Columns of an output row relevant for the comparison."""
+
+    id: str
+    ms: str
+    urovne_ms: str | None
+
+
+@dataclasses.dataclass
+class ServiceChanges:
+    """Changes of a single medicinska sluzba between two outputs.
+
+    Attributes:
+        pridane: Number of pripady, where the sluzba is only in the second output.
+        odobrate: Number of pripady, where the sluzba is only in the first output.
+        zmenena_uroven: Number of pripady, where the sluzba is in both outputs with a different uroven.
+
+    """
+
+    pridane: int = 0
+    odobrate: int = 0
+    zmenena_uroven: int = 0
+
+
+@dataclasses.dataclass
+class ComparisonSummary:
+    """Aggregated result of a comparison of two outputs.
+
+    Attributes:
+        porovnane: Number of compared pairs of rows.
+        rozdielne: Number of pairs with a different ms or urovne_ms.
+        len_v_a: Number of rows with an id missing in the second output.
+        len_v_b: Number of rows with an id missing in the first output.
+        sluzby: Changes keyed by kod of medicinska sluzba.
+
+    """
+
+    porovnane: int = 0
+    rozdielne: int = 0
+    len_v_a: int = 0
+    len_v_b: int = 0
+    sluzby: dict[str, ServiceChanges] = dataclasses.field(default_factory=dict)
+
+    def add_difference(self, row_a: OutputRow, row_b: OutputRow) -> None:
+        """Count changes of individual medicinske sluzby between two differing rows."""
+        ms_a, ms_b = split_ms(row_a.ms), split_ms(row_b.ms)
+        counts_a, counts_b = Counter(ms_a), Counter(ms_b)
+        for sluzba in counts_b - counts_a:
+            self.sluzby.setdefault(sluzba, ServiceChanges()).pridane += 1
+        for sluzba in counts_a - counts_b:
+            self.sluzby.setdefault(sluzba, ServiceChanges()).odobrate += 1
+
+        if row_a.urovne_ms is None or row_b.urovne_ms is None:
+            return
+        urovne_a = dict(reversed(list(zip(ms_a, row_a.urovne_ms.split("@"), strict=False))))
+        urovne_b = dict(reversed(list(zip(ms_b, row_b.urovne_ms.split("@"), strict=False))))
+        for sluzba in urovne_a.keys() & urovne_b.keys():
+            if urovne_a[sluzba] != urovne_b[sluzba]:
+                self.sluzby.setdefault(sluzba, ServiceChanges()).zmenena_uroven += 1
+
+
+def split_ms(ms: str) -> list[str]:
+    """Split the list of medicinske sluzby. Older versions of the algoritmus used '~' as the delimiter."""
+    split_at_sign_result = ms.split("@")
+    if len(split_at_sign_result) == 1:
+        return ms.split("~")
+    return split_at_sign_result
+
+
+def read_output_rows(output_path: Path, delimiter: str = CSV_DELIMITER) -> Generator[OutputRow, None, None]:
+    """Lazily read id, ms and urovne_ms from an output file.
+
+    Args:
+        output_path: Path to the output file of the algoritmus.
+        delimiter: Delimiter of the output file.
+
+    Yields:
+        Relevant columns of every row. urovne_ms is None, if the output does not contain the column.
+
+    """
+    with output_path.open(encoding="utf-8", newline="") as f:
+        reader = csv.DictReader(f, delimiter=delimiter)
+        has_urovne = "urovne_ms" in (reader.fieldnames or [])
+        for row in reader:
+            yield OutputRow(row["id"], row["ms"], row["urovne_ms"] if has_urovne else None)
+
+
+def rows_differ(row_a: OutputRow, row_b: OutputRow) -> bool:
+    """Return True if ms differ or urovne_ms differ, when both outputs contain them."""
+    if split_ms(row_a.ms) != split_ms(row_b.ms):
+        return True
+    return row_a.urovne_ms is not None and row_b.urovne_ms is not None and row_a.urovne_ms != row_b.urovne_ms
+
+
+def are_aligned(rows_a: Iterable[OutputRow], rows_b: Iterable[OutputRow]) -> bool:
+    """Return True if both outputs contain the same ids in the same order."""
+    sentinel = object()
+    return all(
+        row_a is not sentinel and row_b is not sentinel and row_a.id == row_b.id
+        for row_a, row_b in itertools.zip_longest(rows_a, rows_b, fillvalue=sentinel)
+    )
+
+
+def _partition_index(id_hp: str, partitions: int) -> int:
+    """Return a stable partition index of the id."""
+    return zlib.crc32(id_hp.encode("utf-8")) % partitions
+
+
+def _write_partitions(rows: Iterable[OutputRow], folder: Path, partitions: int) -> None:
+    """Split rows into partition files by a hash of id."""
+    folder.mkdir()
+    files = [(folder / f"{i}.csv").open("w", encoding="utf-8", newline="") for i in range(partitions)]
+    try:
+        writers = [csv.writer(f, delimiter=CSV_DELIMITER) for f in files]
+        for row in rows:
+            urovne_ms = "" if row.urovne_ms is None else row.urovne_ms
+            writers[_partition_index(row.id, partitions)].writerow([row.id, row.ms, urovne_ms, row.urovne_ms is None])
+    finally:
+        for f in files:
+            f.close()
+
+
+def _read_partition(path: Path) -> Generator[OutputRow, None, None]:
+    """Read rows of a single partition file."""
+    with path.open(encoding="utf-8", newline="") as f:
+        for id_hp, ms, urovne_ms, no_urovne in csv.reader(f, delimiter=CSV_DELIMITER):
+            yield OutputRow(id_hp, ms, None if no_urovne == "True" else urovne_ms)
+
+
+def _pair_partitioned(
+    rows_a: Iterable[OutputRow],
+    rows_b: Iterable[OutputRow],
+    summary: ComparisonSummary,
+    partitions: int,
+) -> Generator[tuple[OutputRow, OutputRow], None, None]:
+    """Pair rows with the same id using hash partitioning on disk. Rows with a duplicate id are paired each to each."""
+    with tempfile.TemporaryDirectory(prefix="osn_porovnanie_") as tmp:
+        folder_a, folder_b = Path(tmp) / "a", Path(tmp) / "b"
+        _write_partitions(rows_a, folder_a, partitions)
+        _write_partitions(rows_b, folder_b, partitions)
+
+        for i in range(partitions):
+            partition_a: dict[str, list[OutputRow]] = {}
+            for row_a in _read_partition(folder_a / f"{i}.csv"):
+                partition_a.setdefault(row_a.id, []).append(row_a)
+
+            matched_ids = set()
+            for row_b in _read_partition(folder_b / f"{i}.csv"):
+                if row_b.id not in partition_a:
+                    summary.len_v_b += 1
+                    continue
+                matched_ids.add(row_b.id)
+                for row_a in partition_a[row_b.id]:
+                    yield row_a, row_b
+
+            summary.len_v_a += sum(len(rows) for id_hp, rows in partition_a.items() if id_hp not in matched_ids)
+
+
+def yield_output_differences(  # noqa: PLR0913
+    output_a: Path,
+    output_b: Path,
+    summary: ComparisonSummary,
+    *,
+    delimiter_a: str = CSV_DELIMITER,
+    delimiter_b: str = CSV_DELIMITER,
+    partitions: int = DEFAULT_PARTITIONS,
+) -> Generator[tuple[OutputRow, OutputRow], None, None]:
+    """Lazily compare two output files and yield pairs of rows with the same id and a different result.
+
+    Args:
+        output_a: Path to the first output file.
+        output_b: Path to the second output file.
+        summary: Aggregated counts are accumulated into this object.
+        delimiter_a: Delimiter of the first output file.
+        delimiter_b: Delimiter of the second output file.
+        partitions: Number of partitions on disk used when the outputs are not aligned.
+
+    Yields:
+        Pairs of differing rows from the first and the second output.
+
+    """
+    if are_aligned(read_output_rows(output_a, delimiter_a), read_output_rows(output_b, delimiter_b)):
+        pairs = zip(read_output_rows(output_a, delimiter_a), read_output_rows(output_b, delimiter_b), strict=True)
+    else:
+        logger.info(f"Výstupy nemajú rovnaké poradie id, porovnávajú sa cez {partitions} partícií na disku.")
+        pairs = _pair_partitioned(
+            read_output_rows(output_a, delimiter_a),
+            read_output_rows(output_b, delimiter_b),
+            summary,
+            partitions,
+        )
+
+    for row_a, row_b in pairs:
+        summary.porovnane += 1
+        if rows_differ(row_a, row_b):
+            summary.rozdielne += 1
+            summary.add_difference(row_a, row_b)
+            yield row_a, row_b
+
+
+def compare_output_files(  # noqa: PLR0913
+    output_a: Path,
+    output_b: Path,
+    differences_path: Path,
+    *,
+    run_a_id: str = "a",
+    run_b_id: str = "b",
+    delimiter_a: str = CSV_DELIMITER,
+    delimiter_b: str = CSV_DELIMITER,
+    partitions: int = DEFAULT_PARTITIONS,
+) -> ComparisonSummary:
+    """Compare two output files and write the differing rows into a csv file.
+
+    Args:
+        output_a: Path to the first output file.
+        output_b: Path to the second output file.
+        differences_path: Path to the created file with differing rows.
+        run_a_id: Identifier of the first output used as a suffix of columns.
+        run_b_id: Identifier of the second output used as a suffix of columns.
+        delimiter_a: Delimiter of the first output file.
+        delimiter_b: Delimiter of the second output file.
+        partitions: Number of partitions on disk used when the outputs are not aligned.
+
+    Returns:
+        Aggregated counts of the comparison.
+
+    """
+    summary = ComparisonSummary()
+    fieldnames = ["id", f"ms_{run_a_id}", f"ms_{run_b_id}", f"urovne_ms_{run_a_id}", f"urovne_ms_{run_b_id}"]
+
+    with differences_path.open("w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f, delimiter=CSV_DELIMITER)
+        writer.writerow(fieldnames)
+        for row_a, row_b in yield_output_differences(
+            output_a,
+            output_b,
+            summary,
+            delimiter_a=delimiter_a,
+            delimiter_b=delimiter_b,
+            partitions=partitions,
+        ):
+            writer.writerow([row_a.id, row_a.ms, row_b.ms, row_a.urovne_ms or "", row_b.urovne_ms or ""])
+
+    return summary
+
+
+def write_service_changes(summary: ComparisonSummary, path: Path) -> None:
+    """Write changes of individual medicinske sluzby into a csv file, sorted by the total number of changes."""
+    with path.open("w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f, delimiter=CSV_DELIMITER)
+        writer.writerow(["sluzba", "pridane", "odobrate", "zmenena_uroven"])
+        for sluzba, changes in sorted(
+            summary.sluzby.items(),
+            key=lambda item: (-(item[1].pridane + item[1].odobrate + item[1].zmenena_uroven), item[0]),
+        ):
+            writer.writerow([sluzba, changes.pridane, changes.odobrate, changes.zmenena_uroven])
+
+
+def main(argv: list[str] | None = None) -> None:
+    """Run the comparison from the command line."""
+    parser = argparse.ArgumentParser(
+        prog="python -m osn_algoritmus.output_comparison",
+        description="Porovnanie dvoch výstupných súborov algoritmu s ohraničenou pamäťou.",
+    )
+    parser.add_argument("output_a", type=Path, help="Cesta k prvému výstupnému súboru.")
+    parser.add_argument("output_b", type=Path, help="Cesta k druhému výstupnému súboru.")
+    parser.add_argument("rozdiely", type=Path, help="Cesta k súboru, do ktorého sa zapíšu rozdielne prípady.")
+    parser.add_argument("--nazvy", nargs=2, default=["a", "b"], metavar=("A", "B"), help="Prípony stĺpcov výstupov.")
+    parser.add_argument("--sluzby", type=Path, default=None, help="Cesta k súboru so súhrnom zmien podľa služieb.")
+    parser.add_argument("--oddelovac_a", default=CSV_DELIMITER, help="Oddeľovač prvého výstupného súboru.")
+    parser.add_argument("--oddelovac_b", default=CSV_DELIMITER, help="Oddeľovač druhého výstupného súboru.")
+    parser.add_argument("--particie", type=int, default=DEFAULT_PARTITIONS, help="Počet partícií na disku.")
+    args = parser.parse_args(argv)
+
+    summary = compare_output_files(
+        args.output_a,
+        args.output_b,
+        args.rozdiely,
+        run_a_id=args.nazvy[0],
+        run_b_id=args.nazvy[1],
+        delimiter_a=args.oddelovac_a,
+        delimiter_b=args.oddelovac_b,
+        partitions=args.particie,
+    )
+    if args.sluzby is not None:
+        write_service_changes(summary, args.sluzby)
+
+    logger.info(
+        f"Porovnaných prípadov: {summary.porovnane}, rozdielnych: {summary.rozdielne}, iba v prvom výstupe:"
+        f" {summary.len_v_a}, iba v druhom výstupe: {summary.len_v_b}.",
+    )
+    logger.info(f"Rozdiely sú v {args.rozdiely}")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
+    main()
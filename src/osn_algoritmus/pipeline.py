@@ -0,0 +1,136 @@
+"""Pipelined processing overlapping reading and writing of files with the evaluation.
+
+A reader thread reads batches of rows, the calling thread evaluates them and a writer thread writes the results.
+The stages are connected by bounded queues, so a slow stage blocks the faster ones and the memory used does not depend
+on the size of the file.
+"""
+
+import itertools
+import queue
+import threading
+from collections.abc import Callable, Iterable
+from typing import Any
+
+DEFAULT_BATCH_SIZE = 1_000
+DEFAULT_MAX_BATCHES = 8
+
+_END = object()
+_POLL_INTERVAL = 0.1
+
+
+def _put(target: queue.Queue, item: Any, stop: threading.Event) -> bool:  # noqa: ANN401
+    """Put the item into the queue, give up when the pipeline is stopped. Return True if the item was put."""
+    while not stop.is_set():
+        try:
+            target.put(item, timeout=_POLL_INTERVAL)
+        except queue.Full:
+            continue
+        return True
+    return False
+
+
+def _get(source: queue.Queue, stop: threading.Event) -> Any:  # noqa: ANN401
+    """Get an item from the queue, return the end marker when the pipeline is stopped."""
+    while not stop.is_set():
+        try:
+            return source.get(timeout=_POLL_INTERVAL)
+        except queue.Empty:
+            continue
+    return _END
+
+
+def _read_batches(
+    rows: Iterable[dict],
+    batch_size: int,
+    read_queue: queue.Queue,
+    stop: threading.Event,
+    errors: list[BaseException],
+) -> None:
+    """Put batches of rows into the queue, followed by the end marker. Executed in the reader thread."""
+    try:
+        iterator = iter(rows)
+        while batch := list(itertools.islice(iterator, batch_size)):
+            if not _put(read_queue, batch, stop):
+                return
+    except BaseException as e:  # noqa: BLE001, re-raised in the calling thread
+        errors.append(e)
+        stop.set()
+    _put(read_queue, _END, stop)
+
+
+def _write_batches(
+    write_rows: Callable[[list[dict]], None],
+    write_queue: queue.Queue,
+    stop: threading.Event,
+    errors: list[BaseException],
+) -> None:
+    """Write batches of rows from the queue until the end marker. Executed in the writer thread."""
+    try:
+        while (batch := _get(write_queue, stop)) is not _END:
+            write_rows(batch)
+    except BaseException as e:  # noqa: BLE001, re-raised in the calling thread
+        errors.append(e)
+        stop.set()
+
+
+def run_pipeline(
+    rows: Iterable[dict],
+    process: Callable[[dict], dict],
+    write_rows: Callable[[list[dict]], None],
+    *,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    max_batches: int = DEFAULT_MAX_BATCHES,
+) -> None:
+    """Read rows in a reader thread, process them in the calling thread and write them in a writer thread.
+
+    The order of rows is preserved. If any stage raises an exception, the other stages are stopped and the exception is
+    re-raised in the calling thread.
+
+    Args:
+        rows: Rows to process. Iterated in the reader thread.
+        process: Function processing a single row. Called in the calling thread.
+        write_rows: Function writing a batch of processed rows. Called in the writer thread.
+        batch_size: Number of rows passed between the stages at once.
+        max_batches: Maximum number of batches waiting in each queue between the stages.
+
+    Raises:
+        ValueError: If batch_size or max_batches is smaller than 1.
+
+    """
+    if batch_size < 1 or max_batches < 1:
+        msg = f"batch_size a max_batches musia byť aspoň 1, zadané: {batch_size}, {max_batches}."
+        raise ValueError(msg)
+
+    read_queue: queue.Queue = queue.Queue(maxsize=max_batches)
+    write_queue: queue.Queue = queue.Queue(maxsize=max_batches)
+    stop = threading.Event()
+    errors: list[BaseException] = []
+
+    reader = threading.Thread(
+        target=_read_batches,
+        args=(rows, batch_size, read_queue, stop, errors),
+        name="citanie",
+        daemon=True,
+    )
+    writer = threading.Thread(
+        target=_write_batches,
+        args=(write_rows, write_queue, stop, errors),
+        name="zapis",
+        daemon=True,
+    )
+    reader.start()
+    writer.start()
+    try:
+        while (batch := _get(read_queue, stop)) is not _END:
+            if not _put(write_queue, [process(row) for row in batch], stop):
+                break
+        _put(write_queue, _END, stop)
+    except BaseException:
+        stop.set()
+        raise
+    finally:
+        writer.join()
+        reader.join()
+
+    if errors:
+        raise errors[0]
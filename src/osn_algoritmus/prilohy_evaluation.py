@@ -3,43 +3,61 @@
 Main functions are named priloha_x or prilohy_x_y. These functions always return a list of assigned medicinske sluzby.
 """
 
+import dataclasses
 import logging
-from collections.abc import Callable
+from collections import Counter
+from collections.abc import Callable, Collection
+from functools import partial
+from typing import NamedTuple
 
+from osn_algoritmus.heavy_hitters import UnmatchedCodes
+from osn_algoritmus.instrumentation import Instrumentation
 from osn_algoritmus.models import HospitalizacnyPripad, Marker
-from osn_algoritmus.prilohy_preparation import get_urovne, prepare_tables
+from osn_algoritmus.prilohy_preparation import RuleSet, load_default_rule_set
+from osn_algoritmus.validation_report import Issue, ValidationReport, report_issue
 
 logger = logging.getLogger(__name__)
 
-tables = prepare_tables()
-urovne = get_urovne(tables["p2_zoznam_ms"])
 
-def s_viacerymi_tazkymi_problemami(hp: HospitalizacnyPripad) -> bool:
+
+def __getattr__(name: str) -> object:
+    """Return `tables` and `urovne` of prilohy distributed with the package, loaded on first access."""
+    if name in {"tables", "urovne"}:
+        return getattr(load_default_rule_set(), name)
+    msg = f"module {__name__!r} has no attribute {name!r}"
+    raise AttributeError(msg)
+
+
+def s_viacerymi_tazkymi_problemami(hp: HospitalizacnyPripad, *, rule_set: RuleSet) -> bool:
     """Evaluate globálna funkcia "Viaceré ťažké problémy u novorodencov" v klasifikačnom systéme for hp.
 
     Args:
         hp: Hospitalizacny pripad
+        rule_set: Prepared prilohy
 
     Returns:
         True, if the hp "splnil podmienky pre globálnu funkciu „Viaceré ťažké problémy u novorodencov“."
 
     """
-    tazke_problemy = {line["kod_diagnozy"] for line in tables["p5_tazke_problemy_u_novorodencov"]}
-    pocet_tazkych_problemov = sum(1 for d in hp.diagnozy if d in tazke_problemy)
+    skupiny = rule_set.skupiny
+    pocet_tazkych_problemov = sum(
+        1 for d in hp.diagnozy if skupiny.ma_kod(skupiny.maska([d]), "p5_tazke_problemy_u_novorodencov")
+    )
     return pocet_tazkych_problemov >= 2
 
 
-def so_signifikantnym_vykonom(hp: HospitalizacnyPripad) -> bool:
+def so_signifikantnym_vykonom(hp: HospitalizacnyPripad, *, rule_set: RuleSet) -> bool:
     """Evaluate globálna funkcia "Signifikantný operačný výkon" v klasifikačnom systéme for hp.
 
     Args:
         hp: Hospitalizacny pripad
+        rule_set: Prepared prilohy
 
     Returns:
         True, if the hp "splnil podmienky pre globálnu funkciu „Signifikantný operačný výkon“."
 
     """
-    return any(line["kod_vykonu"] in hp.vykony for line in tables["p5_signifikantne_OP"])
+    return rule_set.skupiny.ma_kod(rule_set.skupiny.maska(hp.vykony), "p5_signifikantne_OP")
 
 
 def kriterium_nekonvencna_upv(hp: HospitalizacnyPripad) -> bool:
@@ -194,7 +212,7 @@ def kriterium_pod_hranicou_viability(hp: HospitalizacnyPripad) -> bool:
     return pod_500g or nizsi_gest_vek
 
 
-def kriterium_so_signifikantnym_op_vykonom(hp: HospitalizacnyPripad) -> bool:
+def kriterium_so_signifikantnym_op_vykonom(hp: HospitalizacnyPripad, *, rule_set: RuleSet) -> bool:
     """Evaluate kritérium „So signifikantným OP výkonom“ for hp.
 
     Vyhláška:
@@ -203,15 +221,20 @@ def kriterium_so_signifikantnym_op_vykonom(hp: HospitalizacnyPripad) -> bool:
 
     Args:
         hp: Hospitalizacny pripad
+        rule_set: Prepared prilohy
 
     Returns:
         True, if the hp fulfills kriterium „So signifikantným OP výkonom“.
 
     """
-    return so_signifikantnym_vykonom(hp)
+    return so_signifikantnym_vykonom(hp, rule_set=rule_set)
 
 
-def kriterium_bez_signifikantneho_op_s_upv_viac_95_hod_viacere_tazke_problemy(hp: HospitalizacnyPripad) -> bool:
+def kriterium_bez_signifikantneho_op_s_upv_viac_95_hod_viacere_tazke_problemy(
+    hp: HospitalizacnyPripad,
+    *,
+    rule_set: RuleSet,
+) -> bool:
     """Evaluate kritérium „Bez signifikantného OP výkonu, s UPV > 95 hodín, s viacerými ťažkými problémami“ for hp.
 
     Vyhláška:
@@ -223,19 +246,22 @@ def kriterium_bez_signifikantneho_op_s_upv_viac_95_hod_viacere_tazke_problemy(hp
 
     Args:
         hp: HospitalizacnyPripad
+        rule_set: Prepared prilohy
 
     Returns:
         True, if the hp fulfills kriterium „Bez signifikantného OP výkonu, s UPV > 95 hodín, s viacerými ťažkými
         problémami“.
 
     """
-    bez_signifikantneho_op = not so_signifikantnym_vykonom(hp)
+    bez_signifikantneho_op = not so_signifikantnym_vykonom(hp, rule_set=rule_set)
     s_upv_gt_95 = hp.upv is not None and hp.upv > 95
-    return bez_signifikantneho_op and s_upv_gt_95 and s_viacerymi_tazkymi_problemami(hp)
+    return bez_signifikantneho_op and s_upv_gt_95 and s_viacerymi_tazkymi_problemami(hp, rule_set=rule_set)
 
 
 def kriterium_bez_signifikantneho_op_bez_upv_viac_95_hod_a_viacerych_tazkych_problemov(
     hp: HospitalizacnyPripad,
+    *,
+    rule_set: RuleSet,
 ) -> bool:
     """Evaluate kritérium „Bez signifikantného OP výkonu a bez UPV > 95 hodín a viacerých ťažkých problémov“ for hp.
 
@@ -248,24 +274,26 @@ def kriterium_bez_signifikantneho_op_bez_upv_viac_95_hod_a_viacerych_tazkych_pro
 
     Args:
         hp: Hospitalizacny pripad
+        rule_set: Prepared prilohy
 
     Returns:
         True, if the hp fulfills kriterium „Bez signifikantného OP výkonu a bez UPV > 95 hodín a viacerých ťažkých
         problémov“.
 
     """
-    nesplnil_so_signifikantnym_op = not so_signifikantnym_vykonom(hp)
+    nesplnil_so_signifikantnym_op = not so_signifikantnym_vykonom(hp, rule_set=rule_set)
     bez_upv_viac_ako_95_hod = hp.upv is not None and not hp.upv > 95
-    nesplnil_s_viacerymi_tazkymi_problemami = not s_viacerymi_tazkymi_problemami(hp)
+    nesplnil_s_viacerymi_tazkymi_problemami = not s_viacerymi_tazkymi_problemami(hp, rule_set=rule_set)
     return nesplnil_so_signifikantnym_op and (bez_upv_viac_ako_95_hod or nesplnil_s_viacerymi_tazkymi_problemami)
 
 
-def splna_kriterium_podla_5(kriterium: str, hp: HospitalizacnyPripad) -> bool:
+def splna_kriterium_podla_5(kriterium: str, hp: HospitalizacnyPripad, *, rule_set: RuleSet) -> bool:
     """Evaluate kritérium from priloha 5 for hp.
 
     Args:
         kriterium: Kriterium name
         hp: Hospitalizacny pripad
+        rule_set: Prepared prilohy
 
     Returns:
         True, if the hp fulfills kriterium from priloha 5.
@@ -280,9 +308,15 @@ def splna_kriterium_podla_5(kriterium: str, hp: HospitalizacnyPripad) -> bool:
         "Marker - nemožnosť transportu novorodenca z medicínskych príčin na vyššie pracovisko": kriterium_marker_nemoznost_transportu,  # noqa: E501
         "Výkon 8p1007 s dobou UPV nižšiou ako 96 hodín": kriterium_vykon_8p1007_upv_menej_96_hod,
         "Novorodenec pod hranicou viability (< 24 týždeň alebo < 500 g)": kriterium_pod_hranicou_viability,
-        "So signifikantným OP výkonom": kriterium_so_signifikantnym_op_vykonom,
-        "Bez signifikantného OP výkonu, s UPV > 95 hodín, s viacerými ťažkými problémami": kriterium_bez_signifikantneho_op_s_upv_viac_95_hod_viacere_tazke_problemy,  # noqa: E501
-        "Bez signifikantného OP výkonu a bez UPV > 95 hodín a viacerých ťažkých problémov": kriterium_bez_signifikantneho_op_bez_upv_viac_95_hod_a_viacerych_tazkych_problemov,  # noqa: E501
+        "So signifikantným OP výkonom": partial(kriterium_so_signifikantnym_op_vykonom, rule_set=rule_set),
+        "Bez signifikantného OP výkonu, s UPV > 95 hodín, s viacerými ťažkými problémami": partial(
+            kriterium_bez_signifikantneho_op_s_upv_viac_95_hod_viacere_tazke_problemy,
+            rule_set=rule_set,
+        ),
+        "Bez signifikantného OP výkonu a bez UPV > 95 hodín a viacerých ťažkých problémov": partial(
+            kriterium_bez_signifikantneho_op_bez_upv_viac_95_hod_a_viacerych_tazkych_problemov,
+            rule_set=rule_set,
+        ),
     }
     if kriterium in kriteria_logic:
         return kriteria_logic[kriterium](hp)
@@ -290,7 +324,7 @@ def splna_kriterium_podla_5(kriterium: str, hp: HospitalizacnyPripad) -> bool:
     raise ValueError(msg)
 
 
-def priloha_5(hp: HospitalizacnyPripad) -> list[str]:
+def priloha_5(hp: HospitalizacnyPripad, *, rule_set: RuleSet) -> list[str]:
     """Assign medicinske sluzby according to priloha 5.
 
     Vyhláška:
@@ -300,6 +334,7 @@ def priloha_5(hp: HospitalizacnyPripad) -> list[str]:
 
     Args:
         hp: Hospitalizacny pripad
+        rule_set: Prepared prilohy
 
     Returns:
         List of assigned medicinske sluzby
@@ -310,9 +345,12 @@ def priloha_5(hp: HospitalizacnyPripad) -> list[str]:
 
     return [
         line["kod_ms"]
-        for line in tables["p5_NOV"]
+        for line in rule_set.tables["p5_NOV"]
         if hp.drg.startswith(line["drg"])
-        and (line["doplnujuce_kriterium"] == "" or splna_kriterium_podla_5(line["doplnujuce_kriterium"], hp))
+        and (
+            line["doplnujuce_kriterium"] == ""
+            or splna_kriterium_podla_5(line["doplnujuce_kriterium"], hp, rule_set=rule_set)
+        )
     ]
 
 
@@ -357,7 +395,7 @@ def splna_kriterium_podla_6(kriterium: str, hp: HospitalizacnyPripad) -> bool:
     raise ValueError(msg)
 
 
-def priloha_6(hp: HospitalizacnyPripad) -> list[str]:
+def priloha_6(hp: HospitalizacnyPripad, *, rule_set: RuleSet) -> list[str]:
     """Assign medicinske sluzby according to priloha 6.
 
     Vyhláška:
@@ -367,6 +405,7 @@ def priloha_6(hp: HospitalizacnyPripad) -> list[str]:
 
     Args:
         hp: Hospitalizacny pripad
+        rule_set: Prepared prilohy
 
     Returns:
         List of assigned medicinske sluzby
@@ -379,26 +418,31 @@ def priloha_6(hp: HospitalizacnyPripad) -> list[str]:
 
     return [
         line["kod_ms"]
-        for line in tables[table_name]
+        for line in rule_set.tables[table_name]
         if hp.drg.startswith(line["drg"]) and splna_kriterium_podla_6(line["doplnujuce_kriterium"], hp)
     ]
 
 
-def poskytnuty_vedlajsi_vykon(vedlajsie_vykony: list[str], skupina_vykonov: str, table_name: str) -> bool:
+def poskytnuty_vedlajsi_vykon(
+    vedlajsie_vykony: list[str],
+    skupina_vykonov: str,
+    table_name: str,
+    *,
+    rule_set: RuleSet,
+) -> bool:
     """Evaluate if the hp had at least one vedlajsi vykon from the given group of vykony.
 
     Args:
         vedlajsie_vykony: List of vedlajsie vykony
         skupina_vykonov: Identifier of the group of vykony
         table_name: Name of the table where the group of vykony is located
+        rule_set: Prepared prilohy
 
     Returns:
         True, if the hp had at least one vedlajsi vykon from the given group of vykony
 
     """
-    vykony = [vykon["kod_vykonu"] for vykon in tables[table_name] if vykon["kod_ms"] == skupina_vykonov]
-
-    return any(vykon in vykony for vykon in vedlajsie_vykony)
+    return rule_set.skupiny.ma_kod(rule_set.skupiny.maska(vedlajsie_vykony), table_name, skupina_vykonov)
 
 
 def apply_all_vykony_hlavne(
@@ -426,7 +470,13 @@ def apply_all_vykony_hlavne(
     return sluzby
 
 
-def prilohy_7_8(hp: HospitalizacnyPripad, *, all_vykony_hlavne: bool) -> list[str]:
+def prilohy_7_8(
+    hp: HospitalizacnyPripad,
+    *,
+    all_vykony_hlavne: bool,
+    rule_set: RuleSet,
+    only_extension: bool = False,
+) -> list[str]:
     """Assign medicinske sluzby according to priloha 7 and 8.
 
     Vyhláška:
@@ -441,6 +491,8 @@ def prilohy_7_8(hp: HospitalizacnyPripad, *, all_vykony_hlavne: bool) -> list[st
     Args:
         hp: Hospitalizacny pripad
         all_vykony_hlavne: True, if all possible hlavne vykony should be evaluated
+        rule_set: Prepared prilohy
+        only_extension: Return only the medicinske sluzby added by all_vykony_hlavne, see `prirad_ms_oba_rezimy`
 
     Returns:
         List of assigned medicinske sluzby
@@ -455,12 +507,12 @@ def prilohy_7_8(hp: HospitalizacnyPripad, *, all_vykony_hlavne: bool) -> list[st
     def apply_priloha(hp: HospitalizacnyPripad) -> list[str]:
         return [
             line["kod_ms"]
-            for line in tables[nazov_tabulky]
+            for line in rule_set.tables[nazov_tabulky]
             if line["kod_hlavneho_vykonu"] == hp.vykony[0]
-            and poskytnuty_vedlajsi_vykon(hp.vykony[1:], line["kod_ms"], nazov_vedlajsej_tabulky)
+            and poskytnuty_vedlajsi_vykon(hp.vykony[1:], line["kod_ms"], nazov_vedlajsej_tabulky, rule_set=rule_set)
         ]
 
-    sluzby = apply_priloha(hp)
+    sluzby = [] if only_extension else apply_priloha(hp)
 
     if all_vykony_hlavne:
         sluzby.extend(apply_all_vykony_hlavne(hp, apply_priloha))
@@ -468,7 +520,7 @@ def prilohy_7_8(hp: HospitalizacnyPripad, *, all_vykony_hlavne: bool) -> list[st
     return sluzby
 
 
-def prilohy_7a_8a(hp: HospitalizacnyPripad) -> list[str]:
+def prilohy_7a_8a(hp: HospitalizacnyPripad, *, rule_set: RuleSet) -> list[str]:
     """Assign medicinske sluzby according to priloha 7a and 8a.
 
     Vyhláška:
@@ -483,6 +535,7 @@ def prilohy_7a_8a(hp: HospitalizacnyPripad) -> list[str]:
 
     Args:
         hp: Hospitalizacny pripad
+        rule_set: Prepared prilohy
 
     Returns:
         List of assigned medicinske sluzby
@@ -495,30 +548,38 @@ def prilohy_7a_8a(hp: HospitalizacnyPripad) -> list[str]:
 
     return [
         line["kod_ms"]
-        for line in tables[table_name]
+        for line in rule_set.tables[table_name]
         if line["kod_vykonu"] in hp.vykony and line["marker"] in hp.markery
     ]
 
 
-def splna_diagnoza_zo_skupiny_podla_9(hlavna_diagnoza: str, skupina_diagnoz: str) -> bool:
+def splna_diagnoza_zo_skupiny_podla_9(
+    hlavna_diagnoza: str,
+    skupina_diagnoz: str,
+    *,
+    rule_set: RuleSet,
+) -> bool:
     """Evaluate if the hlavna diagnoza is in the given group of diagnozy.
 
     Args:
         hlavna_diagnoza: hlavna diagnoza
         skupina_diagnoz: Name of the group of diagnozy
+        rule_set: Prepared prilohy
 
     Returns:
         True, ak hlavná diagnóza je z uvedenej skupiny diagnóz, inak False
 
     """
-    cielove_diagnozy = [
-        line["kod_hlavnej_diagnozy"] for line in tables["p9_VD_diagnozy"] if line["skupina_diagnoz"] == skupina_diagnoz
-    ]
-
-    return any(hlavna_diagnoza == cielova_diagnoza for cielova_diagnoza in cielove_diagnozy)
+    return rule_set.skupiny.ma_kod(rule_set.skupiny.maska([hlavna_diagnoza]), "p9_VD_diagnozy", skupina_diagnoz)
 
 
-def priloha_9(hp: HospitalizacnyPripad, *, all_vykony_hlavne: bool) -> list[str]:
+def priloha_9(
+    hp: HospitalizacnyPripad,
+    *,
+    all_vykony_hlavne: bool,
+    rule_set: RuleSet,
+    only_extension: bool = False,
+) -> list[str]:
     """Assign medicinske sluzby according to priloha 9.
 
     Vyhláška:
@@ -529,6 +590,8 @@ def priloha_9(hp: HospitalizacnyPripad, *, all_vykony_hlavne: bool) -> list[str]
     Args:
         hp: Hospitalizacny pripad
         all_vykony_hlavne: True, if all possible hlavne vykony should be evaluated
+        rule_set: Prepared prilohy
+        only_extension: Return only the medicinske sluzby added by all_vykony_hlavne, see `prirad_ms_oba_rezimy`
 
     Returns:
         List of assigned medicinske sluzby
@@ -542,12 +605,12 @@ def priloha_9(hp: HospitalizacnyPripad, *, all_vykony_hlavne: bool) -> list[str]
     def apply_priloha(hp: HospitalizacnyPripad) -> list[str]:
         return [
             line["kod_ms"]
-            for line in tables[table_name]
+            for line in rule_set.tables[table_name]
             if line["kod_hlavneho_vykonu"] == hp.vykony[0]
-            and splna_diagnoza_zo_skupiny_podla_9(hp.diagnozy[0], line["skupina_diagnoz"])
+            and splna_diagnoza_zo_skupiny_podla_9(hp.diagnozy[0], line["skupina_diagnoz"], rule_set=rule_set)
         ]
 
-    sluzby = apply_priloha(hp)
+    sluzby = [] if only_extension else apply_priloha(hp)
 
     if all_vykony_hlavne:
         sluzby.extend(apply_all_vykony_hlavne(hp, apply_priloha))
@@ -555,7 +618,7 @@ def priloha_9(hp: HospitalizacnyPripad, *, all_vykony_hlavne: bool) -> list[str]
     return sluzby
 
 
-def priloha_9a(hp: HospitalizacnyPripad) -> list[str]:
+def priloha_9a(hp: HospitalizacnyPripad, *, rule_set: RuleSet) -> list[str]:
     """Assign medicinske sluzby according to priloha 9a.
 
     Vyhláška:
@@ -565,6 +628,7 @@ def priloha_9a(hp: HospitalizacnyPripad) -> list[str]:
 
     Args:
         hp: Hospitalizacny pripad
+        rule_set: Prepared prilohy
 
     Returns:
         List of assigned medicinske sluzby
@@ -575,12 +639,12 @@ def priloha_9a(hp: HospitalizacnyPripad) -> list[str]:
 
     return [
         line["kod_ms"]
-        for line in tables["p9a_MD_dospeli"]
+        for line in rule_set.tables["p9a_MD_dospeli"]
         if hp.diagnozy[0].startswith(line["kod_hlavnej_diagnozy"]) and line["marker"] in hp.markery
     ]
 
 
-def priloha_10(hp: HospitalizacnyPripad) -> list[str]:
+def priloha_10(hp: HospitalizacnyPripad, *, rule_set: RuleSet) -> list[str]:
     """Assign medicinske sluzby according to priloha 10.
 
     Vyhláška:
@@ -590,6 +654,7 @@ def priloha_10(hp: HospitalizacnyPripad) -> list[str]:
 
     Args:
         hp: Hospitalizacny pripad
+        rule_set: Prepared prilohy
 
     Returns:
         List of assigned medicinske sluzby
@@ -598,17 +663,24 @@ def priloha_10(hp: HospitalizacnyPripad) -> list[str]:
     if len(hp.diagnozy) < 2 or hp.je_dieta is None:
         return []
 
-    hlavne_diagnozy = [line["kod_hlavnej_diagnozy"] for line in tables["p10_DD_diagnozy"]]
-    table_vedlajsie_diagnozy = tables["p10_DD_deti"] if hp.je_dieta else tables["p10_DD_dospeli"]
+    if not rule_set.skupiny.ma_kod(rule_set.skupiny.maska(hp.diagnozy[:1]), "p10_DD_diagnozy"):
+        return []
+    table_vedlajsie_diagnozy = rule_set.tables["p10_DD_deti"] if hp.je_dieta else rule_set.tables["p10_DD_dospeli"]
 
     return [
         vedlajsia_diagnoza["kod_ms"]
         for vedlajsia_diagnoza in table_vedlajsie_diagnozy
-        if vedlajsia_diagnoza["kod_vedlajsej_diagnozy"] in hp.diagnozy[1:] and hp.diagnozy[0] in hlavne_diagnozy
+        if vedlajsia_diagnoza["kod_vedlajsej_diagnozy"] in hp.diagnozy[1:]
     ]
 
 
-def prilohy_12_13(hp: HospitalizacnyPripad, *, all_vykony_hlavne: bool) -> list[str]:
+def prilohy_12_13(
+    hp: HospitalizacnyPripad,
+    *,
+    all_vykony_hlavne: bool,
+    rule_set: RuleSet,
+    only_extension: bool = False,
+) -> list[str]:
     """Assign medicinske sluzby according to priloha 12 and 13.
 
     Vyhláška:
@@ -623,6 +695,8 @@ def prilohy_12_13(hp: HospitalizacnyPripad, *, all_vykony_hlavne: bool) -> list[
     Args:
         hp: Hospitalizacny pripad
         all_vykony_hlavne: True, if all possible hlavne vykony should be evaluated
+        rule_set: Prepared prilohy
+        only_extension: Return only the medicinske sluzby added by all_vykony_hlavne, see `prirad_ms_oba_rezimy`
 
     Returns:
         List of assigned medicinske sluzby
@@ -634,9 +708,9 @@ def prilohy_12_13(hp: HospitalizacnyPripad, *, all_vykony_hlavne: bool) -> list[
     table_name = "p12_V_deti" if hp.je_dieta else "p13_V_dospeli"
 
     def apply_priloha(hp: HospitalizacnyPripad) -> list[str]:
-        return [line["kod_ms"] for line in tables[table_name] if line["kod_vykonu"] == hp.vykony[0]]
+        return [line["kod_ms"] for line in rule_set.tables[table_name] if line["kod_vykonu"] == hp.vykony[0]]
 
-    sluzby = apply_priloha(hp)
+    sluzby = [] if only_extension else apply_priloha(hp)
 
     if all_vykony_hlavne:
         sluzby.extend(apply_all_vykony_hlavne(hp, apply_priloha))
@@ -644,7 +718,7 @@ def prilohy_12_13(hp: HospitalizacnyPripad, *, all_vykony_hlavne: bool) -> list[
     return sluzby
 
 
-def prilohy_14_15(hp: HospitalizacnyPripad) -> list[str]:
+def prilohy_14_15(hp: HospitalizacnyPripad, *, rule_set: RuleSet) -> list[str]:
     """Assign medicinske sluzby according to priloha 14 and 15.
 
     Vyhláška:
@@ -658,6 +732,7 @@ def prilohy_14_15(hp: HospitalizacnyPripad) -> list[str]:
 
     Args:
         hp: Hospitalizacny pripad
+        rule_set: Prepared prilohy
 
     Returns:
         List of assigned medicinske sluzby
@@ -667,10 +742,10 @@ def prilohy_14_15(hp: HospitalizacnyPripad) -> list[str]:
         return []
 
     table_name = "p14_D_deti" if hp.je_dieta else "p15_D_dospeli"
-    return [line["kod_ms"] for line in tables[table_name] if line["kod_diagnozy"] == hp.diagnozy[0]]
+    return [line["kod_ms"] for line in rule_set.tables[table_name] if line["kod_diagnozy"] == hp.diagnozy[0]]
 
 
-def priloha_16(hp: HospitalizacnyPripad) -> list[str]:
+def priloha_16(hp: HospitalizacnyPripad, *, rule_set: RuleSet) -> list[str]:
     """Assign medicinske sluzby according to priloha 16.
 
     Vyhláška:
@@ -680,6 +755,7 @@ def priloha_16(hp: HospitalizacnyPripad) -> list[str]:
 
     Args:
         hp: Hospitalizacny pripad
+        rule_set: Prepared prilohy
 
     Returns:
         List of assigned medicinske sluzby
@@ -692,13 +768,13 @@ def priloha_16(hp: HospitalizacnyPripad) -> list[str]:
     kod_ms_deti = "S58-14"
     table_names = ["p16_koma", "p16_opuch_mozgu", "p16_vybrane_ochorenia"]
 
-    for table_name in table_names:
-        if not any(line["kod_diagnozy"] in hp.diagnozy for line in tables[table_name]):
-            return []
+    diagnozy = rule_set.skupiny.maska(hp.diagnozy)
+    if not all(rule_set.skupiny.ma_kod(diagnozy, table_name) for table_name in table_names):
+        return []
     return [kod_ms_deti] if hp.je_dieta else [kod_ms_dospeli]
 
 
-def priloha_17(hp: HospitalizacnyPripad) -> list[str]:
+def priloha_17(hp: HospitalizacnyPripad, *, rule_set: RuleSet) -> list[str]:
     """Assign medicinske sluzby according to priloha 17.
 
     Vyhláška:
@@ -707,6 +783,7 @@ def priloha_17(hp: HospitalizacnyPripad) -> list[str]:
 
     Args:
         hp: Hospitalizacny pripad
+        rule_set: Prepared prilohy
 
     Returns:
         List of assigned medicinske sluzby
@@ -715,10 +792,183 @@ def priloha_17(hp: HospitalizacnyPripad) -> list[str]:
     if not hp.markery:
         return []
 
-    return [line["kod_ms"] for line in tables["p17_M"] if line["marker"] in hp.markery]
+    return [line["kod_ms"] for line in rule_set.tables["p17_M"] if line["marker"] in hp.markery]
+
+
+PRILOHY: dict[str, Callable[..., list[str]]] = {
+    "17": priloha_17,
+    "16": priloha_16,
+    "5": priloha_5,
+    "6": priloha_6,
+    "7_8": prilohy_7_8,
+    "7a_8a": prilohy_7a_8a,
+    "9": priloha_9,
+    "9a": priloha_9a,
+    "10": priloha_10,
+    "12_13": prilohy_12_13,
+    "14_15": prilohy_14_15,
+}
+"""Functions evaluating prilohy, in the order in which they are applied by prirad_ms."""
+
+PRILOHY_S_HLAVNYM_VYKONOM = {"7_8", "9", "12_13"}
+"""Prilohy whose evaluation depends on the all_vykony_hlavne flag."""
+
+
+class EvaluationHooks(NamedTuple):
+    """Optional observers of the evaluation of prilohy, which do not change its result.
 
+    Attributes:
+        instrumentation: If provided, calls of the priloha functions are measured by it.
+        unmatched: If provided, kody of the hp are counted by it when "S99-99" is assigned.
+
+    """
+
+    instrumentation: Instrumentation | None = None
+    unmatched: UnmatchedCodes | None = None
+
+
+NO_HOOKS = EvaluationHooks()
+"""Evaluation without any observers."""
+
+
+class RelevantneKody(NamedTuple):
+    """Codes referenced by a priloha. A hp can match the priloha only if it has a code from every set, which is set.
+
+    Attributes:
+        vykony: Kody vykonov, at least one of vykony of the hp must be in it.
+        diagnozy: Kody diagnoz, at least one of diagnozy of the hp must be in it.
+        hlavne_diagnozy: Kody diagnoz, the hlavna diagnoza of the hp must be in it.
+        markery: At least one of markery of the hp must be in it.
+        drg: Prefixes, DRG skupina of the hp must start with one of them.
+
+    """
+
+    vykony: frozenset[str] | None = None
+    diagnozy: frozenset[str] | None = None
+    hlavne_diagnozy: frozenset[str] | None = None
+    markery: frozenset[Marker] | None = None
+    drg: tuple[str, ...] | None = None
+
+    def moze_splnat(self, hp: HospitalizacnyPripad) -> bool:
+        """Return False if the hp certainly does not match the priloha."""
+        return (
+            (self.vykony is None or not self.vykony.isdisjoint(hp.vykony))
+            and (self.diagnozy is None or not self.diagnozy.isdisjoint(hp.diagnozy))
+            and (self.hlavne_diagnozy is None or (bool(hp.diagnozy) and hp.diagnozy[0] in self.hlavne_diagnozy))
+            and (self.markery is None or not self.markery.isdisjoint(hp.markery))
+            and (self.drg is None or (hp.drg is not None and hp.drg.startswith(self.drg)))
+        )
+
+
+def get_relevantne_kody(rule_set: RuleSet, prilohy: Collection[str] | None = None) -> dict[str, RelevantneKody]:
+    """Collect codes referenced by each priloha, see `RelevantneKody`.
+
+    Args:
+        rule_set: Prepared prilohy
+        prilohy: If provided, codes are collected only for these prilohy (names from `PRILOHY`).
+
+    Returns:
+        Codes referenced by the prilohy, in the order of `PRILOHY`.
+
+    """
+
+    def kody(table_names: list[str], column: str) -> frozenset:
+        rows = (row for name in table_names for row in rule_set.tables[name])
+        return frozenset(row[column] for row in rows if row[column] is not None)
+
+    # Only necessary conditions of every priloha are used, doplnujuce kriteria and vek are checked by the prilohy
+    builders: dict[str, Callable[[], RelevantneKody]] = {
+        "17": lambda: RelevantneKody(markery=kody(["p17_M"], "marker")),
+        "16": lambda: RelevantneKody(diagnozy=kody(["p16_koma"], "kod_diagnozy")),
+        "5": lambda: RelevantneKody(drg=tuple(kody(["p5_NOV"], "drg"))),
+        "6": lambda: RelevantneKody(drg=tuple(kody(["p6_DRGD_deti", "p6_DRGD_dospeli"], "drg"))),
+        "7_8": lambda: RelevantneKody(vykony=kody(["p7_VV_deti_hv", "p8_VV_dospeli_hv"], "kod_hlavneho_vykonu")),
+        "7a_8a": lambda: RelevantneKody(
+            vykony=kody(["p7a_MV_deti", "p8a_MV_dospeli"], "kod_vykonu"),
+            markery=kody(["p7a_MV_deti", "p8a_MV_dospeli"], "marker"),
+        ),
+        "9": lambda: RelevantneKody(
+            vykony=kody(["p9_VD_deti", "p9_VD_dospeli"], "kod_hlavneho_vykonu"),
+            hlavne_diagnozy=kody(["p9_VD_diagnozy"], "kod_hlavnej_diagnozy"),
+        ),
+        "9a": lambda: RelevantneKody(markery=kody(["p9a_MD_dospeli"], "marker")),
+        "10": lambda: RelevantneKody(
+            diagnozy=kody(["p10_DD_deti", "p10_DD_dospeli"], "kod_vedlajsej_diagnozy"),
+            hlavne_diagnozy=kody(["p10_DD_diagnozy"], "kod_hlavnej_diagnozy"),
+        ),
+        "12_13": lambda: RelevantneKody(vykony=kody(["p12_V_deti", "p13_V_dospeli"], "kod_vykonu")),
+        "14_15": lambda: RelevantneKody(hlavne_diagnozy=kody(["p14_D_deti", "p15_D_dospeli"], "kod_diagnozy")),
+    }
+    return {nazov: build() for nazov, build in builders.items() if prilohy is None or nazov in prilohy}
 
-def prirad_ms(hp: HospitalizacnyPripad, *, all_vykony_hlavne: bool) -> list[str]:
+
+PRILOHY_RYCHLEJ_CESTY = {"14_15"}
+"""Prilohy, which can be the only relevant prilohy of a pripad on the fast path."""
+
+
+@dataclasses.dataclass
+class PrefilterStats:
+    """Counts of pripady checked by the prefilter of prilohy.
+
+    Attributes:
+        pripady: Number of checked pripady.
+        rychla_cesta: Number of pripady, for which at most priloha 14/15 was evaluated.
+        preskocene: Number of pripady, for which the priloha was skipped, keyed by names from `PRILOHY`.
+
+    """
+
+    pripady: int = 0
+    rychla_cesta: int = 0
+    preskocene: Counter[str] = dataclasses.field(default_factory=Counter)
+
+    def add(self, vsetky: Collection[str], relevantne: Collection[str]) -> None:
+        """Count a pripad, for which only the relevant prilohy out of all prilohy are evaluated."""
+        self.pripady += 1
+        self.rychla_cesta += set(relevantne) <= PRILOHY_RYCHLEJ_CESTY
+        self.preskocene.update(nazov for nazov in vsetky if nazov not in relevantne)
+
+    def summary(self) -> str:
+        """Return the counts formatted as a table."""
+        lines = [
+            f"{'pripady':<20}{self.pripady:>12}",
+            f"{'rychla_cesta':<20}{self.rychla_cesta:>12}",
+            *(f"{'preskocena_' + nazov:<20}{pocet:>12}" for nazov, pocet in self.preskocene.items()),
+        ]
+        return "\n".join(lines)
+
+
+def resolve_prilohy(include: Collection[str] | None = None, exclude: Collection[str] | None = None) -> list[str] | None:
+    """Resolve the set of evaluated prilohy.
+
+    Args:
+        include: Names of prilohy from `PRILOHY` to evaluate. All prilohy if not provided.
+        exclude: Names of prilohy from `PRILOHY` not to evaluate.
+
+    Returns:
+        Names of evaluated prilohy in the order of `PRILOHY`, or None if all prilohy are evaluated.
+
+    Raises:
+        ValueError: If a name of a priloha is unknown.
+
+    """
+    unknown = {*(include or []), *(exclude or [])} - PRILOHY.keys()
+    if unknown:
+        msg = f"Neznáme prílohy: {sorted(unknown)}. Povolené: {list(PRILOHY)}."
+        raise ValueError(msg)
+    if include is None and not exclude:
+        return None
+    return [nazov for nazov in PRILOHY if (include is None or nazov in include) and nazov not in (exclude or [])]
+
+
+def prirad_ms(  # noqa: PLR0913, keyword-only options mirroring the flags of the engine
+    hp: HospitalizacnyPripad,
+    *,
+    all_vykony_hlavne: bool,
+    rule_set: RuleSet | None = None,
+    only_hlavna: bool = False,
+    prilohy: Collection[str] | None = None,
+    hooks: EvaluationHooks = NO_HOOKS,
+) -> list[str]:
     """Evaluate hp against all prilohy.
 
     If the hp does not match any medicinska sluzba according to prilohy, code "S99-99" is assigned.
@@ -726,49 +976,124 @@ def prirad_ms(hp: HospitalizacnyPripad, *, all_vykony_hlavne: bool) -> list[str]
     Args:
         hp: Hospitalizacny pripad
         all_vykony_hlavne: True, if all possible hlavne vykony should be evaluated
+        rule_set: Prepared prilohy. Defaults to prilohy distributed with the package.
+        only_hlavna: Stop at the first priloha assigning a medicinska sluzba and return only the hlavna medicinska
+            sluzba. It is always the same as the first element of the full list.
+        prilohy: If provided, only these prilohy (names from `PRILOHY`) are evaluated.
+        hooks: Instrumentation measuring the priloha functions and counter of kody of pripady without any
+            medicinska sluzba, none by default.
 
     Returns:
         List of assigned medicinske sluzby, first medicinska sluzba in the list is hlavna.
 
     """
-    sluzby = [
-        *priloha_17(hp),
-        *priloha_16(hp),
-        *priloha_5(hp),
-        *priloha_6(hp),
-        *prilohy_7_8(hp, all_vykony_hlavne=all_vykony_hlavne),
-        *prilohy_7a_8a(hp),
-        *priloha_9(hp, all_vykony_hlavne=all_vykony_hlavne),
-        *priloha_9a(hp),
-        *priloha_10(hp),
-        *prilohy_12_13(hp, all_vykony_hlavne=all_vykony_hlavne),
-        *prilohy_14_15(hp),
-    ]
-
+    if rule_set is None:
+        rule_set = load_default_rule_set()
+    sluzby = []
+    for nazov, priloha in PRILOHY.items():
+        if prilohy is not None and nazov not in prilohy:
+            continue
+        kwargs = {"all_vykony_hlavne": all_vykony_hlavne} if nazov in PRILOHY_S_HLAVNYM_VYKONOM else {}
+        if hooks.instrumentation is None:
+            sluzby.extend(priloha(hp, rule_set=rule_set, **kwargs))
+        else:
+            sluzby.extend(hooks.instrumentation.measure_priloha(nazov, priloha, hp, rule_set=rule_set, **kwargs))
+        if only_hlavna and sluzby:
+            return sluzby[:1]
+
+    if not sluzby and hooks.unmatched is not None:
+        hooks.unmatched.add(hp)
     return sluzby or ["S99-99"]
 
 
-def prirad_urovne_ms(hp: HospitalizacnyPripad, priradene_ms: list[str]) -> list[int | None]:
+def prirad_ms_oba_rezimy(
+    hp: HospitalizacnyPripad,
+    *,
+    rule_set: RuleSet | None = None,
+    prilohy: Collection[str] | None = None,
+) -> tuple[list[str], list[str]]:
+    """Evaluate hp against all prilohy without and with all_vykony_hlavne in a single pass.
+
+    Every priloha is evaluated once for the reported hlavny vykon. Prilohy from `PRILOHY_S_HLAVNYM_VYKONOM` are then
+    evaluated once more only for the other vykony as hlavne, and their medicinske sluzby are added to the second list.
+
+    Args:
+        hp: Hospitalizacny pripad
+        rule_set: Prepared prilohy. Defaults to prilohy distributed with the package.
+        prilohy: If provided, only these prilohy (names from `PRILOHY`) are evaluated.
+
+    Returns:
+        Results of `prirad_ms` with all_vykony_hlavne False and True.
+
+    """
+    if rule_set is None:
+        rule_set = load_default_rule_set()
+    zakladne = []
+    vsetky_vykony_hlavne = []
+    for nazov, priloha in PRILOHY.items():
+        if prilohy is not None and nazov not in prilohy:
+            continue
+        kwargs = {"all_vykony_hlavne": False} if nazov in PRILOHY_S_HLAVNYM_VYKONOM else {}
+        sluzby = priloha(hp, rule_set=rule_set, **kwargs)
+        zakladne.extend(sluzby)
+        vsetky_vykony_hlavne.extend(sluzby)
+        if nazov in PRILOHY_S_HLAVNYM_VYKONOM:
+            vsetky_vykony_hlavne.extend(priloha(hp, all_vykony_hlavne=True, rule_set=rule_set, only_extension=True))
+
+    return zakladne or ["S99-99"], vsetky_vykony_hlavne or ["S99-99"]
+
+
+def prirad_urovne_ms(
+    hp: HospitalizacnyPripad,
+    priradene_ms: list[str],
+    *,
+    rule_set: RuleSet | None = None,
+    report: ValidationReport | None = None,
+) -> list[int | None]:
     """Assign urovne medicinskej sluzby to the given list of medicinske sluzby for the given hp.
 
     Args:
         hp: Hospitalizacny pripad
         priradene_ms: Assigned medicinske sluzby to hp
+        rule_set: Prepared prilohy. Defaults to prilohy distributed with the package.
+        report: If provided, medicinske sluzby without uroven for the vek are counted in it and logged only at DEBUG
+            level.
 
     Returns:
         Urovne medicinskej sluzby
 
     """
-    if hp.vek_category is None:
+    vek_category = hp.vek_category_index
+    if vek_category is None:
         return [None] * len(priradene_ms)
 
-    urovne_ms = []
-    for ms in priradene_ms:
-        uroven = urovne[ms].get(hp.vek_category)
+    if rule_set is None:
+        rule_set = load_default_rule_set()
+    urovne_ms = rule_set.urovne.lookup_many([priradene_ms], [vek_category])[0]
+    report_chybajuce_urovne(hp, priradene_ms, urovne_ms, report=report)
+    return urovne_ms
+
+
+def report_chybajuce_urovne(
+    hp: HospitalizacnyPripad,
+    priradene_ms: list[str],
+    urovne_ms: list[int | None],
+    *,
+    report: ValidationReport | None = None,
+) -> None:
+    """Log or report medicinske sluzby without uroven for the vek of the hp.
+
+    Args:
+        hp: Hospitalizacny pripad with known vek
+        priradene_ms: Assigned medicinske sluzby to hp
+        urovne_ms: Urovne of the assigned medicinske sluzby
+        report: If provided, medicinske sluzby without uroven are counted in it and logged only at DEBUG level.
+
+    """
+    for ms, uroven in zip(priradene_ms, urovne_ms, strict=True):
         if uroven is None:
-            logger.warning(
+            msg = (
                 f"HP {hp.id} má priradenú medicínsku službu {ms}, pre ktorú nie je definovaná úroveň pre daný vek:"
-                f" {hp.vek}",
+                f" {hp.vek}"
             )
-        urovne_ms.append(uroven)
-    return urovne_ms
+            report_issue(logger, msg, Issue(hp.id, "urovne_ms", f"bez_urovne_{ms}"), error=False, report=report)
@@ -1,17 +1,188 @@
 """Functions related to preparation of prilohy tables."""
 
+import bisect
 import csv
+import functools
+from collections.abc import Collection, Iterable, Mapping
+from datetime import date
 from importlib import resources
-from typing import Any
+from importlib.resources.abc import Traversable
+from pathlib import Path
+from typing import Any, NamedTuple
 
+from .models import VEK_CATEGORIES
 from .utils import Marker, standardize_code, uses_marker
 
 TABLES_FOLDER = resources.files("osn_algoritmus").joinpath("Prilohy")
+# Date from which the prilohy distributed with the package are in force.
+TABLES_VALID_FROM = date(2025, 7, 1)
+
+PRILOHY_TABLES: dict[str, list[str]] = {
+    "17": ["p17_M"],
+    "16": ["p16_koma", "p16_opuch_mozgu", "p16_vybrane_ochorenia"],
+    "5": ["p5_NOV", "p5_signifikantne_OP", "p5_tazke_problemy_u_novorodencov"],
+    "6": ["p6_DRGD_deti", "p6_DRGD_dospeli"],
+    "7_8": ["p7_VV_deti_hv", "p7_VV_deti_vv", "p8_VV_dospeli_hv", "p8_VV_dospeli_vv"],
+    "7a_8a": ["p7a_MV_deti", "p8a_MV_dospeli"],
+    "9": ["p9_VD_deti", "p9_VD_dospeli", "p9_VD_diagnozy"],
+    "9a": ["p9a_MD_dospeli"],
+    "10": ["p10_DD_deti", "p10_DD_dospeli", "p10_DD_diagnozy"],
+    "12_13": ["p12_V_deti", "p13_V_dospeli"],
+    "14_15": ["p14_D_deti", "p15_D_dospeli"],
+}
+"""Tables used by each of the functions evaluating prilohy, keyed by the names used in `PRILOHY`."""
+
+COMMON_TABLES = ["p2_zoznam_ms"]
+"""Tables needed regardless of the evaluated prilohy (urovne medicinskych sluzieb)."""
+
+KODY_MS_MIMO_TABULIEK = ["S99-99", "S58-14", "S17-22"]
+"""Medicinske sluzby assigned by the algoritmus without being listed in a table of prilohy."""
+
+SKUPINY_KODOV: dict[str, tuple[str, str | None]] = {
+    "p5_signifikantne_OP": ("kod_vykonu", None),
+    "p5_tazke_problemy_u_novorodencov": ("kod_diagnozy", None),
+    "p7_VV_deti_vv": ("kod_vykonu", "kod_ms"),
+    "p8_VV_dospeli_vv": ("kod_vykonu", "kod_ms"),
+    "p9_VD_diagnozy": ("kod_hlavnej_diagnozy", "skupina_diagnoz"),
+    "p10_DD_diagnozy": ("kod_hlavnej_diagnozy", None),
+    "p16_koma": ("kod_diagnozy", None),
+    "p16_opuch_mozgu": ("kod_diagnozy", None),
+    "p16_vybrane_ochorenia": ("kod_diagnozy", None),
+}
+"""Tables listing groups of kody as (column with kody, column with names of groups or None for a single group)."""
+
+
+class UrovneMs(NamedTuple):
+    """Dense matrix of urovne with a row for every medicinska sluzba and a column for every vek category.
+
+    Attributes:
+        ids: Index of the row of every kod medicinskej sluzby.
+        matrix: Urovne for vek categories in the order of `VEK_CATEGORIES`, None if not defined.
 
+    """
+
+    ids: dict[str, int]
+    matrix: list[tuple[int | None, ...]]
+
+    def lookup(self, kody_ms: list[str], vek_category: str) -> list[int | None]:
+        """Return urovne of the medicinske sluzby for the vek category.
+
+        Raises:
+            KeyError: If a medicinska sluzba is not in p2 table. Cannot happen for medicinske sluzby from the
+                checked tables, see `check_kody_ms`.
+
+        """
+        return self.lookup_many([kody_ms], [VEK_CATEGORIES.index(vek_category)])[0]
+
+    def lookup_many(
+        self,
+        kody_ms: Iterable[list[str]],
+        vek_categories: Iterable[int | None],
+    ) -> list[list[int | None]]:
+        """Return urovne of the medicinske sluzby of several pripady at once.
+
+        Args:
+            kody_ms: Medicinske sluzby of every pripad.
+            vek_categories: Index of the vek category of every pripad in `VEK_CATEGORIES`, see
+                `HospitalizacnyPripad.vek_category_index`. None if unknown, then all urovne of the pripad are None.
+
+        Returns:
+            Urovne of the medicinske sluzby of every pripad.
+
+        Raises:
+            KeyError: If a medicinska sluzba is not in p2 table, see `lookup`.
+
+        """
+        ids = self.ids
+        rows = self.matrix
+        return [
+            [None] * len(kody) if column is None else [rows[ids[kod_ms]][column] for kod_ms in kody]
+            for kody, column in zip(kody_ms, vek_categories, strict=True)
+        ]
+
+
+class SkupinyKodov(NamedTuple):
+    """Groups of kody from tables of prilohy encoded as bit masks over interned kody.
+
+    Every kod listed in a group has its own bit, so whether a pripad has at least one kod from a group is decided by a
+    single `&` of the mask of the group with the mask of kody of the pripad, regardless of the size of the group.
+
+    Attributes:
+        bity: Bit of every kod listed in any group.
+        masky: Mask of every group keyed by the name of the table and the name of the group, "" for tables which form
+            a single group, see `SKUPINY_KODOV`.
+
+    """
+
+    bity: dict[str, int]
+    masky: dict[tuple[str, str], int]
+
+    def maska(self, kody: Iterable[str]) -> int:
+        """Return the mask of the kody. Kody not listed in any group are ignored."""
+        maska = 0
+        for kod in kody:
+            maska |= self.bity.get(kod, 0)
+        return maska
+
+    def ma_kod(self, maska: int, table_name: str, skupina: str = "") -> bool:
+        """Return True, if the mask of kody contains at least one kod from the group. Unknown groups are empty."""
+        return bool(maska & self.masky.get((table_name, skupina), 0))
+
+
+class RuleSet(NamedTuple):
+    """Prepared prilohy of a single version of vyhláška.
+
+    Attributes:
+        tables: Prepared tables, see `prepare_tables`.
+        urovne: Urovne medicinskych sluzieb, see `get_urovne`.
+        skupiny: Groups of kody from the tables as bit masks, see `get_skupiny_kodov`.
 
-def load_all_tables() -> dict[str, list[dict[str, str]]]:
+    """
+
+    tables: dict[str, list[dict[str, Any]]]
+    urovne: UrovneMs
+    skupiny: SkupinyKodov
+
+    def select_prilohy(self, prilohy: Collection[str]) -> "RuleSet":
+        """Return a rule set containing only the tables needed to evaluate the given prilohy.
+
+        Args:
+            prilohy: Names of prilohy from `PRILOHY_TABLES`.
+
+        Returns:
+            Rule set sharing the selected tables with this one.
+
+        """
+        return self._replace(tables={name: self.tables[name] for name in tables_for_prilohy(prilohy)})
+
+
+def tables_for_prilohy(prilohy: Collection[str]) -> list[str]:
+    """Return names of tables needed to evaluate the given prilohy.
+
+    Args:
+        prilohy: Names of prilohy from `PRILOHY_TABLES`.
+
+    Returns:
+        Names of the tables, including `COMMON_TABLES`.
+
+    """
+    unknown = set(prilohy) - PRILOHY_TABLES.keys()
+    if unknown:
+        msg = f"Neznáme prílohy: {sorted(unknown)}. Povolené: {list(PRILOHY_TABLES)}."
+        raise ValueError(msg)
+    return [*COMMON_TABLES, *(name for priloha in prilohy for name in PRILOHY_TABLES[priloha])]
+
+
+def load_all_tables(
+    tables_folder: Traversable | Path = TABLES_FOLDER,
+    table_names: Collection[str] | None = None,
+) -> dict[str, list[dict[str, str]]]:
     """Load all tables from files and return them in a dictionary.
 
+    Args:
+        tables_folder: Folder containing csv files of prilohy.
+        table_names: If provided, only these tables are loaded.
+
     Returns:
         Dictionary containing loaded tables, where the key is the filename without '.csv' and the value is a list of
         rows of the corresponding table.
@@ -19,9 +190,11 @@ def load_all_tables() -> dict[str, list[dict[str, str]]]:
     """
     tables = {}
 
-    for item in TABLES_FOLDER.iterdir():
+    for item in tables_folder.iterdir():
         if item.is_file() and item.name.endswith(".csv"):
             table_name = item.name.removesuffix(".csv")
+            if table_names is not None and table_name not in table_names:
+                continue
             with item.open(encoding="utf-8") as file:
                 csv_reader = csv.DictReader(file, delimiter=";")
                 tables[table_name] = list(csv_reader)
@@ -65,6 +238,8 @@ def prepare_kody(tables: dict[str, list[dict[str, str]]]) -> None:
     }
 
     for table_name, columns in columns_with_codes.items():
+        if table_name not in tables:
+            continue
         for column in columns:
             tables[table_name] = [{**x, column: standardize_code(x[column])} for x in tables[table_name]]
 
@@ -92,14 +267,21 @@ def sort_rows_by_markery(tables: dict[str, list[dict[str, Any]]]) -> None:
         rows.sort(key=lambda row: not uses_marker(table_name, row))
 
 
-def prepare_tables() -> dict[str, list[dict[str, Any]]]:
+def prepare_tables(
+    tables_folder: Traversable | Path = TABLES_FOLDER,
+    table_names: Collection[str] | None = None,
+) -> dict[str, list[dict[str, Any]]]:
     """Load and prepare all tables.
 
+    Args:
+        tables_folder: Folder containing csv files of prilohy.
+        table_names: If provided, only these tables are loaded.
+
     Returns:
         Dictionary containing loaded and prepared tables.
 
     """
-    tables = load_all_tables()
+    tables = load_all_tables(tables_folder, table_names)
 
     prepare_kody(tables)
     prepare_markery(tables)
@@ -108,12 +290,15 @@ def prepare_tables() -> dict[str, list[dict[str, Any]]]:
     return tables
 
 
-def get_urovne(p2_table: list[dict[str, str]]) -> dict[str, dict[str, int | None]]:
+def get_urovne(p2_table: list[dict[str, str]]) -> UrovneMs:
     """Parse urovne medicinskej sluzby from p2 table.
 
     Args:
         p2_table: Dictionary containing loaded prilohy.
 
+    Returns:
+        Matrix of urovne of medicinske sluzby, which are not zdielane.
+
     """
 
     def int_or_none(value: str) -> int | None:
@@ -121,14 +306,167 @@ def get_urovne(p2_table: list[dict[str, str]]) -> dict[str, dict[str, int | None
             return None
         return int(value)
 
-    return {
-        row["kod_ms"]: {
-            "deti_0": int_or_none(row["uroven_ms_deti_0"]),
-            "deti_1": int_or_none(row["uroven_ms_deti_1"]),
-            "deti_7": int_or_none(row["uroven_ms_deti_7"]),
-            "deti_16": int_or_none(row["uroven_ms_deti_16"]),
-            "dospeli": int_or_none(row["uroven_ms_dospeli"]),
-        }
+    rows = {
+        row["kod_ms"]: tuple(int_or_none(row[f"uroven_ms_{vek_category}"]) for vek_category in VEK_CATEGORIES)
         for row in p2_table
         if row["zdielana_ms"] == "False"
     }
+    return UrovneMs(ids={kod_ms: index for index, kod_ms in enumerate(rows)}, matrix=list(rows.values()))
+
+
+def get_skupiny_kodov(tables: dict[str, list[dict[str, Any]]]) -> SkupinyKodov:
+    """Intern kody from the tables listing groups of kody and build the mask of every group.
+
+    Args:
+        tables: Prepared tables.
+
+    Returns:
+        Masks of groups of kody from the loaded tables of `SKUPINY_KODOV`.
+
+    """
+    bity: dict[str, int] = {}
+    masky: dict[tuple[str, str], int] = {}
+    for table_name, (column, group_column) in SKUPINY_KODOV.items():
+        for row in tables.get(table_name, []):
+            bit = bity.setdefault(row[column], 1 << len(bity))
+            key = (table_name, row[group_column] if group_column else "")
+            masky[key] = masky.get(key, 0) | bit
+    return SkupinyKodov(bity=bity, masky=masky)
+
+
+def check_kody_ms(tables: dict[str, list[dict[str, Any]]], urovne: UrovneMs) -> None:
+    """Check that every medicinska sluzba assigned by the prilohy has urovne in p2 table.
+
+    Args:
+        tables: Prepared tables.
+        urovne: Urovne parsed from p2 table.
+
+    Raises:
+        ValueError: If any medicinska sluzba is missing in p2 table.
+
+    """
+    kody_ms = {
+        row["kod_ms"]: table_name
+        for table_name, rows in tables.items()
+        if table_name not in COMMON_TABLES
+        for row in rows
+        if "kod_ms" in row
+    }
+    kody_ms.update(dict.fromkeys(KODY_MS_MIMO_TABULIEK, "algoritmus"))
+    missing = {kod_ms: table_name for kod_ms, table_name in kody_ms.items() if kod_ms not in urovne.ids}
+    if missing:
+        msg = f"Medicínske služby chýbajú v tabuľke p2_zoznam_ms: {missing}."
+        raise ValueError(msg)
+
+
+def load_rule_set(
+    tables_folder: Traversable | Path = TABLES_FOLDER,
+    *,
+    prilohy: Collection[str] | None = None,
+) -> RuleSet:
+    """Load and prepare prilohy from the given folder.
+
+    Args:
+        tables_folder: Folder containing csv files of prilohy. Defaults to prilohy distributed with the package.
+        prilohy: If provided, only tables needed to evaluate these prilohy (names from `PRILOHY_TABLES`) are loaded.
+
+    Returns:
+        Prepared rule set.
+
+    Raises:
+        ValueError: If a medicinska sluzba from the prilohy is missing in p2 table.
+
+    """
+    tables = prepare_tables(tables_folder, None if prilohy is None else tables_for_prilohy(prilohy))
+    urovne = get_urovne(tables["p2_zoznam_ms"])
+    check_kody_ms(tables, urovne)
+    return RuleSet(tables=tables, urovne=urovne, skupiny=get_skupiny_kodov(tables))
+
+
+def load_default_rule_set(prilohy: Collection[str] | None = None) -> RuleSet:
+    """Load prilohy distributed with the package on first use and reuse them in later calls.
+
+    Args:
+        prilohy: If provided, only tables needed to evaluate these prilohy (names from `PRILOHY_TABLES`) are loaded.
+
+    Returns:
+        Prepared rule set, the same object for the same selection of prilohy.
+
+    """
+    return _load_default_rule_set(None if prilohy is None else frozenset(prilohy))
+
+
+@functools.cache
+def _load_default_rule_set(prilohy: frozenset[str] | None) -> RuleSet:
+    """Load prilohy distributed with the package once for every selection of prilohy."""
+    return load_rule_set(prilohy=prilohy)
+
+
+class RuleSetRegistry:
+    """Rule sets of several versions of prilohy indexed by the date from which they are in force.
+
+    Every rule set is in force from its date until the date of the next rule set. Each rule set is loaded once and
+    shared by all pripady falling into its period.
+    """
+
+    def __init__(self) -> None:
+        """Create an empty registry."""
+        self._valid_from: list[date] = []
+        self._rule_sets: list[RuleSet] = []
+
+    @classmethod
+    def from_folders(
+        cls,
+        folders: Mapping[date, Traversable | Path],
+        *,
+        default_rule_set: RuleSet | None = None,
+    ) -> "RuleSetRegistry":
+        """Load rule sets from folders.
+
+        Args:
+            folders: Folders containing csv files of prilohy keyed by the date from which they are in force.
+            default_rule_set: Prepared prilohy distributed with the package, registered from `TABLES_VALID_FROM`
+                unless `folders` contain the same date. Loaded from `TABLES_FOLDER` if not provided.
+
+        Returns:
+            New registry.
+
+        """
+        registry = cls()
+        if TABLES_VALID_FROM not in folders:
+            registry.add(TABLES_VALID_FROM, load_rule_set() if default_rule_set is None else default_rule_set)
+        for valid_from, folder in folders.items():
+            registry.add(valid_from, load_rule_set(folder))
+        return registry
+
+    def add(self, valid_from: date, rule_set: RuleSet) -> None:
+        """Register a rule set in force from the given date, replacing a rule set registered for the same date."""
+        index = bisect.bisect_left(self._valid_from, valid_from)
+        if index < len(self._valid_from) and self._valid_from[index] == valid_from:
+            self._rule_sets[index] = rule_set
+        else:
+            self._valid_from.insert(index, valid_from)
+            self._rule_sets.insert(index, rule_set)
+
+    def find(self, datum: date) -> tuple[date, RuleSet] | None:
+        """Find the rule set in force on the given date.
+
+        Args:
+            datum: Date, e.g. datum prijatia of hospitalizacny pripad.
+
+        Returns:
+            Date from which the rule set is in force and the rule set, or None if the date precedes all rule sets.
+
+        """
+        index = bisect.bisect_right(self._valid_from, datum) - 1
+        if index < 0:
+            return None
+        return self._valid_from[index], self._rule_sets[index]
+
+    def items(self) -> list[tuple[date, RuleSet]]:
+        """Return registered rule sets with dates from which they are in force, ordered by date."""
+        return list(zip(self._valid_from, self._rule_sets, strict=True))
+
+    def __len__(self) -> int:
+        """Return the number of registered rule sets."""
+        return len(self._rule_sets)
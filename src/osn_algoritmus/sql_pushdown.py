@@ -0,0 +1,397 @@
+"""Evaluation of the table-driven prilohy as set-based joins inside SQLite.
+
+Prepared tables of prilohy are loaded into temporary indexed tables. Validated pripady are expanded in batches into
+normalised temporary tables (case_id, pos, kod) of vykony, diagnozy and markery, and prilohy 17, 16, 7/8, 7a/8a, 9,
+9a, 10, 12/13 and 14/15 are evaluated for the whole batch by a single query. Prilohy 5 and 6, whose doplnujuce
+kriteria are procedural, are evaluated in Python and their results are merged into the same query. Validation and
+assignment of urovne are done by the Engine, so the results are the same as from `Engine.evaluate`.
+
+Run the equivalence check against the Python evaluation with:
+    python -m osn_algoritmus.sql_pushdown [-h] [-v] [-n] [-d] [--iba_hlavna_ms] input_path
+"""
+
+import itertools
+import logging
+import sqlite3
+import sys
+from collections import defaultdict
+from collections.abc import Generator, Iterable
+
+from tqdm import tqdm
+from tqdm.contrib.logging import logging_redirect_tqdm
+
+from osn_algoritmus.core import Engine
+from osn_algoritmus.input_preparation import check_csv_columns, yield_csv_rows
+from osn_algoritmus.models import HospitalizacnyPripad
+from osn_algoritmus.prilohy_evaluation import PRILOHY, resolve_prilohy
+from osn_algoritmus.prilohy_preparation import PRILOHY_TABLES
+from osn_algoritmus.utils import INPUT_COLUMNS, get_number_of_lines, setup_parser
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 10_000
+
+PRILOHY_V_PYTHONE = ["5", "6"]
+"""Prilohy with procedural doplnujuce kriteria, evaluated in Python."""
+
+RULE_TABLES = {
+    "p17_M": (["kod_ms"], "marker_kod, marker_hodnota"),
+    "p16_koma": (["kod_diagnozy"], "kod_diagnozy"),
+    "p16_opuch_mozgu": (["kod_diagnozy"], "kod_diagnozy"),
+    "p16_vybrane_ochorenia": (["kod_diagnozy"], "kod_diagnozy"),
+    "p7_VV_deti_hv": (["kod_hlavneho_vykonu", "kod_ms"], "kod_hlavneho_vykonu"),
+    "p7_VV_deti_vv": (["kod_vykonu", "kod_ms"], "kod_ms, kod_vykonu"),
+    "p8_VV_dospeli_hv": (["kod_hlavneho_vykonu", "kod_ms"], "kod_hlavneho_vykonu"),
+    "p8_VV_dospeli_vv": (["kod_vykonu", "kod_ms"], "kod_ms, kod_vykonu"),
+    "p7a_MV_deti": (["kod_vykonu", "kod_ms"], "kod_vykonu"),
+    "p8a_MV_dospeli": (["kod_vykonu", "kod_ms"], "kod_vykonu"),
+    "p9_VD_deti": (["kod_hlavneho_vykonu", "skupina_diagnoz", "kod_ms"], "kod_hlavneho_vykonu"),
+    "p9_VD_dospeli": (["kod_hlavneho_vykonu", "skupina_diagnoz", "kod_ms"], "kod_hlavneho_vykonu"),
+    "p9_VD_diagnozy": (["skupina_diagnoz", "kod_hlavnej_diagnozy"], "skupina_diagnoz, kod_hlavnej_diagnozy"),
+    "p9a_MD_dospeli": (["kod_hlavnej_diagnozy", "kod_ms"], "marker_kod, marker_hodnota"),
+    "p10_DD_deti": (["kod_vedlajsej_diagnozy", "kod_ms"], "kod_vedlajsej_diagnozy"),
+    "p10_DD_dospeli": (["kod_vedlajsej_diagnozy", "kod_ms"], "kod_vedlajsej_diagnozy"),
+    "p10_DD_diagnozy": (["kod_hlavnej_diagnozy"], "kod_hlavnej_diagnozy"),
+    "p12_V_deti": (["kod_vykonu", "kod_ms"], "kod_vykonu"),
+    "p13_V_dospeli": (["kod_vykonu", "kod_ms"], "kod_vykonu"),
+    "p14_D_deti": (["kod_diagnozy", "kod_ms"], "kod_diagnozy"),
+    "p15_D_dospeli": (["kod_diagnozy", "kod_ms"], "kod_diagnozy"),
+}
+"""Tables of prilohy evaluated in SQL, their columns used by the queries and their indexed columns."""
+
+CASE_TABLES = """
+CREATE TEMP TABLE IF NOT EXISTS osn_hp (
+    case_id INTEGER PRIMARY KEY, je_dieta INTEGER, pocet_vykonov INTEGER, prvy_vykon_prazdny INTEGER
+);
+CREATE TEMP TABLE IF NOT EXISTS osn_vykony (case_id INTEGER, pos INTEGER, kod TEXT);
+CREATE TEMP TABLE IF NOT EXISTS osn_diagnozy (case_id INTEGER, pos INTEGER, kod TEXT);
+CREATE TEMP TABLE IF NOT EXISTS osn_markery (case_id INTEGER, kod TEXT, hodnota TEXT);
+CREATE TEMP TABLE IF NOT EXISTS osn_python_ms (case_id INTEGER, priloha INTEGER, poradie INTEGER, kod_ms TEXT);
+CREATE INDEX IF NOT EXISTS temp.osn_vykony_case ON osn_vykony (case_id, pos);
+CREATE INDEX IF NOT EXISTS temp.osn_vykony_kod ON osn_vykony (kod);
+CREATE INDEX IF NOT EXISTS temp.osn_diagnozy_case ON osn_diagnozy (case_id, pos);
+CREATE INDEX IF NOT EXISTS temp.osn_diagnozy_kod ON osn_diagnozy (kod);
+CREATE INDEX IF NOT EXISTS temp.osn_markery_case ON osn_markery (case_id, kod, hodnota);
+"""
+
+
+def _with_dieta(query: str, deti_tables: tuple[str, ...], dospeli_tables: tuple[str, ...]) -> str:
+    """Return the query for deti and for dospeli joined by UNION ALL, `{0}`, `{1}` are replaced by table names."""
+    return "\nUNION ALL\n".join(
+        query.format(*tables, je_dieta=je_dieta) for tables, je_dieta in [(deti_tables, 1), (dospeli_tables, 0)]
+    )
+
+
+# Every query returns (case_id, pass, poradie, kod_ms). `pass` is the position of the vykon considered hlavny, 0 for
+# prilohy not depending on hlavny vykon, `poradie` is the index of the row in the prepared table of the priloha.
+PRILOHY_SQL = {
+    "17": """
+        SELECT DISTINCT m.case_id, 0, r.poradie, r.kod_ms
+        FROM osn_markery m JOIN osn_p17_M r ON r.marker_kod = m.kod AND r.marker_hodnota = m.hodnota
+    """,
+    "16": """
+        SELECT h.case_id, 0, 0, CASE WHEN h.je_dieta THEN 'S58-14' ELSE 'S17-22' END
+        FROM osn_hp h
+        WHERE h.je_dieta IS NOT NULL
+            AND EXISTS (SELECT 1 FROM osn_diagnozy d JOIN osn_p16_koma r ON r.kod_diagnozy = d.kod
+                WHERE d.case_id = h.case_id)
+            AND EXISTS (SELECT 1 FROM osn_diagnozy d JOIN osn_p16_opuch_mozgu r ON r.kod_diagnozy = d.kod
+                WHERE d.case_id = h.case_id)
+            AND EXISTS (SELECT 1 FROM osn_diagnozy d JOIN osn_p16_vybrane_ochorenia r ON r.kod_diagnozy = d.kod
+                WHERE d.case_id = h.case_id)
+    """,
+    "7_8": _with_dieta(
+        """
+        SELECT v.case_id, v.pos, r.poradie, r.kod_ms
+        FROM osn_hp h
+            JOIN osn_vykony v ON v.case_id = h.case_id AND (v.pos = 0 OR :vsetky_vykony_hlavne)
+            JOIN osn_{0} r ON r.kod_hlavneho_vykonu = v.kod
+        WHERE h.je_dieta = {je_dieta} AND h.pocet_vykonov >= 2 AND NOT h.prvy_vykon_prazdny
+            AND EXISTS (SELECT 1 FROM osn_vykony v2 JOIN osn_{1} w ON w.kod_ms = r.kod_ms AND w.kod_vykonu = v2.kod
+                WHERE v2.case_id = v.case_id AND v2.pos != v.pos)
+        """,
+        ("p7_VV_deti_hv", "p7_VV_deti_vv"),
+        ("p8_VV_dospeli_hv", "p8_VV_dospeli_vv"),
+    ),
+    "7a_8a": _with_dieta(
+        """
+        SELECT DISTINCT h.case_id, 0, r.poradie, r.kod_ms
+        FROM osn_hp h
+            JOIN osn_vykony v ON v.case_id = h.case_id
+            JOIN osn_{0} r ON r.kod_vykonu = v.kod
+            JOIN osn_markery m ON m.case_id = h.case_id AND m.kod = r.marker_kod AND m.hodnota = r.marker_hodnota
+        WHERE h.je_dieta = {je_dieta}
+        """,
+        ("p7a_MV_deti",),
+        ("p8a_MV_dospeli",),
+    ),
+    "9": _with_dieta(
+        """
+        SELECT v.case_id, v.pos, r.poradie, r.kod_ms
+        FROM osn_hp h
+            JOIN osn_vykony v ON v.case_id = h.case_id AND (v.pos = 0 OR :vsetky_vykony_hlavne)
+            JOIN osn_{0} r ON r.kod_hlavneho_vykonu = v.kod
+            JOIN osn_diagnozy d ON d.case_id = h.case_id AND d.pos = 0
+        WHERE h.je_dieta = {je_dieta} AND NOT h.prvy_vykon_prazdny
+            AND EXISTS (SELECT 1 FROM osn_p9_VD_diagnozy g
+                WHERE g.skupina_diagnoz = r.skupina_diagnoz AND g.kod_hlavnej_diagnozy = d.kod)
+        """,
+        ("p9_VD_deti",),
+        ("p9_VD_dospeli",),
+    ),
+    "9a": """
+        SELECT DISTINCT h.case_id, 0, r.poradie, r.kod_ms
+        FROM osn_hp h
+            JOIN osn_diagnozy d ON d.case_id = h.case_id AND d.pos = 0
+            JOIN osn_markery m ON m.case_id = h.case_id
+            JOIN osn_p9a_MD_dospeli r ON r.marker_kod = m.kod AND r.marker_hodnota = m.hodnota
+        WHERE h.je_dieta = 0 AND substr(d.kod, 1, length(r.kod_hlavnej_diagnozy)) = r.kod_hlavnej_diagnozy
+    """,
+    "10": _with_dieta(
+        """
+        SELECT DISTINCT h.case_id, 0, r.poradie, r.kod_ms
+        FROM osn_hp h
+            JOIN osn_diagnozy d0 ON d0.case_id = h.case_id AND d0.pos = 0
+            JOIN osn_diagnozy d ON d.case_id = h.case_id AND d.pos >= 1
+            JOIN osn_{0} r ON r.kod_vedlajsej_diagnozy = d.kod
+        WHERE h.je_dieta = {je_dieta} AND d0.kod IN (SELECT kod_hlavnej_diagnozy FROM osn_p10_DD_diagnozy)
+        """,
+        ("p10_DD_deti",),
+        ("p10_DD_dospeli",),
+    ),
+    "12_13": _with_dieta(
+        """
+        SELECT v.case_id, v.pos, r.poradie, r.kod_ms
+        FROM osn_hp h
+            JOIN osn_vykony v ON v.case_id = h.case_id AND (v.pos = 0 OR :vsetky_vykony_hlavne)
+            JOIN osn_{0} r ON r.kod_vykonu = v.kod
+        WHERE h.je_dieta = {je_dieta}
+        """,
+        ("p12_V_deti",),
+        ("p13_V_dospeli",),
+    ),
+    "14_15": _with_dieta(
+        """
+        SELECT d.case_id, 0, r.poradie, r.kod_ms
+        FROM osn_hp h
+            JOIN osn_diagnozy d ON d.case_id = h.case_id AND d.pos = 0
+            JOIN osn_{0} r ON r.kod_diagnozy = d.kod
+        WHERE h.je_dieta = {je_dieta}
+        """,
+        ("p14_D_deti",),
+        ("p15_D_dospeli",),
+    ),
+}
+"""Queries evaluating the table-driven prilohy for all pripady in the temporary tables."""
+
+
+class SqlEvaluator:
+    """Evaluate hospitalizacne pripady in batches with the table-driven prilohy evaluated inside SQLite.
+
+    Args:
+        engine: Engine providing the rule set, the flags, validation of pripady and assignment of urovne.
+        connection: Connection to the SQLite database, where the temporary tables are created. Defaults to a new
+            in-memory database.
+
+    """
+
+    def __init__(self, engine: Engine | None = None, connection: sqlite3.Connection | None = None) -> None:
+        """Load the tables of prilohy into temporary tables."""
+        self.engine = Engine() if engine is None else engine
+        self.connection = sqlite3.connect(":memory:") if connection is None else connection
+        prilohy = list(PRILOHY) if self.engine.prilohy is None else list(self.engine.prilohy)
+        self.sql_prilohy = [nazov for nazov in prilohy if nazov not in PRILOHY_V_PYTHONE]
+        self.python_prilohy = [nazov for nazov in prilohy if nazov in PRILOHY_V_PYTHONE]
+
+        self.connection.executescript(CASE_TABLES)
+        for priloha in self.sql_prilohy:
+            for table_name in PRILOHY_TABLES[priloha]:
+                self._load_table(table_name)
+
+        order = {nazov: index for index, nazov in enumerate(PRILOHY)}
+        parts = [
+            f"SELECT {order[nazov]}, * FROM ({PRILOHY_SQL[nazov]})"  # noqa: S608, constant queries
+            for nazov in self.sql_prilohy
+        ]
+        parts.append("SELECT priloha, case_id, 0, poradie, kod_ms FROM osn_python_ms")
+        self.query = (
+            "WITH vysledky (priloha, case_id, pass, poradie, kod_ms) AS (\n"
+            + "\nUNION ALL\n".join(parts)
+            + "\n)\nSELECT case_id, kod_ms FROM vysledky ORDER BY case_id, priloha, pass, poradie"
+        )
+
+    def _load_table(self, table_name: str) -> None:
+        """Create a temporary table with rows of the prepared table, their index and an index on the key columns."""
+        columns, indexed_columns = RULE_TABLES[table_name]
+        self.connection.execute(f"DROP TABLE IF EXISTS temp.osn_{table_name}")
+        self.connection.execute(
+            f"CREATE TEMP TABLE osn_{table_name} (poradie INTEGER, marker_kod TEXT, marker_hodnota TEXT"
+            + "".join(f", {column} TEXT" for column in columns)
+            + ")",
+        )
+        self.connection.executemany(
+            f"INSERT INTO osn_{table_name} VALUES ({', '.join('?' * (len(columns) + 3))})",  # noqa: S608
+            (
+                (poradie, *(row["marker"] or (None, None)), *(row[column] for column in columns))
+                for poradie, row in enumerate(self.engine.rule_set.tables[table_name])
+            ),
+        )
+        self.connection.execute(f"CREATE INDEX temp.osn_{table_name}_index ON osn_{table_name} ({indexed_columns})")
+
+    def _insert_cases(self, hps: list[HospitalizacnyPripad | None]) -> None:
+        """Replace the content of the temporary tables of pripady by the given validated pripady."""
+        for table_name in ["osn_hp", "osn_vykony", "osn_diagnozy", "osn_markery", "osn_python_ms"]:
+            self.connection.execute(f"DELETE FROM temp.{table_name}")  # noqa: S608, constant table names
+
+        valid = [(case_id, hp) for case_id, hp in enumerate(hps) if hp is not None]
+        self.connection.executemany(
+            "INSERT INTO osn_hp VALUES (?, ?, ?, ?)",
+            ((case_id, hp.je_dieta, len(hp.vykony), bool(hp.vykony) and hp.vykony[0] == "") for case_id, hp in valid),
+        )
+        self.connection.executemany(
+            "INSERT INTO osn_vykony VALUES (?, ?, ?)",
+            ((case_id, pos, kod) for case_id, hp in valid for pos, kod in enumerate(hp.vykony)),
+        )
+        self.connection.executemany(
+            "INSERT INTO osn_diagnozy VALUES (?, ?, ?)",
+            ((case_id, pos, kod) for case_id, hp in valid for pos, kod in enumerate(hp.diagnozy)),
+        )
+        self.connection.executemany(
+            "INSERT INTO osn_markery VALUES (?, ?, ?)",
+            ((case_id, marker.kod, marker.hodnota) for case_id, hp in valid for marker in hp.markery),
+        )
+        order = {nazov: index for index, nazov in enumerate(PRILOHY)}
+        self.connection.executemany(
+            "INSERT INTO osn_python_ms VALUES (?, ?, ?, ?)",
+            (
+                (case_id, order[nazov], poradie, kod_ms)
+                for case_id, hp in valid
+                for nazov in self.python_prilohy
+                for poradie, kod_ms in enumerate(PRILOHY[nazov](hp, rule_set=self.engine.rule_set))
+            ),
+        )
+
+    def evaluate_batch(self, hp_dicts: list[dict]) -> list[tuple[str, str] | None]:
+        """Evaluate a batch of hospitalizacne pripady.
+
+        Args:
+            hp_dicts: dictionaries representing hospitalizacne pripady.
+
+        Returns:
+            Result of `Engine.evaluate` for each dictionary, in the same order.
+
+        """
+        hps = [self.engine.parse(hp_dict) for hp_dict in hp_dicts]
+        self._insert_cases(hps)
+
+        sluzby = defaultdict(list)
+        for case_id, kod_ms in self.connection.execute(
+            self.query,
+            {"vsetky_vykony_hlavne": self.engine.all_vykony_hlavne},
+        ):
+            sluzby[case_id].append(kod_ms)
+
+        results = []
+        for case_id, hp in enumerate(hps):
+            if hp is None:
+                results.append(None)
+                continue
+            if case_id not in sluzby and self.engine.unmatched is not None:
+                self.engine.unmatched.add(hp)
+            medicinske_sluzby = sluzby.get(case_id) or ["S99-99"]
+            if self.engine.only_hlavna_ms:
+                medicinske_sluzby = medicinske_sluzby[:1]
+            results.append(self.engine.format_result(hp, medicinske_sluzby))
+        return results
+
+    def evaluate_many(
+        self,
+        hp_dicts: Iterable[dict],
+        batch_size: int = DEFAULT_BATCH_SIZE,
+    ) -> Generator[tuple[str, str] | None, None, None]:
+        """Lazily evaluate hospitalizacne pripady from any iterable in batches.
+
+        Args:
+            hp_dicts: dictionaries representing hospitalizacne pripady.
+            batch_size: Number of pripady evaluated by one query.
+
+        Yields:
+            Result of `Engine.evaluate` for each dictionary, in the same order.
+
+        """
+        iterator = iter(hp_dicts)
+        while batch := list(itertools.islice(iterator, batch_size)):
+            yield from self.evaluate_batch(batch)
+
+
+def find_differences(
+    hp_dicts: Iterable[dict],
+    engine: Engine,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+) -> Generator[tuple[dict, tuple[str, str] | None, tuple[str, str] | None], None, None]:
+    """Evaluate hospitalizacne pripady in Python and in SQLite and yield the ones with different results.
+
+    Args:
+        hp_dicts: dictionaries representing hospitalizacne pripady.
+        engine: Engine evaluating the pripady in Python, its rule set and flags are used also in SQLite.
+        batch_size: Number of pripady evaluated by one query.
+
+    Yields:
+        Input dictionary, result of the Python evaluation and result of the SQLite evaluation.
+
+    """
+    evaluator = SqlEvaluator(engine)
+    iterator = iter(hp_dicts)
+    while batch := list(itertools.islice(iterator, batch_size)):
+        for hp_dict, sql_result in zip(batch, evaluator.evaluate_batch(batch), strict=True):
+            python_result = engine.evaluate(hp_dict)
+            if python_result != sql_result:
+                yield hp_dict, python_result, sql_result
+
+
+def main(argv: list[str] | None = None) -> None:
+    """Run the equivalence check of the SQLite and Python evaluation on a csv file from the command line."""
+    parser = setup_parser(
+        input_path=True,
+        vsetky_vykony_hlavne=True,
+        vyhodnot_neuplne_pripady=True,
+        ponechaj_duplicity=True,
+        iba_hlavna_ms=True,
+        vyber_priloh=True,
+    )
+    parser.prog = "python -m osn_algoritmus.sql_pushdown"
+    parser.description = "Kontrola, že vyhodnotenie príloh v SQLite dáva rovnaké výsledky ako vyhodnotenie v Pythone."
+    args = parser.parse_args(argv)
+
+    try:
+        prilohy = resolve_prilohy(args.iba_prilohy, args.bez_priloh)
+    except ValueError as e:
+        parser.error(str(e))
+    found_incorrect_columns = check_csv_columns(args.input_path, INPUT_COLUMNS)
+    if found_incorrect_columns:
+        logger.error(f"Nespravné hlavičky vstupného súboru. Očakávané: {INPUT_COLUMNS}.")
+        sys.exit(1)
+
+    engine = Engine(
+        all_vykony_hlavne=args.vsetky_vykony_hlavne,
+        evaluate_incomplete_pripady=args.vyhodnot_neuplne_pripady,
+        allow_duplicates=args.ponechaj_duplicity,
+        only_hlavna_ms=args.iba_hlavna_ms,
+        prilohy=prilohy,
+    )
+    number_of_differences = 0
+    with logging_redirect_tqdm():
+        rows = tqdm(yield_csv_rows(args.input_path), total=get_number_of_lines(args.input_path) - 1, desc="Kontrola")
+        for hp_dict, python_result, sql_result in find_differences(rows, engine):
+            logger.error(f"HP {hp_dict['id']}: Python {python_result}, SQLite {sql_result}")
+            number_of_differences += 1
+
+    if number_of_differences:
+        logger.error(f"Počet prípadov s rozdielnym výsledkom: {number_of_differences}.")
+        sys.exit(1)
+    logger.info("Výsledky vyhodnotenia v SQLite a v Pythone sú rovnaké.")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
+    main()
@@ -0,0 +1,262 @@
+"""Evaluation of hospitalizacne pripady stored in a SQLite database.
+
+Pripady are read from a table or from a query in batches by `fetchmany` and the results are written into an output
+table by `executemany`, one transaction per batch.
+
+Run with:
+    python -m osn_algoritmus.sqlite_adapter [-h] (--tabulka TABULKA | --dotaz DOTAZ) [--vystupna_tabulka TABULKA]
+        [--v_databaze] [-v] [-n] [-d] input_path
+"""
+
+import itertools
+import logging
+import sqlite3
+import sys
+from collections.abc import Generator, Iterable
+from pathlib import Path
+
+from tqdm import tqdm
+from tqdm.contrib.logging import logging_redirect_tqdm
+
+from osn_algoritmus.core import Engine
+from osn_algoritmus.prilohy_evaluation import resolve_prilohy
+from osn_algoritmus.sql_pushdown import SqlEvaluator
+from osn_algoritmus.utils import INPUT_COLUMNS, setup_parser
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_OUTPUT_TABLE = "vysledky_ms"
+DEFAULT_READ_BATCH_SIZE = 10_000
+DEFAULT_WRITE_BATCH_SIZE = 10_000
+OUTPUT_COLUMNS = ["id", "ms", "urovne_ms"]
+
+
+def quote_identifier(name: str) -> str:
+    """Quote the name of a table or column for use in a SQL statement."""
+    return '"' + name.replace('"', '""') + '"'
+
+
+def yield_sqlite_rows(
+    connection: sqlite3.Connection,
+    query: str,
+    *,
+    batch_size: int = DEFAULT_READ_BATCH_SIZE,
+) -> Generator[dict[str, str], None, None]:
+    """Yield rows of the query as dictionaries of strings, as if they were read from the input csv file.
+
+    Args:
+        connection: Connection to the database.
+        query: SELECT statement returning at least the columns `INPUT_COLUMNS`.
+        batch_size: Number of rows fetched from the database at once.
+
+    Yields:
+        Row with values converted to strings, NULL is converted to an empty string.
+
+    Raises:
+        ValueError: If the query does not return all columns `INPUT_COLUMNS`.
+
+    """
+    cursor = connection.execute(query)
+    columns = [description[0] for description in cursor.description]
+    check_columns(columns)
+
+    while batch := cursor.fetchmany(batch_size):
+        for values in batch:
+            yield {column: "" if value is None else str(value) for column, value in zip(columns, values, strict=True)}
+
+
+def check_columns(columns: list[str]) -> None:
+    """Raise ValueError if the columns returned by the query do not contain all columns `INPUT_COLUMNS`."""
+    missing_columns = [column for column in INPUT_COLUMNS if column not in columns]
+    if missing_columns:
+        msg = f"Výsledok dotazu neobsahuje stĺpce {missing_columns}. Nájdené: {columns}."
+        raise ValueError(msg)
+
+
+def write_results(
+    connection: sqlite3.Connection,
+    output_table: str,
+    results: Iterable[tuple[str, str, str]],
+    *,
+    batch_size: int = DEFAULT_WRITE_BATCH_SIZE,
+) -> int:
+    """Write the results into the output table, every batch in its own transaction.
+
+    Args:
+        connection: Connection to the database.
+        output_table: Name of the existing output table with columns `OUTPUT_COLUMNS`.
+        results: Tuples (id, ms, urovne_ms).
+        batch_size: Number of rows inserted in one transaction.
+
+    Returns:
+        Number of written rows.
+
+    """
+    insert = f"INSERT INTO {quote_identifier(output_table)} VALUES (?, ?, ?)"  # noqa: S608, quoted identifier
+    number_of_rows = 0
+    batch = []
+    for result in results:
+        batch.append(result)
+        if len(batch) >= batch_size:
+            with connection:
+                connection.executemany(insert, batch)
+            number_of_rows += len(batch)
+            batch = []
+    if batch:
+        with connection:
+            connection.executemany(insert, batch)
+        number_of_rows += len(batch)
+    return number_of_rows
+
+
+def process_sqlite(  # noqa: PLR0913
+    database_path: Path,
+    *,
+    table: str | None = None,
+    query: str | None = None,
+    output_table: str = DEFAULT_OUTPUT_TABLE,
+    engine: Engine | None = None,
+    read_batch_size: int = DEFAULT_READ_BATCH_SIZE,
+    write_batch_size: int = DEFAULT_WRITE_BATCH_SIZE,
+    pushdown: bool = False,
+) -> int:
+    """Assign medicinske sluzby to hospitalizacne pripady from a SQLite database.
+
+    The results are written into a new table with columns id, ms and urovne_ms, which can be joined with the input by
+    id. Invalid pripady have 'ERROR' in both columns, as in the output of `process_csv`.
+
+    Args:
+        database_path: Path to the SQLite database.
+        table: Name of the table with hospitalizacne pripady with columns `INPUT_COLUMNS`.
+        query: SELECT statement returning hospitalizacne pripady, instead of table.
+        output_table: Name of the output table. It must not exist in the database.
+        engine: Engine evaluating the pripady. Defaults to an engine with prilohy distributed with the package and
+            no flags.
+        read_batch_size: Number of rows fetched from the database at once.
+        write_batch_size: Number of rows inserted into the output table in one transaction.
+        pushdown: Evaluate the table-driven prilohy inside the database by `SqlEvaluator`, in batches of
+            read_batch_size pripady.
+
+    Returns:
+        Number of evaluated pripady.
+
+    Raises:
+        ValueError: If neither or both of table and query are provided, if the database does not exist, if the output
+            table already exists or if the input does not contain all columns `INPUT_COLUMNS`.
+
+    """
+    if (table is None) == (query is None):
+        msg = "Je potrebné zadať práve jedno z: tabuľka, dotaz."
+        raise ValueError(msg)
+    if not Path(database_path).is_file():
+        msg = f"Databáza {database_path} neexistuje."
+        raise ValueError(msg)
+    if read_batch_size < 1 or write_batch_size < 1:
+        msg = f"Veľkosti dávok musia byť aspoň 1, zadané: {read_batch_size}, {write_batch_size}."
+        raise ValueError(msg)
+    if query is None:
+        query = f"SELECT * FROM {quote_identifier(table)}"  # noqa: S608, quoted identifier
+    engine = Engine() if engine is None else engine
+
+    connection = sqlite3.connect(database_path)
+    try:
+        exists = connection.execute("SELECT 1 FROM sqlite_master WHERE name = ?", (output_table,)).fetchone()
+        if exists:
+            msg = f"Výstupná tabuľka {output_table!r} už v databáze existuje."
+            raise ValueError(msg)
+        cursor = connection.execute(f"SELECT * FROM ({query}) LIMIT 0")  # noqa: S608
+        check_columns([description[0] for description in cursor.description])
+        number_of_rows = connection.execute(f"SELECT COUNT(*) FROM ({query})").fetchone()[0]  # noqa: S608
+        logger.info(f"Počet prípadov v databáze: {number_of_rows}")
+
+        columns = ", ".join(f"{column} TEXT" for column in OUTPUT_COLUMNS)
+        with connection:
+            connection.execute(f"CREATE TABLE {quote_identifier(output_table)} ({columns})")
+
+        rows = yield_sqlite_rows(connection, query, batch_size=read_batch_size)
+        with logging_redirect_tqdm():
+            rows = tqdm(rows, total=number_of_rows, desc="Spracovanie prípadov")
+            rows, rows_to_evaluate = itertools.tee(rows)
+            if pushdown:
+                evaluated = SqlEvaluator(engine, connection).evaluate_many(rows_to_evaluate, batch_size=read_batch_size)
+            else:
+                evaluated = map(engine.evaluate, rows_to_evaluate)
+            results = (
+                (row["id"], *(result or ("ERROR", "ERROR"))) for row, result in zip(rows, evaluated, strict=True)
+            )
+            number_of_written = write_results(connection, output_table, results, batch_size=write_batch_size)
+    finally:
+        connection.close()
+
+    logger.info(f"Algoritmus dokončený. Výsledky sú v tabuľke {output_table} v {database_path}")
+    return number_of_written
+
+
+def main(argv: list[str] | None = None) -> None:
+    """Run the evaluation of a SQLite database from the command line."""
+    parser = setup_parser(
+        input_path=True,
+        vsetky_vykony_hlavne=True,
+        vyhodnot_neuplne_pripady=True,
+        ponechaj_duplicity=True,
+        iba_hlavna_ms=True,
+        vyber_priloh=True,
+    )
+    parser.prog = "python -m osn_algoritmus.sqlite_adapter"
+    parser.description = (
+        "Vyhodnotenie prípadov uložených v SQLite databáze. Výsledky sa zapíšu do novej tabuľky v tej istej databáze."
+    )
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--tabulka", help="Názov tabuľky s prípadmi.")
+    source.add_argument("--dotaz", help="SELECT dotaz, ktorý vráti prípady.")
+    parser.add_argument(
+        "--vystupna_tabulka",
+        default=DEFAULT_OUTPUT_TABLE,
+        help=f"Názov novej tabuľky s výsledkami (predvolene {DEFAULT_OUTPUT_TABLE}).",
+    )
+    parser.add_argument(
+        "--davka_citania",
+        type=int,
+        default=DEFAULT_READ_BATCH_SIZE,
+        help="Počet riadkov načítaných z databázy naraz.",
+    )
+    parser.add_argument(
+        "--davka_zapisu",
+        type=int,
+        default=DEFAULT_WRITE_BATCH_SIZE,
+        help="Počet riadkov zapísaných do databázy v jednej transakcii.",
+    )
+    parser.add_argument(
+        "--v_databaze",
+        action="store_true",
+        help="Vyhodnotiť prílohy s tabuľkami priamo v databáze, prílohy 5 a 6 sa vyhodnotia v Pythone.",
+    )
+    args = parser.parse_args(argv)
+
+    try:
+        prilohy = resolve_prilohy(args.iba_prilohy, args.bez_priloh)
+        engine = Engine(
+            all_vykony_hlavne=args.vsetky_vykony_hlavne,
+            evaluate_incomplete_pripady=args.vyhodnot_neuplne_pripady,
+            allow_duplicates=args.ponechaj_duplicity,
+            only_hlavna_ms=args.iba_hlavna_ms,
+            prilohy=prilohy,
+        )
+        process_sqlite(
+            args.input_path,
+            table=args.tabulka,
+            query=args.dotaz,
+            output_table=args.vystupna_tabulka,
+            engine=engine,
+            read_batch_size=args.davka_citania,
+            write_batch_size=args.davka_zapisu,
+            pushdown=args.v_databaze,
+        )
+    except (ValueError, sqlite3.Error) as e:
+        logger.error(e)  # noqa: TRY400, we don't want to display the traceback to the end user
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
+    main()
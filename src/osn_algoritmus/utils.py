@@ -1,9 +1,12 @@
 """Utility functions."""
 
 import argparse
+import functools
 import logging
 import re
+from datetime import date
 from pathlib import Path
+from typing import Any
 
 from osn_algoritmus.models import Marker
 
@@ -22,6 +25,8 @@ INPUT_COLUMNS = [
     "drg",
     "druh_prijatia",
 ]
+# Optional input column, used to select the version of prilohy in force on the date of prijatie.
+DATUM_PRIJATIA_COLUMN = "datum_prijatia"
 
 
 def log_error_or_warning(logger: logging.Logger, message: str, *, error: bool) -> None:
@@ -32,9 +37,20 @@ def log_error_or_warning(logger: logging.Logger, message: str, *, error: bool) -
         logger.warning(message)
 
 
+NON_ALPHANUMERIC = re.compile("[^0-9a-zA-Z]")
+
+KODY_CACHE_SIZE = 2**16
+"""Maximal number of distinct kody remembered by `standardize_code`, well above the number of kody in the prilohy."""
+
+
+@functools.lru_cache(maxsize=KODY_CACHE_SIZE)
 def standardize_code(kod: str) -> str:
-    """Convert input to lowercase and remove all non-alphanumeric characters."""
-    return re.sub("[^0-9a-zA-Z]", "", kod).lower()
+    """Convert input to lowercase and remove all non-alphanumeric characters.
+
+    Results are cached, because the same kody of diagnozy and vykony recur in most of the pripady. Hits and misses of
+    the cache are available from `standardize_code.cache_info()`.
+    """
+    return NON_ALPHANUMERIC.sub("", kod).lower()
 
 
 def create_diagnozy_from_str(diagnozy_str: str) -> list[str]:
@@ -61,7 +77,7 @@ def create_vykony_from_str(vykony_str: str) -> list[str]:
             " Only the first vykon can be empty. Expected format '[vykon1]@vykon2@...'."
         )
         raise ValueError(msg)
-    return vykony
+    return [standardize_code(vykon) for vykon in vykony]
 
 
 def create_markery_from_str(markery: str) -> list[Marker]:
@@ -107,44 +123,36 @@ def uses_marker(table_name: str, row: dict) -> bool:
     return False
 
 
-def setup_parser(
-    *,
-    input_path: bool = False,
-    output_path: bool = False,
-    vsetky_vykony_hlavne: bool = False,
-    vyhodnot_neuplne_pripady: bool = False,
-    ponechaj_duplicity: bool = False,
-) -> argparse.ArgumentParser:
-    """Create a parser for the command-line arguments.
+def parse_dated_folder(value: str) -> tuple[date, Path]:
+    """Parse argument in the form 'YYYY-MM-DD=folder'."""
+    datum, _, folder = value.partition("=")
+    try:
+        return date.fromisoformat(datum), Path(folder)
+    except ValueError:
+        msg = f"Nesprávny formát {value!r}, očakávaný formát je 'RRRR-MM-DD=priecinok'."
+        raise argparse.ArgumentTypeError(msg) from None
 
-    Args:
-        input_path: If True, add an argument for the input path.
-        output_path: If True, add an argument for the output path.
-        vsetky_vykony_hlavne: If True, add an argument for vsetky_vykony_hlavne flag.
-        vyhodnot_neuplne_pripady: If True, add an argument for vyhodnot_neuplne_pripady flag.
-        ponechaj_duplicity: If True, add an argument for ponechaj_duplicity flag.
 
-    Returns:
-        The parser with the added arguments.
+def _argument(*names: str, **kwargs: Any) -> tuple[tuple[str, ...], dict[str, Any]]:  # noqa: ANN401
+    """Collect the arguments of `argparse.ArgumentParser.add_argument`."""
+    return names, kwargs
 
-    """
-    parser = argparse.ArgumentParser(
-        prog="python -m osn_algoritmus",
-        description="Skript na priraďovanie hospitalizačných prípadov do medicínskych služieb.",
-    )
 
-    if input_path:
-        parser.add_argument("input_path", type=Path, help="Cesta k súboru so vstupnými dátami.")
-    if output_path:
-        parser.add_argument(
+ARGUMENTS: dict[str, list[tuple[tuple[str, ...], dict[str, Any]]]] = {
+    "input_path": [
+        _argument("input_path", type=Path, help="Cesta k súboru so vstupnými dátami."),
+    ],
+    "output_path": [
+        _argument(
             "output_path",
             type=Path,
             nargs="?",
             default=None,
             help="Cesta k výstupnému súboru. Ak nie je zadaná, vytvorí sa odvodením od vstupného súboru.",
-        )
-    if vsetky_vykony_hlavne:
-        parser.add_argument(
+        ),
+    ],
+    "vsetky_vykony_hlavne": [
+        _argument(
             "--vsetky_vykony_hlavne",
             "-v",
             action="store_true",
@@ -152,9 +160,10 @@ def setup_parser(
                 "Pri vyhodnotení príloh predpokladaj, že ktorýkoľvek z vykázaných výkonov mohol byť hlavný. Štandardne"
                 " sa za hlavný výkon považuje iba prvý vykázaný, prípadne žiaden, pokiaľ zoznam začína znakom '@'."
             ),
-        )
-    if vyhodnot_neuplne_pripady:
-        parser.add_argument(
+        ),
+    ],
+    "vyhodnot_neuplne_pripady": [
+        _argument(
             "--vyhodnot_neuplne_pripady",
             "-n",
             action="store_true",
@@ -162,21 +171,245 @@ def setup_parser(
                 "V prípade, že nie je vyplnená nejaká povinná hodnota, aj tak pokračuj vo vyhodnocovaní. Štandardne"
                 " vráti hodnotu 'ERROR'."
             ),
-        )
-    if ponechaj_duplicity:
-        parser.add_argument(
+        ),
+    ],
+    "ponechaj_duplicity": [
+        _argument(
             "--ponechaj_duplicity",
             "-d",
             action="store_true",
             help="Vo výstupnom zozname medicínskych služieb ponechaj aj duplicitné záznamy.",
-        )
+        ),
+    ],
+    "iba_hlavna_ms": [
+        _argument(
+            "--iba_hlavna_ms",
+            action="store_true",
+            help=(
+                "Vráť iba hlavnú medicínsku službu a jej úroveň. Vyhodnocovanie príloh sa zastaví pri prvej prílohe,"
+                " ktorá priradí medicínsku službu. Výsledok je rovnaký ako prvý prvok úplného zoznamu."
+            ),
+        ),
+    ],
+    "vyber_priloh": [
+        _argument(
+            "--iba_prilohy",
+            nargs="+",
+            default=None,
+            metavar="PRILOHA",
+            help=(
+                "Vyhodnoť iba dané prílohy (17, 16, 5, 6, 7_8, 7a_8a, 9, 9a, 10, 12_13, 14_15)."
+                " Tabuľky ostatných príloh sa nenačítajú."
+            ),
+        ),
+        _argument(
+            "--bez_priloh",
+            nargs="+",
+            default=None,
+            metavar="PRILOHA",
+            help="Nevyhodnocuj dané prílohy. Ich tabuľky sa nenačítajú.",
+        ),
+    ],
+    "suhrn_validacie": [
+        _argument(
+            "--suhrn_validacie",
+            action="store_true",
+            help=(
+                "Namiesto varovania alebo chyby pre každé nesprávne pole každého prípadu počítaj problémy podľa poľa a"
+                " druhu. Súhrn sa vypíše na konci behu, jednotlivé problémy iba na úrovni DEBUG."
+            ),
+        ),
+        _argument(
+            "--validacia_subor",
+            type=Path,
+            default=None,
+            help=(
+                "Cesta k csv súboru, do ktorého sa zapíše každý problém so stĺpcami id, pole a kod. Zapína súhrn"
+                " validácie."
+            ),
+        ),
+    ],
+    "odmietnute_riadky": [
+        _argument(
+            "--odmietnute_riadky",
+            type=Path,
+            default=None,
+            help=(
+                "Cesta k súboru, do ktorého sa zapíšu nesprávne formátované riadky vstupného súboru (napr. s"
+                " neuzavretou úvodzovkou alebo iným počtom stĺpcov) s ich číslom riadku. Takéto riadky sa preskočia a"
+                " spracovanie pokračuje. Štandardne sa pri prvom takom riadku spracovanie ukončí."
+            ),
+        ),
+    ],
+    "zretazene_spracovanie": [
+        _argument(
+            "--zretazene_spracovanie",
+            action="store_true",
+            help=(
+                "Čítaj vstupný a zapisuj výstupný súbor v samostatných vláknach, súbežne s vyhodnocovaním prípadov."
+                " Zrýchli spracovanie najmä pri súboroch na sieťovom úložisku. Výstup je rovnaký."
+            ),
+        ),
+    ],
+    "predvyber_priloh": [
+        _argument(
+            "--predvyber_priloh",
+            action="store_true",
+            help=(
+                "Pred vyhodnotením prípadu preskoč prílohy, ktoré prípad nemôže splniť, lebo nemá žiadny z kódov"
+                " výkonov, diagnóz, markerov alebo DRG použitých v prílohe. Výstup je rovnaký."
+            ),
+        ),
+    ],
+    "agregacia": [
+        _argument(
+            "--agreguj",
+            metavar="KLUC",
+            default=None,
+            help=(
+                "Namiesto výstupu pre každý prípad zapíš iba počty prípadov podľa skupiny, medicínskej služby a úrovne"
+                " spolu s minimom na nemocnicu z tabuľky p2_zoznam_ms. Skupinou je hodnota stĺpca KLUC alebo pri"
+                " 'id:ODDELOVAC' časť id pred prvým oddeľovačom (napr. 'id:/')."
+            ),
+        ),
+    ],
+    "nezaradene_kody": [
+        _argument(
+            "--nezaradene_kody",
+            metavar="K",
+            type=int,
+            default=None,
+            help=(
+                "Na konci behu vypíš K najčastejších hlavných diagnóz, hlavných výkonov a DRG skupín prípadov, ktorým"
+                " bola priradená služba S99-99, s približnými počtami. Pamäťová náročnosť nezávisí od počtu prípadov."
+            ),
+        ),
+    ],
+    "profiluj": [
+        _argument(
+            "--profiluj",
+            action="store_true",
+            help=(
+                "Meraj počet volaní, čas, počet prehľadaných riadkov a počet priradených služieb pre jednotlivé"
+                " prílohy a etapy spracovania. Súhrn sa vypíše na konci behu."
+            ),
+        ),
+        _argument(
+            "--profil_json",
+            type=Path,
+            default=None,
+            help="Cesta k JSON súboru, do ktorého sa uloží výsledok merania. Zapína meranie.",
+        ),
+    ],
+    "tienove_prilohy": [
+        _argument(
+            "--tienove_prilohy",
+            type=Path,
+            default=None,
+            help=(
+                "Priečinok s csv súbormi inej verzie príloh (napr. pripravovanej novelizácie). Každý prípad sa"
+                " vyhodnotí aj podľa nich a výsledok sa zapíše do stĺpcov 'ms_shadow' a 'urovne_ms_shadow'. Stĺpec"
+                " 'zmena_shadow' obsahuje 1, ak sa výsledky líšia."
+            ),
+        ),
+    ],
+    "verzie_priloh": [
+        _argument(
+            "--verzia_priloh",
+            type=parse_dated_folder,
+            action="append",
+            default=[],
+            metavar="OD=PRIECINOK",
+            help=(
+                "Dátum účinnosti a priečinok s csv súbormi inej verzie príloh, napr. '2025-01-01=Prilohy_2025_01'."
+                " Môže byť zadaný viackrát. Prípady s vyplneným stĺpcom 'datum_prijatia' sa vyhodnotia podľa verzie"
+                " účinnej v deň prijatia."
+            ),
+        ),
+    ],
+}
+"""Arguments added by `setup_parser`, keyed by the name of its keyword argument, in the order of the help."""
+
+
+def setup_parser(  # noqa: PLR0913
+    *,
+    input_path: bool = False,
+    output_path: bool = False,
+    vsetky_vykony_hlavne: bool = False,
+    vyhodnot_neuplne_pripady: bool = False,
+    ponechaj_duplicity: bool = False,
+    profiluj: bool = False,
+    tienove_prilohy: bool = False,
+    verzie_priloh: bool = False,
+    iba_hlavna_ms: bool = False,
+    vyber_priloh: bool = False,
+    suhrn_validacie: bool = False,
+    odmietnute_riadky: bool = False,
+    zretazene_spracovanie: bool = False,
+    predvyber_priloh: bool = False,
+    agregacia: bool = False,
+    nezaradene_kody: bool = False,
+) -> argparse.ArgumentParser:
+    """Create a parser for the command-line arguments.
+
+    Args:
+        input_path: If True, add an argument for the input path.
+        output_path: If True, add an argument for the output path.
+        vsetky_vykony_hlavne: If True, add an argument for vsetky_vykony_hlavne flag.
+        vyhodnot_neuplne_pripady: If True, add an argument for vyhodnot_neuplne_pripady flag.
+        ponechaj_duplicity: If True, add an argument for ponechaj_duplicity flag.
+        profiluj: If True, add arguments for measuring the time spent in prilohy and stages of processing.
+        tienove_prilohy: If True, add an argument for the folder with shadow prilohy.
+        verzie_priloh: If True, add an argument for folders with prilohy in force from the given dates.
+        iba_hlavna_ms: If True, add an argument for iba_hlavna_ms flag.
+        vyber_priloh: If True, add arguments for selecting evaluated prilohy.
+        suhrn_validacie: If True, add arguments for aggregated reporting of problems in the input data.
+        odmietnute_riadky: If True, add an argument for the file with malformed lines of the input file.
+        zretazene_spracovanie: If True, add an argument for reading and writing files in separate threads.
+        predvyber_priloh: If True, add an argument for skipping prilohy, which a pripad cannot match.
+        agregacia: If True, add an argument for writing only counts of pripady per group instead of every pripad.
+        nezaradene_kody: If True, add an argument for reporting the most frequent kody of pripady assigned to S99-99.
+
+    Returns:
+        The parser with the added arguments.
+
+    """
+    parser = argparse.ArgumentParser(
+        prog="python -m osn_algoritmus",
+        description="Skript na priraďovanie hospitalizačných prípadov do medicínskych služieb.",
+    )
+
+    selected = {
+        "input_path": input_path,
+        "output_path": output_path,
+        "vsetky_vykony_hlavne": vsetky_vykony_hlavne,
+        "vyhodnot_neuplne_pripady": vyhodnot_neuplne_pripady,
+        "ponechaj_duplicity": ponechaj_duplicity,
+        "iba_hlavna_ms": iba_hlavna_ms,
+        "vyber_priloh": vyber_priloh,
+        "suhrn_validacie": suhrn_validacie,
+        "odmietnute_riadky": odmietnute_riadky,
+        "zretazene_spracovanie": zretazene_spracovanie,
+        "predvyber_priloh": predvyber_priloh,
+        "agregacia": agregacia,
+        "nezaradene_kody": nezaradene_kody,
+        "profiluj": profiluj,
+        "tienove_prilohy": tienove_prilohy,
+        "verzie_priloh": verzie_priloh,
+    }
+    for nazov, arguments in ARGUMENTS.items():
+        if selected[nazov]:
+            for names, kwargs in arguments:
+                parser.add_argument(*names, **kwargs)
     return parser
 
+
 def get_number_of_lines(file_path: Path) -> int:
     """Get the number of lines in a file."""
     with file_path.open("r") as f:
         return sum(1 for _ in f)
 
+
 def deduplicate_ms(medicinske_sluzby: list[str], urovne_ms: list[int | None]) -> tuple[list[str], list[int | None]]:
     """Deduplicate medicinske sluzby and corresponding urovne, keeping order."""
     unique_pairs = dict(zip(medicinske_sluzby, urovne_ms, strict=True))
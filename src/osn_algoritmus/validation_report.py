@@ -0,0 +1,117 @@
+"""Opt-in aggregated reporting of problems found during validation of hospitalizacne pripady.
+
+Without a ValidationReport, every problem is logged as a warning or an error. With it, problems are counted by
+category in memory, optionally written into a compact sidecar csv file and logged individually only at DEBUG level.
+"""
+
+import csv
+import logging
+from collections import Counter
+from pathlib import Path
+from types import TracebackType
+from typing import NamedTuple, Self
+
+from osn_algoritmus.utils import CSV_DELIMITER, log_error_or_warning
+
+SIDECAR_COLUMNS = ["id", "pole", "kod"]
+
+
+class Issue(NamedTuple):
+    """Problem found in a single field of a hospitalizacny pripad.
+
+    Attributes:
+        id: ID of hospitalizacny pripad, empty if the ID is missing.
+        pole: Name of the input column or of the output value, e.g. 'vek' or 'urovne_ms'.
+        kod: Short code of the problem, e.g. 'format' or 'rozsah'.
+
+    """
+
+    id: str
+    pole: str
+    kod: str
+
+
+class ValidationReport:
+    """Count problems by category (pole, kod) and optionally write every problem into a sidecar csv file.
+
+    Can be used as a context manager, which closes the sidecar file on exit.
+    """
+
+    def __init__(self, sidecar_path: Path | None = None) -> None:
+        """Create an empty report.
+
+        Args:
+            sidecar_path: If provided, every problem is written into this csv file with columns id, pole and kod.
+
+        """
+        self.counts: Counter[tuple[str, str]] = Counter()
+        self.sidecar_path = sidecar_path
+        self._sidecar_file = None
+        self._sidecar_writer = None
+        if sidecar_path is not None:
+            self._sidecar_file = sidecar_path.open("w", encoding="utf-8", newline="")
+            self._sidecar_writer = csv.writer(self._sidecar_file, delimiter=CSV_DELIMITER)
+            self._sidecar_writer.writerow(SIDECAR_COLUMNS)
+
+    def add(self, issue: Issue) -> None:
+        """Count the problem and write it into the sidecar file."""
+        self.counts[issue.pole, issue.kod] += 1
+        if self._sidecar_writer is not None:
+            self._sidecar_writer.writerow(issue)
+
+    @property
+    def total(self) -> int:
+        """Total number of reported problems."""
+        return self.counts.total()
+
+    def summary(self) -> str:
+        """Return the counts of problems formatted as a table, the most frequent categories first."""
+        lines = [f"{'pole':<20}{'kod':<30}{'pocet':>12}"]
+        lines.extend(f"{pole:<20}{kod:<30}{pocet:>12}" for (pole, kod), pocet in self.counts.most_common())
+        lines.append(f"{'spolu':<50}{self.total:>12}")
+        return "\n".join(lines)
+
+    def close(self) -> None:
+        """Close the sidecar file."""
+        if self._sidecar_file is not None:
+            self._sidecar_file.close()
+            self._sidecar_file = None
+            self._sidecar_writer = None
+
+    def __enter__(self) -> Self:
+        """Return the report itself."""
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_value: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        """Close the sidecar file."""
+        self.close()
+
+
+def report_issue(
+    logger: logging.Logger,
+    message: str,
+    issue: Issue,
+    *,
+    error: bool,
+    report: ValidationReport | None,
+) -> None:
+    """Log the problem as an error or a warning, or add it to the report and log it only at DEBUG level.
+
+    Args:
+        logger: Logger of the module that found the problem.
+        message: Human readable description of the problem.
+        issue: Category and ID of hospitalizacny pripad of the problem.
+        error: Whether the problem is logged as an error or as a warning without a report.
+        report: If provided, the problem is added to it.
+
+    """
+    if report is None:
+        log_error_or_warning(logger, message, error=error)
+        return
+    logger.debug(message)
+    report.add(issue)
@@ -0,0 +1,305 @@
+"""Benchmark suite of the algoritmus with comparison against a stored baseline.
+
+Measures end-to-end throughput of `process_csv`, latency percentiles of `process_hp_dict`, time of loading prilohy
+and peak memory on generated datasets of fixed sizes for every combination of flags.
+
+Run with:
+    python benchmark.py spusti vysledky.json [--velkosti 10000 100000 1000000] [--prepinace zakladne v vnd]
+    python benchmark.py porovnaj baseline.json vysledky.json [--tolerancia 0.1]
+"""
+
+import argparse
+import dataclasses
+import itertools
+import json
+import logging
+import multiprocessing
+import platform
+import statistics
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import UTC, datetime
+from pathlib import Path
+
+from osn_algoritmus.core import process_csv, process_hp_dict
+from osn_algoritmus.generator import generate_pripady, write_pripady_csv
+from osn_algoritmus.prilohy_preparation import load_rule_set
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000]
+FLAGS = {"-v": "all_vykony_hlavne", "-n": "evaluate_incomplete_pripady", "-d": "allow_duplicates"}
+ALL_FLAG_COMBINATIONS = [
+    " ".join(combination) for n in range(len(FLAGS) + 1) for combination in itertools.combinations(FLAGS, n)
+]
+NO_FLAGS = "zakladne"
+PERCENTILES = [50, 90, 99]
+
+# Metrics compared by `porovnaj` and whether a higher value is better.
+METRICS = {
+    "riadky_za_s": True,
+    "latencia_p50_us": False,
+    "latencia_p90_us": False,
+    "latencia_p99_us": False,
+    "max_pamat_mb": False,
+}
+
+
+@dataclasses.dataclass
+class RunResult:
+    """Result of a single benchmark run.
+
+    Attributes:
+        velkost: Number of pripady in the dataset.
+        prepinace: Command line flags of the run, e.g. "-v -d".
+        cas_s: Wall-clock time of process_csv in seconds.
+        riadky_za_s: Throughput of process_csv in rows per second.
+        latencia_p50_us: Median latency of process_hp_dict in microseconds.
+        latencia_p90_us: 90th percentile of latency of process_hp_dict in microseconds.
+        latencia_p99_us: 99th percentile of latency of process_hp_dict in microseconds.
+        max_pamat_mb: Peak resident memory of the process in MB, None if it cannot be measured on the platform.
+
+    """
+
+    velkost: int
+    prepinace: str
+    cas_s: float
+    riadky_za_s: float
+    latencia_p50_us: float
+    latencia_p90_us: float
+    latencia_p99_us: float
+    max_pamat_mb: float | None
+
+    @property
+    def key(self) -> str:
+        """Identifier of the run used to match runs from different result files."""
+        return f"{self.velkost}:{self.prepinace}"
+
+
+def flags_to_kwargs(prepinace: str) -> dict[str, bool]:
+    """Translate command line flags of the algoritmus into keyword arguments of process_csv."""
+    unknown = set(prepinace.split()) - set(FLAGS)
+    if unknown:
+        msg = f"Neznáme prepínače: {sorted(unknown)}. Povolené: {list(FLAGS)}."
+        raise ValueError(msg)
+    return {argument: flag in prepinace.split() for flag, argument in FLAGS.items()}
+
+
+def parse_flags(value: str) -> str:
+    """Parse a combination of flags written without dashes, e.g. 'vd' -> '-v -d'. 'zakladne' means no flags."""
+    if value == NO_FLAGS:
+        return ""
+    prepinace = " ".join(f"-{letter}" for letter in value)
+    try:
+        flags_to_kwargs(prepinace)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e)) from None
+    return prepinace
+
+
+def peak_memory_mb() -> float | None:
+    """Return peak resident memory of the current process in MB."""
+    if resource is None:
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return max_rss / 2**20 if sys.platform == "darwin" else max_rss / 2**10
+
+
+def prepare_dataset(data_folder: Path, velkost: int, seed: int) -> Path:
+    """Generate the dataset of the given size, unless it already exists."""
+    path = data_folder / f"synteticke_{velkost}_seed{seed}.csv"
+    if not path.exists():
+        logger.info(f"Generovanie datasetu {path}")
+        data_folder.mkdir(parents=True, exist_ok=True)
+        write_pripady_csv(path, velkost, seed=seed)
+    return path
+
+
+def measure_load_tables(repeat: int) -> float:
+    """Return the minimal time of loading prilohy in seconds."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        load_rule_set()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def measure_latency(prepinace: str, sample_size: int, seed: int) -> dict[int, float]:
+    """Return percentiles of latency of process_hp_dict in microseconds."""
+    kwargs = flags_to_kwargs(prepinace)
+    latencies = []
+    for hp_dict in generate_pripady(sample_size, seed=seed):
+        start = time.perf_counter()
+        process_hp_dict(hp_dict, **kwargs)
+        latencies.append((time.perf_counter() - start) * 1e6)
+    quantiles = statistics.quantiles(latencies, n=100, method="inclusive")
+    return {p: quantiles[p - 1] for p in PERCENTILES}
+
+
+def run_single(input_path: Path, velkost: int, prepinace: str, latency_sample: int, seed: int) -> RunResult:
+    """Run one benchmark. Executed in a fresh process, so that peak memory belongs to this run only."""
+    logging.getLogger("osn_algoritmus").setLevel(logging.ERROR)  # warnings about individual pripady
+    kwargs = flags_to_kwargs(prepinace)
+
+    output_path = input_path.with_stem(f"{input_path.stem}_output")
+    start = time.perf_counter()
+    process_csv(input_path, output_path, **kwargs)
+    elapsed = time.perf_counter() - start
+    output_path.unlink()
+
+    latency = measure_latency(prepinace, min(latency_sample, velkost), seed)
+    return RunResult(
+        velkost=velkost,
+        prepinace=prepinace,
+        cas_s=elapsed,
+        riadky_za_s=velkost / elapsed,
+        latencia_p50_us=latency[50],
+        latencia_p90_us=latency[90],
+        latencia_p99_us=latency[99],
+        max_pamat_mb=peak_memory_mb(),
+    )
+
+
+def run_benchmarks(args: argparse.Namespace) -> None:
+    """Run all benchmarks and write the results into a JSON file."""
+    results = {
+        "meta": {
+            "datum": datetime.now(tz=UTC).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platforma": platform.platform(),
+            "seed": args.seed,
+        },
+        "nacitanie_priloh_s": measure_load_tables(args.opakovania),
+        "behy": [],
+    }
+    logger.info(f"Načítanie príloh: {results['nacitanie_priloh_s']:.3f} s")
+
+    context = multiprocessing.get_context("spawn")
+    for velkost in args.velkosti:
+        input_path = prepare_dataset(args.data, velkost, args.seed)
+        for prepinace in args.prepinace:
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                future = executor.submit(run_single, input_path, velkost, prepinace, args.vzorka_latencie, args.seed)
+                result = future.result()
+            logger.info(
+                f"{result.key:<20} {result.riadky_za_s:>10.0f} riadkov/s, p50 {result.latencia_p50_us:.0f} us,"
+                f" p99 {result.latencia_p99_us:.0f} us, pamäť {result.max_pamat_mb or float('nan'):.0f} MB",
+            )
+            results["behy"].append(dataclasses.asdict(result))
+
+    with args.vystup.open("w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2, ensure_ascii=False)
+    logger.info(f"Výsledky sú v {args.vystup}")
+
+
+def relative_change(baseline: float, current: float, *, higher_is_better: bool) -> float:
+    """Return relative worsening of the metric, positive values mean a regression."""
+    if baseline == 0:
+        return 0.0
+    change = (current - baseline) / baseline
+    return -change if higher_is_better else change
+
+
+def compare_results(baseline: dict, current: dict, tolerance: float) -> list[str]:
+    """Compare two result files.
+
+    Args:
+        baseline: Stored baseline results.
+        current: Newly measured results.
+        tolerance: Allowed relative worsening of a metric, e.g. 0.1 for 10 %.
+
+    Returns:
+        Descriptions of the found regressions and of the baseline runs missing in the current results.
+
+    """
+    regressions = []
+
+    pairs = [("nacitanie_priloh_s", baseline["nacitanie_priloh_s"], current["nacitanie_priloh_s"], False)]
+    baseline_runs = {f"{run['velkost']}:{run['prepinace']}": run for run in baseline["behy"]}
+    current_runs = {f"{run['velkost']}:{run['prepinace']}": run for run in current["behy"]}
+    for key in baseline_runs:
+        if key in current_runs:
+            continue
+        logger.info(f"{key:<40} chýba vo výsledkoch REGRESIA")
+        regressions.append(f"{key}: beh chýba vo výsledkoch")
+    for key, run in current_runs.items():
+        if key not in baseline_runs:
+            logger.warning(f"Beh {key} nie je v baseline, preskakujem.")
+            continue
+        pairs.extend(
+            (f"{key} {metric}", baseline_runs[key][metric], run[metric], higher_is_better)
+            for metric, higher_is_better in METRICS.items()
+            if baseline_runs[key][metric] is not None and run[metric] is not None
+        )
+
+    for nazov, baseline_value, current_value, higher_is_better in pairs:
+        change = relative_change(baseline_value, current_value, higher_is_better=higher_is_better)
+        status = "REGRESIA" if change > tolerance else "ok"
+        logger.info(f"{nazov:<40} {baseline_value:>14.2f} {current_value:>14.2f} {-change:>+9.1%} {status}")
+        if change > tolerance:
+            regressions.append(f"{nazov}: {baseline_value:.2f} -> {current_value:.2f}")
+    return regressions
+
+
+def compare_files(args: argparse.Namespace) -> None:
+    """Compare result files and exit with a non-zero code if there is a regression."""
+    with args.baseline.open(encoding="utf-8") as f:
+        baseline = json.load(f)
+    with args.vysledky.open(encoding="utf-8") as f:
+        current = json.load(f)
+
+    regressions = compare_results(baseline, current, args.tolerancia)
+    if regressions:
+        zoznam = "\n".join(regressions)
+        logger.error(f"Nájdené regresie ({len(regressions)}):\n{zoznam}")
+        sys.exit(1)
+    logger.info("Bez regresií.")
+
+
+def main(argv: list[str] | None = None) -> None:
+    """Run the benchmark suite from the command line."""
+    parser = argparse.ArgumentParser(description="Meranie výkonu algoritmu a porovnanie s baseline.")
+    subparsers = parser.add_subparsers(required=True)
+
+    run_parser = subparsers.add_parser("spusti", help="Spustí merania a výsledky zapíše do JSON súboru.")
+    run_parser.add_argument("vystup", type=Path, help="Cesta k výstupnému JSON súboru.")
+    run_parser.add_argument("--velkosti", type=int, nargs="+", default=DEFAULT_SIZES, help="Veľkosti datasetov.")
+    run_parser.add_argument(
+        "--prepinace",
+        type=parse_flags,
+        nargs="+",
+        default=ALL_FLAG_COMBINATIONS,
+        help=f"Kombinácie prepínačov algoritmu bez pomlčiek, napr. '{NO_FLAGS} v vnd'. Predvolene všetky kombinácie.",
+    )
+    run_parser.add_argument("--data", type=Path, default=Path("benchmark_data"), help="Priečinok na datasety.")
+    run_parser.add_argument("--seed", type=int, default=0, help="Seed generátora datasetov.")
+    run_parser.add_argument("--vzorka_latencie", type=int, default=10_000, help="Počet prípadov na meranie latencie.")
+    run_parser.add_argument("--opakovania", type=int, default=3, help="Počet opakovaní načítania príloh.")
+    run_parser.set_defaults(func=run_benchmarks)
+
+    compare_parser = subparsers.add_parser("porovnaj", help="Porovná výsledky s baseline.")
+    compare_parser.add_argument("baseline", type=Path, help="Uložené výsledky baseline.")
+    compare_parser.add_argument("vysledky", type=Path, help="Nové výsledky.")
+    compare_parser.add_argument(
+        "--tolerancia",
+        type=float,
+        default=0.1,
+        help="Povolené relatívne zhoršenie metriky (predvolene 0.1, t.j. 10 %%).",
+    )
+    compare_parser.set_defaults(func=compare_files)
+
+    args = parser.parse_args(argv)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
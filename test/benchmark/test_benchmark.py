@@ -0,0 +1,85 @@
+"""Tests for the comparison of benchmark results with a baseline."""
+
+import pytest
+from benchmark import compare_results, relative_change
+
+
+def results(nacitanie_priloh_s: float, *behy: dict) -> dict:
+    """Build results in the format written by `spusti`."""
+    return {"nacitanie_priloh_s": nacitanie_priloh_s, "behy": list(behy)}
+
+
+def run(velkost: int, prepinace: str, **metrics: float | None) -> dict:
+    """Build a single run, metrics not given are missing in the run."""
+    return {
+        "velkost": velkost,
+        "prepinace": prepinace,
+        "riadky_za_s": None,
+        "latencia_p50_us": None,
+        "latencia_p90_us": None,
+        "latencia_p99_us": None,
+        "max_pamat_mb": None,
+    } | metrics
+
+
+@pytest.mark.parametrize(
+    ("baseline", "current", "higher_is_better", "expected"),
+    [
+        (100, 120, False, 0.2),
+        (100, 80, False, -0.2),
+        (100, 80, True, 0.2),
+        (100, 120, True, -0.2),
+        (0, 5, False, 0.0),
+    ],
+)
+def test_relative_change(baseline: float, current: float, *, higher_is_better: bool, expected: float) -> None:
+    """Positive change is a worsening of the metric in both directions, zero baseline is not compared."""
+    assert relative_change(baseline, current, higher_is_better=higher_is_better) == pytest.approx(expected)
+
+
+def test_regression_above_tolerance() -> None:
+    """Worsening above the tolerance is reported for metrics where lower and where higher is better."""
+    baseline = results(1.0, run(10, "zakladne", riadky_za_s=1000, latencia_p99_us=100))
+    current = results(1.0, run(10, "zakladne", riadky_za_s=800, latencia_p99_us=150))
+
+    assert compare_results(baseline, current, 0.1) == [
+        "10:zakladne riadky_za_s: 1000.00 -> 800.00",
+        "10:zakladne latencia_p99_us: 100.00 -> 150.00",
+    ]
+
+
+def test_change_within_tolerance() -> None:
+    """Worsening within the tolerance and any improvement are not regressions."""
+    baseline = results(1.0, run(10, "-v", riadky_za_s=1000, latencia_p50_us=100, max_pamat_mb=50))
+    current = results(1.05, run(10, "-v", riadky_za_s=950, latencia_p50_us=60, max_pamat_mb=54))
+
+    assert compare_results(baseline, current, 0.1) == []
+
+
+def test_loading_of_prilohy_is_compared() -> None:
+    """Slower loading of prilohy is a regression."""
+    assert compare_results(results(1.0), results(1.5), 0.1) == ["nacitanie_priloh_s: 1.00 -> 1.50"]
+
+
+def test_zero_baseline_is_not_a_regression() -> None:
+    """Metric with a zero baseline has no relative change and is not reported."""
+    baseline = results(0.0, run(10, "zakladne", max_pamat_mb=0))
+    current = results(1.0, run(10, "zakladne", max_pamat_mb=100))
+
+    assert compare_results(baseline, current, 0.1) == []
+
+
+def test_missing_metrics_are_skipped() -> None:
+    """Metrics not measured in one of the runs, e.g. memory on Windows, are not compared."""
+    baseline = results(1.0, run(10, "zakladne", max_pamat_mb=50))
+    current = results(1.0, run(10, "zakladne"))
+
+    assert compare_results(baseline, current, 0.1) == []
+
+
+def test_missing_run_is_reported() -> None:
+    """Run of the baseline missing in the current results is reported, a new run is skipped."""
+    baseline = results(1.0, run(10, "zakladne", riadky_za_s=1000), run(10, "-v", riadky_za_s=1000))
+    current = results(1.0, run(10, "zakladne", riadky_za_s=1000), run(100, "zakladne", riadky_za_s=1))
+
+    assert compare_results(baseline, current, 0.1) == ["10:-v: beh chýba vo výsledkoch"]
@@ -0,0 +1,22 @@
+"""Shared fixtures of the tests."""
+
+import shutil
+from pathlib import Path
+
+import pytest
+
+from osn_algoritmus.prilohy_preparation import TABLES_FOLDER
+
+
+@pytest.fixture(scope="session")
+def modified_tables_folder(tmp_path_factory: pytest.TempPathFactory) -> Path:
+    """Copy of prilohy, where priloha 12 assigns a different medicinska sluzba to vykon 8p107."""
+    folder = tmp_path_factory.mktemp("prilohy")
+    for item in TABLES_FOLDER.iterdir():
+        if item.name.endswith(".csv"):
+            with item.open("rb") as src, (folder / item.name).open("wb") as dst:
+                shutil.copyfileobj(src, dst)
+
+    p12 = folder / "p12_V_deti.csv"
+    p12.write_text(p12.read_text(encoding="utf-8").replace(";S50-05;", ";S50-10;"), encoding="utf-8")
+    return folder
@@ -0,0 +1,129 @@
+"""Tests for the asyncio API."""
+
+import asyncio
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import pytest
+
+from osn_algoritmus.async_api import AsyncEngine
+from osn_algoritmus.core import Engine, process_hp_dict
+from osn_algoritmus.validation_report import ValidationReport
+
+HP_DICTS = [
+    {
+        "id": "A",
+        "vek": "0",
+        "hmotnost": "999",
+        "umela_plucna_ventilacia": "0",
+        "diagnozy": "",
+        "vykony": "8p107",
+        "markery": "",
+        "drg": "P",
+        "druh_prijatia": "3",
+    },
+    {
+        "id": "B",
+        "vek": "41",
+        "hmotnost": "",
+        "umela_plucna_ventilacia": "0",
+        "diagnozy": "M511@G551@K900",
+        "vykony": "5t61d@920012",
+        "markery": "mOSN&nopol",
+        "drg": "I10F",
+        "druh_prijatia": "3",
+    },
+    {
+        "id": "C",
+        "vek": "",
+        "hmotnost": "",
+        "umela_plucna_ventilacia": "0",
+        "diagnozy": "",
+        "vykony": "",
+        "markery": "",
+        "drg": "",
+        "druh_prijatia": "",
+    },
+]
+
+
+class RecordingExecutor(ThreadPoolExecutor):
+    """Thread pool remembering sizes of submitted batches."""
+
+    def __init__(self) -> None:
+        """Create a pool with two threads."""
+        super().__init__(max_workers=2)
+        self.batch_sizes: list[int] = []
+
+    def submit(self, fn, /, *args, **kwargs) -> Future:  # noqa: ANN001, ANN002, ANN003, D102
+        self.batch_sizes.append(len(args[0]))
+        return super().submit(fn, *args, **kwargs)
+
+
+def test_evaluate_matches_process_hp_dict() -> None:
+    """Results of the async API are the same as of the synchronous one."""
+
+    async def run() -> list[tuple[str, str] | None]:
+        async with AsyncEngine(executor=ThreadPoolExecutor(max_workers=2)) as engine:
+            return await asyncio.gather(*(engine.evaluate(dict(hp_dict)) for hp_dict in HP_DICTS * 10))
+
+    results = asyncio.run(run())
+
+    assert results == [process_hp_dict(dict(hp_dict)) for hp_dict in HP_DICTS * 10]
+
+
+@pytest.mark.parametrize("engine", [Engine(), Engine(all_vykony_hlavne=True, prilohy=["12_13", "16"])])
+def test_process_pool_matches_engine(engine: Engine) -> None:
+    """Workers of the default process pool evaluate pripady the same as the engine pickled into them."""
+
+    async def run() -> list[tuple[str, str] | None]:
+        async with AsyncEngine(engine, max_workers=1, max_batch_size=4) as async_engine:
+            return await asyncio.gather(*(async_engine.evaluate(dict(hp_dict)) for hp_dict in HP_DICTS * 5))
+
+    results = asyncio.run(run())
+
+    assert results == [engine.evaluate(dict(hp_dict)) for hp_dict in HP_DICTS * 5]
+
+
+def test_requests_are_coalesced_into_batches() -> None:
+    """Concurrent requests are evaluated in batches not larger than max_batch_size."""
+    executor = RecordingExecutor()
+
+    async def run() -> None:
+        async with AsyncEngine(executor=executor, max_batch_size=8, max_wait=0.05, max_queue_size=4) as engine:
+            await asyncio.gather(*(engine.evaluate(dict(HP_DICTS[i % 3])) for i in range(30)))
+
+    asyncio.run(run())
+
+    assert sum(executor.batch_sizes) == 30
+    assert max(executor.batch_sizes) <= 8
+    assert len(executor.batch_sizes) < 30
+
+
+def test_evaluate_requires_running_engine() -> None:
+    """Calling evaluate before start raises an error."""
+    engine = AsyncEngine(executor=ThreadPoolExecutor(max_workers=1))
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(engine.evaluate(dict(HP_DICTS[0])))
+
+
+def test_evaluate_after_close_raises() -> None:
+    """Calling evaluate on a closed engine raises an error instead of waiting forever."""
+
+    async def run() -> None:
+        engine = AsyncEngine(executor=ThreadPoolExecutor(max_workers=1))
+        async with engine:
+            assert await engine.evaluate(dict(HP_DICTS[0])) == process_hp_dict(dict(HP_DICTS[0]))
+        with pytest.raises(RuntimeError):
+            await engine.evaluate(dict(HP_DICTS[0]))
+
+    asyncio.run(run())
+
+
+def test_process_pool_rejects_engine_with_report() -> None:
+    """State collected by the engine would stay in the workers of the process pool, so such an engine is rejected."""
+    engine = Engine(report=ValidationReport())
+
+    with pytest.raises(ValueError, match="thread pool"):
+        AsyncEngine(engine)
+    assert AsyncEngine(engine, executor=ThreadPoolExecutor(max_workers=1)).engine is engine
@@ -0,0 +1,94 @@
+"""Tests of the binary store of validated pripady."""
+
+import csv
+from pathlib import Path
+
+import pytest
+
+from osn_algoritmus.case_store import CaseStore, compile_cases, is_case_store
+from osn_algoritmus.core import Engine, process_csv
+from osn_algoritmus.generator import generate_pripady
+from osn_algoritmus.utils import CSV_DELIMITER, DATUM_PRIJATIA_COLUMN, INPUT_COLUMNS
+from osn_algoritmus.validation_report import ValidationReport
+
+
+@pytest.fixture
+def input_path(tmp_path: Path) -> Path:
+    """Csv file with generated pripady including invalid ones, a pripad without id and the column datum_prijatia."""
+    pripady = [*generate_pripady(200, seed=13), dict.fromkeys(INPUT_COLUMNS, "")]
+    path = tmp_path / "vstup.csv"
+    with path.open("w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=[*INPUT_COLUMNS, DATUM_PRIJATIA_COLUMN], delimiter=CSV_DELIMITER)
+        writer.writeheader()
+        for i, pripad in enumerate(pripady):
+            writer.writerow({**pripad, DATUM_PRIJATIA_COLUMN: "" if i % 3 else "2025-08-01"})
+    return path
+
+
+@pytest.mark.parametrize(
+    "flags",
+    [
+        {},
+        {"all_vykony_hlavne": True, "allow_duplicates": True},
+        {"evaluate_incomplete_pripady": True},
+        {"evaluate_incomplete_pripady": True, "only_hlavna_ms": True, "prilohy": ["5", "12_13"]},
+    ],
+)
+def test_process_compiled_store_matches_csv(tmp_path: Path, input_path: Path, flags: dict) -> None:
+    """Processing the compiled store gives the same output file as processing the csv file, for all flags."""
+    store_path = tmp_path / "vstup.osn"
+    assert compile_cases(input_path, store_path) == 201
+    assert is_case_store(store_path)
+    assert not is_case_store(input_path)
+
+    process_csv(input_path, tmp_path / "z_csv.csv", **flags)
+    process_csv(store_path, **flags)
+    expected = (tmp_path / "z_csv.csv").read_text(encoding="utf-8")
+    assert (tmp_path / "vstup_output.csv").read_text(encoding="utf-8") == expected
+
+
+def test_stored_rows_are_not_validated_again(tmp_path: Path, input_path: Path) -> None:
+    """Problems are reported when compiling. The engine evaluates stored rows without validating them."""
+    report = ValidationReport()
+    compile_cases(input_path, tmp_path / "vstup.osn", report=report)
+    assert report.counts
+
+    engine_report = ValidationReport()
+    engine = Engine(evaluate_incomplete_pripady=True, report=engine_report)
+    with CaseStore(tmp_path / "vstup.osn") as store:
+        rows = list(store.rows())
+        assert store.columns == [*INPUT_COLUMNS, DATUM_PRIJATIA_COLUMN]
+        assert rows[5] == store.row(5)
+        assert engine.evaluate_batch(rows[:200]) == Engine(evaluate_incomplete_pripady=True).evaluate_batch(
+            [dict(row) for row in rows[:200]],
+        )
+    assert {pole for pole, _ in engine_report.counts} <= {"urovne_ms"}
+    assert Engine().parse(rows[-1]) is None
+    assert engine.parse(rows[-1]) is not None
+
+
+def test_case_store_rejects_other_files(input_path: Path) -> None:
+    """Opening a csv file as a store fails with a readable message."""
+    with pytest.raises(ValueError, match="nie je skompilovaný"):
+        CaseStore(input_path)
+
+
+def test_store_is_closed_when_processing_fails(
+    tmp_path: Path,
+    input_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """The store is closed also when the arguments of the run are rejected, and rejected lines need a csv file."""
+    store_path = tmp_path / "vstup.osn"
+    compile_cases(input_path, store_path)
+    closed = []
+    close = CaseStore.close
+    monkeypatch.setattr(CaseStore, "close", lambda store: closed.append(store) or close(store))
+
+    with pytest.raises(ValueError, match="neexistuje"):
+        process_csv(store_path, aggregate_by="neexistuje")
+    assert len(closed) == 1
+
+    with pytest.raises(ValueError, match="pri kompilácii"):
+        process_csv(store_path, reject_path=tmp_path / "odmietnute.txt")
+    assert not (tmp_path / "odmietnute.txt").exists()
@@ -0,0 +1,57 @@
+"""Equivalence of the columnar evaluation with NumPy with the evaluation row by row."""
+
+import pytest
+
+from osn_algoritmus import columnar
+from osn_algoritmus.core import Engine
+from osn_algoritmus.generator import GeneratorConfig, generate_pripady
+from osn_algoritmus.validation_report import ValidationReport
+
+pytest.importorskip("numpy")
+
+
+@pytest.fixture(scope="module")
+def pripady() -> list[dict]:
+    """Return generated pripady hitting the lookup-style prilohy often, including invalid ones."""
+    config = GeneratorConfig(prilohy_shares=dict.fromkeys(["17", "7a_8a", "9a", "12_13", "14_15"], 0.4))
+    return list(generate_pripady(300, config, seed=17))
+
+
+@pytest.mark.parametrize(
+    "flags",
+    [
+        {},
+        {"all_vykony_hlavne": True},
+        {"all_vykony_hlavne": True, "allow_duplicates": True},
+        {"evaluate_incomplete_pripady": True, "allow_duplicates": True},
+        {"all_vykony_hlavne": True, "only_hlavna_ms": True},
+        {"prilohy": ["9a", "6", "17"]},
+    ],
+)
+def test_columnar_evaluation_matches_engine(pripady: list[dict], flags: dict) -> None:
+    """ColumnarEvaluator returns the same results as Engine.evaluate, regardless of the batch size."""
+    engine = Engine(**flags)
+    expected = engine.evaluate_batch(pripady)
+    evaluator = columnar.ColumnarEvaluator(engine)
+    assert evaluator.evaluate_batch(pripady) == expected
+    assert list(evaluator.evaluate_many(pripady, batch_size=37)) == expected
+    assert evaluator.evaluate_batch([]) == []
+
+
+def test_create_batch_evaluator_falls_back_without_numpy(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Without NumPy, the engine itself evaluates the batches."""
+    engine = Engine()
+    assert isinstance(columnar.create_batch_evaluator(engine), columnar.ColumnarEvaluator)
+    monkeypatch.setattr(columnar, "np", None)
+    assert columnar.create_batch_evaluator(engine) is engine
+    with pytest.raises(ImportError, match="numpy"):
+        columnar.ColumnarEvaluator(engine)
+
+
+def test_columnar_evaluation_reports_missing_urovne(pripady: list[dict]) -> None:
+    """Medicinske sluzby without uroven looked up for the whole batch are reported the same as row by row."""
+    expected_report, report = ValidationReport(), ValidationReport()
+    Engine(all_vykony_hlavne=True, report=expected_report).evaluate_batch(pripady)
+    columnar.ColumnarEvaluator(Engine(all_vykony_hlavne=True, report=report)).evaluate_batch(pripady)
+    assert report.counts == expected_report.counts
+    assert any(pole == "urovne_ms" for pole, _ in report.counts)
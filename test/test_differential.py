@@ -0,0 +1,62 @@
+"""Tests for the differential evaluation against several versions of prilohy."""
+
+import csv
+from pathlib import Path
+
+from osn_algoritmus.core import Engine
+from osn_algoritmus.differential import compare_versions_csv, main
+from osn_algoritmus.utils import CSV_DELIMITER, INPUT_COLUMNS
+
+HP_P12 = {
+    "id": "P12",
+    "vek": "0",
+    "hmotnost": "999",
+    "umela_plucna_ventilacia": "0",
+    "diagnozy": "",
+    "vykony": "8p107",
+    "markery": "",
+    "drg": "P",
+    "druh_prijatia": "3",
+}
+HP_BEZ_ZMENY = {**HP_P12, "id": "BEZ_ZMENY", "vek": "40", "vykony": "", "drg": "", "druh_prijatia": ""}
+HP_INVALID = {**HP_P12, "id": "INVALID", "vek": ""}
+
+
+def write_input(path: Path, hp_dicts: list[dict]) -> None:
+    """Write hospitalizacne pripady into an input csv file."""
+    with path.open("w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=INPUT_COLUMNS, delimiter=CSV_DELIMITER)
+        writer.writeheader()
+        writer.writerows(hp_dicts)
+
+
+def read_output(path: Path) -> list[dict]:
+    """Read rows of the differential output."""
+    with path.open(encoding="utf-8") as f:
+        return list(csv.DictReader(f, delimiter=CSV_DELIMITER))
+
+
+def test_only_differing_pripady_are_written(tmp_path: Path, modified_tables_folder: Path) -> None:
+    """Pripady with the same result in both versions are not in the output."""
+    input_path = tmp_path / "vstup.csv"
+    write_input(input_path, [HP_BEZ_ZMENY, HP_P12, HP_INVALID])
+    engines = {"povodna": Engine(), "upravena": Engine.from_folder(modified_tables_folder)}
+
+    assert compare_versions_csv(input_path, tmp_path / "rozdiely.csv", engines) == 1
+
+    [row] = read_output(tmp_path / "rozdiely.csv")
+    assert row["id"] == "P12"
+    assert (row["ms_povodna"], row["urovne_ms_povodna"]) == ("S49-05@S50-05", "4@4")
+    assert (row["ms_upravena"], row["urovne_ms_upravena"]) == ("S49-05@S50-10", "4@4")
+
+
+def test_main_compares_with_packaged_prilohy(tmp_path: Path, modified_tables_folder: Path) -> None:
+    """With a single version given, the command line compares it with prilohy distributed with the package."""
+    input_path = tmp_path / "vstup.csv"
+    write_input(input_path, [HP_P12, HP_BEZ_ZMENY])
+
+    main([str(input_path), "--verzia", f"upravena={modified_tables_folder}"])
+
+    [row] = read_output(tmp_path / "vstup_rozdiely.csv")
+    assert row["ms_aktualna"] == "S49-05@S50-05"
+    assert row["ms_upravena"] == "S49-05@S50-10"
@@ -0,0 +1,435 @@
+"""Tests for the library API of the algoritmus."""
+
+import csv
+import gc
+import json
+import logging
+import subprocess
+import sys
+from collections import Counter
+from collections.abc import Generator
+from datetime import date
+from pathlib import Path
+
+import pytest
+
+from osn_algoritmus.core import Engine, _cached_engine, process_csv, process_hp_dict
+from osn_algoritmus.generator import generate_pripady
+from osn_algoritmus.instrumentation import Instrumentation
+from osn_algoritmus.models import VEK_CATEGORIES, HospitalizacnyPripad
+from osn_algoritmus.prilohy_evaluation import PRILOHY, resolve_prilohy
+from osn_algoritmus.prilohy_preparation import (
+    SKUPINY_KODOV,
+    TABLES_FOLDER,
+    RuleSetRegistry,
+    load_default_rule_set,
+    load_rule_set,
+    tables_for_prilohy,
+)
+from osn_algoritmus.utils import CSV_DELIMITER, INPUT_COLUMNS
+from osn_algoritmus.validation_report import ValidationReport
+
+HP_P12 = {
+    "id": "X",
+    "vek": "0",
+    "hmotnost": "999",
+    "umela_plucna_ventilacia": "0",
+    "diagnozy": "",
+    "vykony": "8p107",
+    "markery": "",
+    "drg": "P",
+    "druh_prijatia": "3",
+}
+HP_VSETKY_VYKONY = {
+    **HP_P12,
+    "vek": "40",
+    "vykony": "@163006@163006",
+    "markery": "",
+    "drg": "",
+    "druh_prijatia": "",
+}
+HP_INVALID = {**HP_P12, "vek": ""}
+
+
+def test_evaluate_matches_process_hp_dict() -> None:
+    """Engine gives the same results as process_hp_dict."""
+    engine = Engine()
+
+    for hp_dict in [HP_P12, HP_VSETKY_VYKONY, HP_INVALID]:
+        assert engine.evaluate(dict(hp_dict)) == process_hp_dict(dict(hp_dict))
+
+
+def test_process_hp_dict_reuses_engines() -> None:
+    """process_hp_dict creates an engine only once for every combination of flags."""
+    process_hp_dict(dict(HP_P12), all_vykony_hlavne=True, prilohy=["12_13"])
+    misses = _cached_engine.cache_info().misses
+    assert process_hp_dict(dict(HP_P12), all_vykony_hlavne=True, prilohy=["12_13"]) == ("S50-05", "4")
+    assert _cached_engine.cache_info().misses == misses
+
+
+def test_evaluate_many_is_lazy() -> None:
+    """evaluate_many returns a generator consuming the input only on demand."""
+    consumed = []
+
+    def source() -> Generator[dict, None, None]:
+        for hp_dict in [HP_P12, HP_INVALID]:
+            consumed.append(hp_dict["id"])
+            yield dict(hp_dict)
+
+    results = Engine().evaluate_many(source())
+
+    assert consumed == []
+    assert next(results) == ("S49-05@S50-05", "4@4")
+    assert len(consumed) == 1
+    assert next(results) is None
+
+
+def test_engines_with_different_flags_coexist() -> None:
+    """Engines keep their own configuration of flags."""
+    default_engine = Engine()
+    all_vykony_engine = Engine(all_vykony_hlavne=True, allow_duplicates=True)
+
+    assert default_engine.evaluate(dict(HP_VSETKY_VYKONY)) == ("S99-99", "1")
+    assert all_vykony_engine.evaluate(dict(HP_VSETKY_VYKONY)) == ("S17-07@S17-07", "5@5")
+    assert default_engine.evaluate(dict(HP_VSETKY_VYKONY)) == ("S99-99", "1")
+
+
+def test_engines_with_different_rule_sets_coexist(modified_tables_folder: Path) -> None:
+    """Engine with prilohy loaded from another folder does not affect the default one."""
+    modified_engine = Engine.from_folder(modified_tables_folder)
+    default_engine = Engine()
+
+    assert modified_engine.evaluate(dict(HP_P12)) == ("S49-05@S50-10", "4@4")
+    assert default_engine.evaluate(dict(HP_P12)) == ("S49-05@S50-05", "4@4")
+
+
+def test_instrumentation_collects_prilohy_and_stages() -> None:
+    """Instrumentation records calls, rows scanned and produced sluzby of every priloha."""
+    instrumentation = Instrumentation()
+    engine = Engine(instrumentation=instrumentation)
+
+    assert engine.evaluate(dict(HP_P12)) == Engine().evaluate(dict(HP_P12))
+
+    assert list(instrumentation.prilohy) == list(PRILOHY)
+    assert all(stats.calls == 1 for stats in instrumentation.prilohy.values())
+    assert instrumentation.prilohy["5"].sluzby == 1
+    assert instrumentation.prilohy["12_13"].sluzby == 1
+    assert instrumentation.prilohy["12_13"].rows_scanned > 0
+    assert set(instrumentation.stages) == {"validacia", "prilohy", "urovne"}
+    assert json.loads(json.dumps(instrumentation.to_dict()))["prilohy"]["5"]["calls"] == 1
+
+
+def test_instrumentation_counts_groups_of_kody_checked_by_masks() -> None:
+    """Rows of groups of kody checked by their masks are counted, also for prilohy which do not read any table."""
+    instrumentation = Instrumentation()
+    Engine(instrumentation=instrumentation).evaluate_batch(list(generate_pripady(500, seed=3)))
+    assert all(stats.rows_scanned > 0 for stats in instrumentation.prilohy.values())
+
+
+def test_instrumentation_shared_by_discarded_rule_sets(modified_tables_folder: Path) -> None:
+    """A rule set created after another one was discarded is measured with its own tables, not with a stale copy."""
+    rule_sets = [load_rule_set(folder, prilohy=["12_13"]) for folder in [modified_tables_folder, TABLES_FOLDER]]
+    expected = [Engine(rule_set, prilohy=["12_13"]).evaluate(dict(HP_P12)) for rule_set in rule_sets]
+    assert expected[0] != expected[1]
+
+    instrumentation = Instrumentation()
+    for i in range(50):
+        # A new tuple, which may get the address of the discarded one.
+        engine = Engine(rule_sets[i % 2]._replace(), prilohy=["12_13"], instrumentation=instrumentation)
+        assert engine.evaluate(dict(HP_P12)) == expected[i % 2]
+        del engine
+        gc.collect()
+
+
+def test_process_csv_with_shadow_rule_set(tmp_path: Path, modified_tables_folder: Path) -> None:
+    """Shadow prilohy add columns with their results and a flag of change."""
+    input_path = tmp_path / "vstup.csv"
+    rows = [{**HP_P12, "id": "P12"}, {**HP_VSETKY_VYKONY, "id": "BEZ_ZMENY"}, {**HP_INVALID, "id": "INVALID"}]
+    with input_path.open("w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=INPUT_COLUMNS, delimiter=CSV_DELIMITER)
+        writer.writeheader()
+        writer.writerows(rows)
+
+    process_csv(input_path, tmp_path / "vystup.csv", shadow_rule_set=load_rule_set(modified_tables_folder))
+
+    with (tmp_path / "vystup.csv").open(encoding="utf-8") as f:
+        output = {row["id"]: row for row in csv.DictReader(f, delimiter=CSV_DELIMITER)}
+    assert [output["P12"][column] for column in ["ms", "ms_shadow", "urovne_ms_shadow", "zmena_shadow"]] == [
+        "S49-05@S50-05",
+        "S49-05@S50-10",
+        "4@4",
+        "1",
+    ]
+    assert output["BEZ_ZMENY"]["ms_shadow"] == output["BEZ_ZMENY"]["ms"] == "S99-99"
+    assert output["BEZ_ZMENY"]["zmena_shadow"] == "0"
+    assert output["INVALID"]["ms_shadow"] == output["INVALID"]["ms"] == "ERROR"
+    assert output["INVALID"]["zmena_shadow"] == "0"
+
+
+def test_shadow_rule_set_does_not_count_problems_twice(tmp_path: Path) -> None:
+    """Problems of the shadow evaluation are not added to the report of the primary evaluation."""
+    input_path = tmp_path / "vstup.csv"
+    with input_path.open("w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=INPUT_COLUMNS, delimiter=CSV_DELIMITER)
+        writer.writeheader()
+        writer.writerows(generate_pripady(200, seed=31))
+
+    expected, report = ValidationReport(), ValidationReport()
+    process_csv(input_path, tmp_path / "bez_tiena.csv", all_vykony_hlavne=True, report=expected)
+    process_csv(
+        input_path,
+        tmp_path / "s_tienom.csv",
+        all_vykony_hlavne=True,
+        report=report,
+        shadow_rule_set=load_default_rule_set(),
+    )
+    assert any(pole == "urovne_ms" for pole, _ in expected.counts)
+    assert report.counts == expected.counts
+
+
+def test_process_csv_with_validation_report(tmp_path: Path, caplog: pytest.LogCaptureFixture) -> None:
+    """Problems are counted by category and written into the sidecar file instead of being logged one by one."""
+    input_path = tmp_path / "vstup.csv"
+    rows = [
+        {**HP_P12, "id": "OK"},
+        {**HP_INVALID, "id": "VEK"},
+        {**HP_P12, "id": "ROZSAH", "druh_prijatia": "12", "vek": "x"},
+    ]
+    with input_path.open("w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=INPUT_COLUMNS, delimiter=CSV_DELIMITER)
+        writer.writeheader()
+        writer.writerows(rows)
+
+    sidecar_path = tmp_path / "validacia.csv"
+    with caplog.at_level(logging.INFO), ValidationReport(sidecar_path) as report:
+        process_csv(input_path, tmp_path / "vystup.csv", report=report)
+
+    assert report.counts == {("vek", "format"): 2, ("druh_prijatia", "rozsah"): 1}
+    assert not [record for record in caplog.records if record.levelno >= logging.WARNING]
+    assert "Súhrn problémov" in caplog.text
+    with sidecar_path.open(encoding="utf-8") as f:
+        assert list(csv.reader(f, delimiter=CSV_DELIMITER)) == [
+            ["id", "pole", "kod"],
+            ["VEK", "vek", "format"],
+            ["ROZSAH", "vek", "format"],
+            ["ROZSAH", "druh_prijatia", "rozsah"],
+        ]
+
+
+def test_process_csv_rejects_malformed_lines(tmp_path: Path) -> None:
+    """Malformed lines are written into the reject file with their line numbers and the run continues."""
+    input_path = tmp_path / "vstup.csv"
+    with input_path.open("w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=INPUT_COLUMNS, delimiter=CSV_DELIMITER, lineterminator="\n")
+        writer.writeheader()
+        writer.writerow({**HP_P12, "id": "PRED"})
+        f.write('ZLA_UVODZOVKA|"40|||||||\n')
+        f.write("MALO_STLPCOV|40\n")
+        writer.writerow({**HP_P12, "id": "PO"})
+
+    reject_path = tmp_path / "odmietnute.txt"
+    process_csv(input_path, tmp_path / "vystup.csv", reject_path=reject_path)
+
+    with (tmp_path / "vystup.csv").open(encoding="utf-8") as f:
+        output = {row["id"]: row["ms"] for row in csv.DictReader(f, delimiter=CSV_DELIMITER)}
+    assert output == {"PRED": "S49-05@S50-05", "PO": "S49-05@S50-05"}
+    assert reject_path.read_text(encoding="utf-8").splitlines() == [
+        '3|ZLA_UVODZOVKA|"40|||||||',
+        "4|MALO_STLPCOV|40",
+    ]
+
+
+def test_process_csv_pipeline_matches_sequential(tmp_path: Path) -> None:
+    """Pipelined processing writes the same output as the sequential one."""
+    input_path = tmp_path / "vstup.csv"
+    with input_path.open("w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=INPUT_COLUMNS, delimiter=CSV_DELIMITER)
+        writer.writeheader()
+        writer.writerows(generate_pripady(300, seed=3))
+
+    process_csv(input_path, tmp_path / "sekvencne.csv")
+    process_csv(input_path, tmp_path / "zretazene.csv", pipeline=True)
+
+    assert (tmp_path / "zretazene.csv").read_bytes() == (tmp_path / "sekvencne.csv").read_bytes()
+
+
+def test_process_csv_selects_rule_set_by_datum_prijatia(tmp_path: Path, modified_tables_folder: Path) -> None:
+    """Pripady are evaluated against the prilohy in force on datum prijatia."""
+    registry = RuleSetRegistry.from_folders(
+        {date(2026, 1, 1): modified_tables_folder},
+        default_rule_set=load_default_rule_set(),
+    )
+    input_path = tmp_path / "vstup.csv"
+    datumy = {"STARA": "2025-08-01", "NOVA": "2026-01-01", "BEZ_DATUMU": "", "PRED_UCINNOSTOU": "2020-01-01"}
+    with input_path.open("w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=[*INPUT_COLUMNS, "datum_prijatia"], delimiter=CSV_DELIMITER)
+        writer.writeheader()
+        writer.writerows({**HP_P12, "id": id_hp, "datum_prijatia": datum} for id_hp, datum in datumy.items())
+
+    process_csv(input_path, tmp_path / "vystup.csv", registry=registry)
+
+    with (tmp_path / "vystup.csv").open(encoding="utf-8") as f:
+        output = {row["id"]: row for row in csv.DictReader(f, delimiter=CSV_DELIMITER)}
+    assert output["STARA"]["ms"] == "S49-05@S50-05"
+    assert output["NOVA"]["ms"] == "S49-05@S50-10"
+    assert output["NOVA"]["datum_prijatia"] == "2026-01-01"
+    assert output["BEZ_DATUMU"]["ms"] == "S49-05@S50-05"
+    assert output["PRED_UCINNOSTOU"]["ms"] == "ERROR"
+    assert registry.find(date(2025, 6, 30)) is None
+
+
+def test_process_csv_aggregates_counts(tmp_path: Path) -> None:
+    """The aggregated output matches counts computed from the output per row, joined with the minimum from p2."""
+    input_path = tmp_path / "vstup.csv"
+    with input_path.open("w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=INPUT_COLUMNS, delimiter=CSV_DELIMITER)
+        writer.writeheader()
+        writer.writerows(generate_pripady(300, seed=5))
+
+    process_csv(input_path, tmp_path / "vystup.csv", all_vykony_hlavne=True, allow_duplicates=True)
+    process_csv(input_path, all_vykony_hlavne=True, allow_duplicates=True, aggregate_by="id:/", pipeline=True)
+
+    expected = Counter()
+    with (tmp_path / "vystup.csv").open(encoding="utf-8") as f:
+        for row in csv.DictReader(f, delimiter=CSV_DELIMITER):
+            pairs = (
+                {("ERROR", "")}
+                if row["ms"] == "ERROR"
+                else set(zip(row["ms"].split("@"), row["urovne_ms"].split("@"), strict=True))
+            )
+            expected.update((row["id"].split("/")[0], *pair) for pair in pairs)
+    with (tmp_path / "vstup_agregacia.csv").open(encoding="utf-8") as f:
+        output = list(csv.DictReader(f, delimiter=CSV_DELIMITER))
+    assert {(row["skupina"], row["ms"], row["uroven_ms"]): int(row["pocet_pripadov"]) for row in output} == expected
+
+    minima = {row["kod_ms"]: row["minimum_na_nemocnicu"] for row in load_default_rule_set().tables["p2_zoznam_ms"]}
+    for row in output:
+        assert row["minimum_na_nemocnicu"] == minima.get(row["ms"], "")
+        assert row["pocet_pripadov_ms"] == str(
+            sum(expected[key] for key in expected if key[:2] == (row["skupina"], row["ms"])),
+        )
+        if row["minimum_na_nemocnicu"].isdigit():
+            assert row["splna_minimum"] == str(int(int(row["pocet_pripadov_ms"]) >= int(row["minimum_na_nemocnicu"])))
+
+    with pytest.raises(ValueError, match="nie je vo vstupnom súbore"):
+        process_csv(input_path, aggregate_by="poskytovatel")
+
+
+@pytest.mark.parametrize("all_vykony_hlavne", [False, True])
+def test_only_hlavna_ms_matches_first_element_of_full_mode(*, all_vykony_hlavne: bool) -> None:
+    """Hlavna medicinska sluzba and its uroven are the same as the first elements in the full mode."""
+    full_engine = Engine(all_vykony_hlavne=all_vykony_hlavne, allow_duplicates=True)
+    hlavna_engine = Engine(all_vykony_hlavne=all_vykony_hlavne, only_hlavna_ms=True)
+
+    for hp_dict in [HP_P12, HP_VSETKY_VYKONY, HP_INVALID, *generate_pripady(300, seed=5)]:
+        full_result = full_engine.evaluate(dict(hp_dict))
+        hlavna_result = hlavna_engine.evaluate(dict(hp_dict))
+        if full_result is None:
+            assert hlavna_result is None
+        else:
+            assert hlavna_result == (full_result[0].split("@")[0], full_result[1].split("@")[0])
+
+
+def test_selected_prilohy() -> None:
+    """Only selected prilohy are evaluated and only their tables are loaded."""
+    engine = Engine(prilohy=["12_13"])
+    assert set(engine.rule_set.tables) == set(tables_for_prilohy(["12_13"]))
+    assert engine.rule_set is Engine(prilohy=["12_13"]).rule_set
+    assert engine.evaluate(dict(HP_P12)) == ("S50-05", "4")
+    assert Engine(prilohy=resolve_prilohy(exclude=["12_13"])).evaluate(dict(HP_P12)) == ("S49-05", "4")
+
+    engine = Engine.from_folder(TABLES_FOLDER, prilohy=["5"])
+    assert set(engine.rule_set.tables) == {
+        "p2_zoznam_ms",
+        "p5_NOV",
+        "p5_signifikantne_OP",
+        "p5_tazke_problemy_u_novorodencov",
+    }
+    assert engine.evaluate(dict(HP_P12)) == ("S49-05", "4")
+
+    with pytest.raises(ValueError, match="chýbajú tabuľky"):
+        Engine(engine.rule_set)
+    with pytest.raises(ValueError, match="Neznáme prílohy"):
+        resolve_prilohy(["11"])
+
+
+def test_import_does_not_load_prilohy() -> None:
+    """Prilohy distributed with the package are loaded on first use, not when the package is imported."""
+    code = (
+        "import osn_algoritmus.core, osn_algoritmus.flag_variants, osn_algoritmus.generator\n"
+        "from osn_algoritmus.prilohy_preparation import _load_default_rule_set\n"
+        "assert _load_default_rule_set.cache_info().currsize == 0"
+    )
+    subprocess.run([sys.executable, "-c", code], check=True)
+
+
+def test_load_rule_set_checks_kody_ms_against_p2(tmp_path: Path, modified_tables_folder: Path) -> None:
+    """A medicinska sluzba missing in p2 table is reported when the prilohy are loaded, not when it is assigned."""
+    for item in modified_tables_folder.iterdir():
+        (tmp_path / item.name).write_bytes(item.read_bytes())
+    p13 = tmp_path / "p13_V_dospeli.csv"
+    p13.write_text(p13.read_text(encoding="utf-8").replace(";S17-07;", ";S00-00;", 1), encoding="utf-8")
+
+    with pytest.raises(ValueError, match="S00-00"):
+        load_rule_set(tmp_path)
+    assert load_rule_set(tmp_path, prilohy=["14_15"]).urovne.lookup(["S99-99", "S17-07"], "dospeli") == [1, 5]
+
+
+def test_urovne_lookup_many_by_vek_category_index() -> None:
+    """Urovne of several pripady looked up by the index of their vek category match the lookup by the vek category."""
+    urovne = load_default_rule_set().urovne
+    kody_ms = [["S99-99", "S17-07"], ["S49-05"], []]
+    hps = [HospitalizacnyPripad("X", vek, None, None, [], [], [], None, None) for vek in range(-1, 25)]
+    for hp in hps:
+        assert hp.vek_category_index == VEK_CATEGORIES.index(hp.vek_category)
+        expected = [urovne.lookup(kody, hp.vek_category) for kody in kody_ms]
+        assert urovne.lookup_many(kody_ms, [hp.vek_category_index] * len(kody_ms)) == expected
+
+    no_vek = HospitalizacnyPripad("X", None, None, None, [], [], [], None, None)
+    assert no_vek.vek_category_index is None
+    assert urovne.lookup_many(kody_ms, [None] * len(kody_ms)) == [[None, None], [None], []]
+
+
+@pytest.mark.parametrize(
+    "flags",
+    [
+        {},
+        {"all_vykony_hlavne": True, "allow_duplicates": True},
+        {"evaluate_incomplete_pripady": True, "only_hlavna_ms": True},
+        {"prilohy": ["7_8", "9", "14_15"]},
+    ],
+)
+def test_prefilter_does_not_change_results(flags: dict) -> None:
+    """Skipping the prilohy a pripad cannot match gives the same results, and the skipped prilohy are counted."""
+    pripady = [HP_P12, HP_VSETKY_VYKONY, HP_INVALID, *generate_pripady(300, seed=9)]
+    engine = Engine(**flags, prefilter=True)
+    assert engine.evaluate_batch([dict(hp_dict) for hp_dict in pripady]) == Engine(**flags).evaluate_batch(
+        [dict(hp_dict) for hp_dict in pripady],
+    )
+    assert 0 < engine.prefilter_stats.rychla_cesta < engine.prefilter_stats.pripady <= len(pripady)
+    assert engine.prefilter_stats.preskocene
+    assert "rychla_cesta" in engine.prefilter_stats.summary()
+
+
+def test_skupiny_kodov_match_tables() -> None:
+    """Mask of a group of kody contains exactly the kody listed for the group in its table."""
+    skupiny = load_default_rule_set().skupiny
+    for table_name, (column, group_column) in SKUPINY_KODOV.items():
+        rows = load_default_rule_set().tables[table_name]
+        for skupina in {row[group_column] if group_column else "" for row in rows}:
+            kody = {row[column] for row in rows if not group_column or row[group_column] == skupina}
+            assert {kod for kod in skupiny.bity if skupiny.ma_kod(skupiny.maska([kod]), table_name, skupina)} == kody
+    assert not skupiny.ma_kod(skupiny.maska(["neznamy"]), "p16_koma")
+    assert not skupiny.ma_kod(skupiny.maska(skupiny.bity), "p7_VV_deti_vv", "neznama_skupina")
+    assert load_rule_set(prilohy=["14_15"]).skupiny.masky == {}
+
+
+def test_vykony_are_standardized_like_tables() -> None:
+    """Vykony are matched regardless of case and punctuation, and the cache of kody is reported by instrumentation."""
+    instrumentation = Instrumentation()
+    engine = Engine(instrumentation=instrumentation)
+    assert engine.evaluate({**HP_P12, "vykony": "8P-10.7"}) == engine.evaluate(dict(HP_P12))
+    cache = instrumentation.to_dict()["kody_cache"]
+    assert cache["hits"] >= 1
+    assert 0 < cache["hit_rate"] < 1
+    assert "cache kodov" in instrumentation.summary()
@@ -0,0 +1,61 @@
+"""Equivalence of the evaluation of all variants of flags in one pass with separate runs of the engine."""
+
+import csv
+from pathlib import Path
+
+import pytest
+
+from osn_algoritmus.core import Engine, process_csv
+from osn_algoritmus.flag_variants import VARIANTY, FlagVariants, process_variants_csv
+from osn_algoritmus.generator import GeneratorConfig, generate_pripady
+from osn_algoritmus.utils import CSV_DELIMITER, INPUT_COLUMNS
+
+
+@pytest.fixture(scope="module")
+def pripady() -> list[dict]:
+    """Return generated pripady hitting the prilohy depending on hlavny vykon often, including invalid ones."""
+    config = GeneratorConfig(prilohy_shares=dict.fromkeys(["7_8", "9", "12_13"], 0.4))
+    return list(generate_pripady(300, config, seed=19))
+
+
+@pytest.mark.parametrize(
+    "flags",
+    [
+        {},
+        {"evaluate_incomplete_pripady": True},
+        {"only_hlavna_ms": True},
+        {"prilohy": ["9", "12_13", "5"], "prefilter": True},
+    ],
+)
+def test_variants_match_engine(pripady: list[dict], flags: dict) -> None:
+    """Every variant gives the same results as the engine run with the flags of the variant."""
+    variants = FlagVariants(Engine(**flags))
+    results = [variants.evaluate(hp_dict) for hp_dict in pripady]
+    for nazov, variant_flags in VARIANTY.items():
+        expected = Engine(**flags, **variant_flags).evaluate_batch(pripady)
+        assert [result[nazov] for result in results] == expected, nazov
+
+
+def test_process_variants_csv(tmp_path: Path, pripady: list[dict]) -> None:
+    """The output file contains the columns of the selected variants matching the output of process_csv."""
+    input_path = tmp_path / "vstup.csv"
+    with input_path.open("w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=INPUT_COLUMNS, delimiter=CSV_DELIMITER)
+        writer.writeheader()
+        writer.writerows(pripady)
+
+    assert process_variants_csv(input_path, tmp_path / "varianty.csv", FlagVariants(Engine(), ["v", "zakladna"])) == 300
+    process_csv(input_path, tmp_path / "v.csv", all_vykony_hlavne=True)
+    with (tmp_path / "varianty.csv").open(encoding="utf-8") as f:
+        reader = csv.DictReader(f, delimiter=CSV_DELIMITER)
+        assert reader.fieldnames == [*INPUT_COLUMNS, "ms_zakladna", "urovne_ms_zakladna", "ms_v", "urovne_ms_v"]
+        rows = list(reader)
+    with (tmp_path / "v.csv").open(encoding="utf-8") as f:
+        expected = list(csv.DictReader(f, delimiter=CSV_DELIMITER))
+    assert [(row["ms_v"], row["urovne_ms_v"]) for row in rows] == [(row["ms"], row["urovne_ms"]) for row in expected]
+
+
+def test_unknown_variant() -> None:
+    """Unknown names of variants are rejected."""
+    with pytest.raises(ValueError, match="Neznáme varianty"):
+        FlagVariants(Engine(), ["x"])
@@ -0,0 +1,34 @@
+"""Tests for the generator of synthetic hospitalizacne pripady."""
+
+from pathlib import Path
+
+from osn_algoritmus.core import Engine, process_csv
+from osn_algoritmus.generator import GeneratorConfig, generate_pripady, write_pripady_csv
+from osn_algoritmus.utils import INPUT_COLUMNS
+
+
+def test_generate_pripady_is_deterministic() -> None:
+    """The same seed produces the same pripady, a different seed different ones."""
+    assert list(generate_pripady(200, seed=1)) == list(generate_pripady(200, seed=1))
+    assert list(generate_pripady(200, seed=1)) != list(generate_pripady(200, seed=2))
+
+
+def test_generated_pripady_hit_configured_priloha() -> None:
+    """Pripady generated to hit priloha 12_13 get a medicinska sluzba."""
+    config = GeneratorConfig(prilohy_shares={"12_13": 1.0}, malformed_share=0.0)
+    engine = Engine()
+
+    results = [engine.evaluate(pripad) for pripad in generate_pripady(50, config, seed=3)]
+
+    assert all(set(pripad) == set(INPUT_COLUMNS) for pripad in generate_pripady(50, config, seed=3))
+    assert all(result is not None and result[0] != "S99-99" for result in results)
+
+
+def test_write_pripady_csv_is_valid_input(tmp_path: Path) -> None:
+    """Generated csv is processed by the algoritmus."""
+    input_path = tmp_path / "pripady.csv"
+    write_pripady_csv(input_path, 100, seed=4)
+
+    process_csv(input_path, tmp_path / "vystup.csv")
+
+    assert len((tmp_path / "vystup.csv").read_text(encoding="utf-8").splitlines()) == 1 + 100
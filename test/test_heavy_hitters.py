@@ -0,0 +1,115 @@
+"""Tests of the approximate counting of kody of pripady assigned to S99-99."""
+
+import csv
+import logging
+import random
+from collections import Counter
+from collections.abc import Callable
+from pathlib import Path
+
+import pytest
+
+from osn_algoritmus.core import Engine, process_csv
+from osn_algoritmus.flag_variants import VARIANTY, FlagVariants
+from osn_algoritmus.generator import generate_pripady
+from osn_algoritmus.heavy_hitters import SpaceSaving, UnmatchedCodes
+from osn_algoritmus.input_preparation import create_hp_from_dict
+from osn_algoritmus.sql_pushdown import SqlEvaluator
+from osn_algoritmus.utils import CSV_DELIMITER, INPUT_COLUMNS
+
+
+def test_space_saving_bounds_counts() -> None:
+    """Counts are exact below the capacity, otherwise overestimated by at most the error and heavy items are kept."""
+    rnd = random.Random(7)  # noqa: S311, not used for cryptography
+    stream = [f"k{min(int(rnd.paretovariate(1.2)), 500)}" for _ in range(20000)]
+    exact = Counter(stream)
+
+    counter = SpaceSaving(capacity=50)
+    for item in stream:
+        counter.add(item)
+
+    assert counter.total == len(stream)
+    assert len(counter.counts) == 50
+    for item, count, error in counter.top(50):
+        assert count - error <= exact[item] <= count
+    assert {item for item, count in exact.items() if count > len(stream) / 50} <= counter.counts.keys()
+    assert [item for item, _, _ in counter.top(3)] == [item for item, _ in exact.most_common(3)]
+
+    small = SpaceSaving(capacity=1000)
+    for item in stream:
+        small.add(item)
+    assert {item: count for item, count, _ in small.top(1000)} == exact
+
+    with pytest.raises(ValueError, match="kladná"):
+        SpaceSaving(capacity=0)
+
+
+def test_engine_counts_kody_of_s99_99() -> None:
+    """The engine counts hlavna diagnoza, hlavny vykon and DRG of exactly the pripady assigned to S99-99."""
+    pripady = list(generate_pripady(300, seed=23))
+    unmatched = UnmatchedCodes(top=5, capacity=10000)
+    results = Engine(unmatched=unmatched, prefilter=True).evaluate_batch(pripady)
+
+    expected = {kind: Counter() for kind in UnmatchedCodes.KINDS}
+    for hp_dict, result in zip(pripady, results, strict=True):
+        if result is None or result[0] != "S99-99":
+            continue
+        hp = create_hp_from_dict(dict(hp_dict), eval_incomplete=False)
+        expected["hlavna_diagnoza"].update(hp.diagnozy[:1])
+        expected["hlavny_vykon"].update(kod for kod in hp.vykony[:1] if kod)
+        expected["drg"].update([hp.drg] if hp.drg else [])
+
+    assert unmatched.pripady == sum(result is not None and result[0] == "S99-99" for result in results) > 0
+    for kind, counter in unmatched.counters.items():
+        assert counter.counts == expected[kind]
+    assert "pripady_S99-99" in unmatched.summary()
+
+
+def _evaluate_columnar(engine: Engine, pripady: list[dict]) -> None:
+    columnar = pytest.importorskip("osn_algoritmus.columnar")
+    columnar.ColumnarEvaluator(engine).evaluate_batch(pripady)
+
+
+def _evaluate_variants(engine: Engine, pripady: list[dict], varianty: list[str]) -> None:
+    variants = FlagVariants(engine, varianty)
+    for pripad in pripady:
+        variants.evaluate(dict(pripad))
+
+
+@pytest.mark.parametrize(
+    ("evaluate", "all_vykony_hlavne"),
+    [
+        (_evaluate_columnar, False),
+        (lambda engine, pripady: SqlEvaluator(engine).evaluate_batch(pripady), False),
+        (lambda engine, pripady: _evaluate_variants(engine, pripady, ["zakladna", "d"]), False),
+        (lambda engine, pripady: _evaluate_variants(engine, pripady, list(VARIANTY)), True),
+    ],
+)
+def test_other_evaluators_count_kody_of_s99_99(
+    evaluate: Callable[[Engine, list[dict]], None],
+    *,
+    all_vykony_hlavne: bool,
+) -> None:
+    """Columnar, SQL and flag variants evaluation count the same kody as the engine."""
+    pripady = list(generate_pripady(300, seed=23))
+    expected = UnmatchedCodes(capacity=10000)
+    Engine(all_vykony_hlavne=all_vykony_hlavne, unmatched=expected).evaluate_batch(pripady)
+
+    unmatched = UnmatchedCodes(capacity=10000)
+    evaluate(Engine(unmatched=unmatched), pripady)
+    assert unmatched.pripady == expected.pripady > 0
+    for kind, counter in unmatched.counters.items():
+        assert counter.counts == expected.counters[kind].counts
+
+
+def test_process_csv_logs_unmatched_kody(tmp_path: Path, caplog: pytest.LogCaptureFixture) -> None:
+    """The top kody are logged at the end of the run."""
+    input_path = tmp_path / "vstup.csv"
+    with input_path.open("w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=INPUT_COLUMNS, delimiter=CSV_DELIMITER)
+        writer.writeheader()
+        writer.writerows(generate_pripady(100, seed=29))
+
+    with caplog.at_level(logging.INFO):
+        process_csv(input_path, tmp_path / "vystup.csv", unmatched=UnmatchedCodes(top=3))
+    assert "Najčastejšie kódy prípadov bez medicínskej služby" in caplog.text
@@ -0,0 +1,60 @@
+"""Tests for the streaming comparison of output files."""
+
+from pathlib import Path
+
+import pytest
+
+from osn_algoritmus.output_comparison import ServiceChanges, compare_output_files
+
+HEADER = "id|vek|ms|urovne_ms"
+OUTPUT_A = [
+    "HP1|40|S99-99|1",
+    "HP2|0|S49-05@S50-05|4@4",
+    "HP3|50|S17-07|5",
+    "HP4|60|ERROR|ERROR",
+]
+OUTPUT_B = [
+    "HP1|40|S99-99|1",
+    "HP2|0|S49-05@S50-10|4@4",
+    "HP3|50|S17-07|4",
+    "HP5|60|S99-99|1",
+]
+
+
+def write_output(path: Path, lines: list[str], header: str = HEADER) -> Path:
+    """Write lines of an output file."""
+    path.write_text("\n".join([header, *lines]) + "\n", encoding="utf-8")
+    return path
+
+
+@pytest.mark.parametrize("reorder", [False, True])
+def test_compare_output_files(tmp_path: Path, *, reorder: bool) -> None:
+    """Aligned outputs are walked in lockstep, unaligned ones are joined by id through partitions on disk."""
+    lines_b = list(reversed(OUTPUT_B)) if reorder else [*OUTPUT_B[:3], "HP4|60|S99-99|1"]
+    output_a = write_output(tmp_path / "a.csv", OUTPUT_A)
+    output_b = write_output(tmp_path / "b.csv", lines_b)
+
+    summary = compare_output_files(output_a, output_b, tmp_path / "rozdiely.csv", run_a_id="stara", partitions=3)
+
+    lines = (tmp_path / "rozdiely.csv").read_text(encoding="utf-8").splitlines()
+    assert lines[0] == "id|ms_stara|ms_b|urovne_ms_stara|urovne_ms_b"
+    assert "HP2|S49-05@S50-05|S49-05@S50-10|4@4|4@4" in lines
+    assert "HP3|S17-07|S17-07|5|4" in lines
+    assert summary.sluzby["S50-05"] == ServiceChanges(odobrate=1)
+    assert summary.sluzby["S50-10"] == ServiceChanges(pridane=1)
+    assert summary.sluzby["S17-07"] == ServiceChanges(zmenena_uroven=1)
+    if reorder:
+        assert (summary.porovnane, summary.rozdielne, summary.len_v_a, summary.len_v_b) == (3, 2, 1, 1)
+    else:
+        assert (summary.porovnane, summary.rozdielne, summary.len_v_a, summary.len_v_b) == (4, 3, 0, 0)
+
+
+def test_output_without_urovne_compares_only_ms(tmp_path: Path) -> None:
+    """Older outputs without urovne_ms and with '~' as the delimiter are compared by ms only."""
+    output_a = write_output(tmp_path / "a.csv", ["HP2|0|S49-05~S50-05", "HP3|50|S17-07"], header="id|vek|ms")
+    output_b = write_output(tmp_path / "b.csv", OUTPUT_B[1:3])
+
+    summary = compare_output_files(output_a, output_b, tmp_path / "rozdiely.csv")
+
+    assert (summary.porovnane, summary.rozdielne) == (2, 1)
+    assert set(summary.sluzby) == {"S50-05", "S50-10"}
@@ -0,0 +1,53 @@
+"""Tests of the pipelined processing."""
+
+import threading
+from collections.abc import Generator
+
+import pytest
+
+from osn_algoritmus.pipeline import run_pipeline
+
+
+@pytest.mark.parametrize(("batch_size", "max_batches"), [(1, 1), (7, 2), (1000, 8)])
+def test_run_pipeline_preserves_order(batch_size: int, max_batches: int) -> None:
+    """Rows are processed in the calling thread and written in the original order."""
+    written = []
+    processing_threads = set()
+
+    def process(row: dict) -> dict:
+        processing_threads.add(threading.current_thread())
+        return {**row, "dvojnasobok": row["cislo"] * 2}
+
+    run_pipeline(
+        ({"cislo": i} for i in range(100)),
+        process,
+        written.extend,
+        batch_size=batch_size,
+        max_batches=max_batches,
+    )
+
+    assert written == [{"cislo": i, "dvojnasobok": i * 2} for i in range(100)]
+    assert processing_threads == {threading.current_thread()}
+
+
+@pytest.mark.parametrize("failing_stage", ["citanie", "spracovanie", "zapis"])
+def test_run_pipeline_reraises_errors(failing_stage: str) -> None:
+    """An exception in any stage stops the pipeline and is raised in the calling thread."""
+
+    def rows() -> Generator[dict, None, None]:
+        for i in range(10_000):
+            if failing_stage == "citanie" and i == 500:
+                raise RuntimeError(failing_stage)
+            yield {"cislo": i}
+
+    def process(row: dict) -> dict:
+        if failing_stage == "spracovanie" and row["cislo"] == 500:
+            raise RuntimeError(failing_stage)
+        return row
+
+    def write_rows(batch: list[dict]) -> None:
+        if failing_stage == "zapis" and batch[0]["cislo"] >= 500:
+            raise RuntimeError(failing_stage)
+
+    with pytest.raises(RuntimeError, match=failing_stage):
+        run_pipeline(rows(), process, write_rows, batch_size=10, max_batches=2)
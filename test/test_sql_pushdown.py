@@ -0,0 +1,39 @@
+"""Equivalence of the evaluation of prilohy inside SQLite with the evaluation in Python."""
+
+import pytest
+
+from osn_algoritmus.core import Engine
+from osn_algoritmus.generator import GeneratorConfig, generate_pripady
+from osn_algoritmus.sql_pushdown import SqlEvaluator, find_differences
+
+
+@pytest.fixture(scope="module")
+def pripady() -> list[dict]:
+    """Return generated pripady hitting every priloha often, including invalid ones."""
+    config = GeneratorConfig(prilohy_shares=dict.fromkeys(["17", "16", "5", "6", "7_8", "7a_8a", "9", "9a", "10"], 0.2))
+    return list(generate_pripady(300, config, seed=11))
+
+
+@pytest.mark.parametrize(
+    "flags",
+    [
+        {},
+        {"all_vykony_hlavne": True},
+        {"all_vykony_hlavne": True, "allow_duplicates": True},
+        {"evaluate_incomplete_pripady": True, "allow_duplicates": True},
+        {"all_vykony_hlavne": True, "only_hlavna_ms": True},
+        {"all_vykony_hlavne": True, "prilohy": ["6", "9", "12_13"]},
+    ],
+)
+def test_sql_evaluation_matches_python(pripady: list[dict], flags: dict) -> None:
+    """SqlEvaluator returns the same results as Engine.evaluate for all flags, regardless of the batch size."""
+    assert list(find_differences(pripady, Engine(**flags), batch_size=64)) == []
+
+
+def test_sql_evaluator_reuses_temporary_tables(pripady: list[dict]) -> None:
+    """Results of a batch do not depend on the previously evaluated batches."""
+    evaluator = SqlEvaluator(Engine(all_vykony_hlavne=True))
+    expected = evaluator.evaluate_batch(pripady[:50])
+    evaluator.evaluate_batch(pripady[50:])
+    assert evaluator.evaluate_batch(pripady[:50]) == expected
+    assert evaluator.evaluate_batch([]) == []
@@ -0,0 +1,84 @@
+"""Tests of the SQLite adapter."""
+
+import csv
+import sqlite3
+from pathlib import Path
+
+import pytest
+
+from osn_algoritmus.core import Engine, process_csv
+from osn_algoritmus.generator import generate_pripady
+from osn_algoritmus.sqlite_adapter import process_sqlite
+from osn_algoritmus.utils import CSV_DELIMITER, INPUT_COLUMNS
+
+
+@pytest.fixture
+def pripady() -> list[dict]:
+    """Return generated pripady including invalid ones."""
+    return list(generate_pripady(200, seed=5))
+
+
+@pytest.fixture
+def database_path(tmp_path: Path, pripady: list[dict]) -> Path:
+    """SQLite database with table `hospitalizacie` containing the pripady."""
+    path = tmp_path / "data.sqlite"
+    with sqlite3.connect(path) as connection:
+        connection.execute(f"CREATE TABLE hospitalizacie ({', '.join(INPUT_COLUMNS)})")
+        connection.executemany(
+            f"INSERT INTO hospitalizacie VALUES ({', '.join('?' * len(INPUT_COLUMNS))})",  # noqa: S608
+            [[pripad[column] for column in INPUT_COLUMNS] for pripad in pripady],
+        )
+    connection.close()
+    return path
+
+
+def read_output_table(database_path: Path, table: str) -> list[tuple[str, str, str]]:
+    """Return all rows of the output table."""
+    with sqlite3.connect(database_path) as connection:
+        rows = connection.execute(f"SELECT id, ms, urovne_ms FROM {table}").fetchall()  # noqa: S608
+    connection.close()
+    return rows
+
+
+def test_process_sqlite_matches_process_csv(tmp_path: Path, pripady: list[dict], database_path: Path) -> None:
+    """Results written into the database are the same as the output of process_csv, also with pushdown."""
+    input_path = tmp_path / "vstup.csv"
+    with input_path.open("w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=INPUT_COLUMNS, delimiter=CSV_DELIMITER)
+        writer.writeheader()
+        writer.writerows(pripady)
+    process_csv(input_path, tmp_path / "vystup.csv", all_vykony_hlavne=True)
+    with (tmp_path / "vystup.csv").open(encoding="utf-8") as f:
+        expected = [(row["id"], row["ms"], row["urovne_ms"]) for row in csv.DictReader(f, delimiter=CSV_DELIMITER)]
+
+    engine = Engine(all_vykony_hlavne=True)
+    assert process_sqlite(database_path, table="hospitalizacie", engine=engine) == len(pripady)
+    assert read_output_table(database_path, "vysledky_ms") == expected
+
+    process_sqlite(
+        database_path,
+        query="SELECT * FROM hospitalizacie",
+        output_table="male_davky",
+        engine=engine,
+        read_batch_size=7,
+        write_batch_size=13,
+    )
+    assert read_output_table(database_path, "male_davky") == expected
+
+    process_sqlite(database_path, table="hospitalizacie", output_table="v_databaze", engine=engine, pushdown=True)
+    assert read_output_table(database_path, "v_databaze") == expected
+
+
+def test_process_sqlite_refuses_existing_output_table(database_path: Path) -> None:
+    """An existing output table is never overwritten."""
+    with pytest.raises(ValueError, match="už v databáze existuje"):
+        process_sqlite(database_path, table="hospitalizacie", output_table="hospitalizacie")
+
+
+def test_process_sqlite_requires_input_columns(database_path: Path) -> None:
+    """The query must return all input columns."""
+    with pytest.raises(ValueError, match="neobsahuje stĺpce"):
+        process_sqlite(database_path, query="SELECT id, vek FROM hospitalizacie")
+    with sqlite3.connect(database_path) as connection:
+        assert connection.execute("SELECT name FROM sqlite_master").fetchall() == [("hospitalizacie",)]
+    connection.close()